@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Profile ingestion for sheet03.
+
+Parses gprof flat profiles, `perf report --stdio` output, `perf script` dumps and
+already folded stacks (stackcollapse format), aggregates per-function self and
+total time per configuration and writes the `Metric`-indexed table that
+`python.py` plots. Inputs with call stacks (perf script / folded) additionally
+get flame graphs, and `--diff` renders differential flame graphs between two
+configurations.
+
+Usage:
+    python profile_ingest.py npb_bt_a=gprof_a.txt npb_bt_b=perf_b.folded \
+        --diff npb_bt_a:npb_bt_b
+"""
+
+import argparse
+import hashlib
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.patches import Rectangle
+
+# --- Configuration ---
+OUTPUT_CSV_FILE = Path("profile.csv")  # Self time table, read by python.py
+OUTPUT_TOTAL_CSV_FILE = Path("profile_total.csv")  # Inclusive (total) time table
+FLAMEGRAPH_DIR = Path("flamegraphs")
+
+# perf record default sampling frequency, used to turn sample counts into seconds
+DEFAULT_SAMPLE_FREQ = 4000
+# Number of functions kept in the output table (sorted by self time)
+TOP_N_FUNCTIONS = 7
+# Frames narrower than this fraction of the graph width get no label
+FLAMEGRAPH_MIN_LABEL_FRACTION = 0.02
+
+# gprof flat profile rows: "%time cumulative self [calls self/call total/call] name"
+GPROF_ROW_REGEX = re.compile(
+    r"^\s*([\d.]+)\s+([\d.]+)\s+([\d.]+)"
+    r"(?:\s+(\d+)\s+([\d.]+)\s+([\d.]+))?\s+(\S.*?)\s*$"
+)
+GPROF_UNIT_REGEX = re.compile(r"\b(s|ms|us|ns)/call\b")
+GPROF_UNIT_SCALE = {"s": 1.0, "ms": 1e-3, "us": 1e-6, "ns": 1e-9}
+
+# perf report rows: "Children% Self% comm dso [.] symbol" or "Overhead% comm dso [.] symbol"
+PERF_REPORT_ROW_REGEX = re.compile(
+    r"^\s*([\d.]+)%\s+(?:([\d.]+)%\s+)?\S+\s+\S+\s+\[[.kgu]\]\s+(\S.*?)\s*$"
+)
+PERF_REPORT_SAMPLES_REGEX = re.compile(r"^#\s*Samples:\s*([\d.]+)([KMG]?)")
+SAMPLE_SUFFIX_SCALE = {"": 1, "K": 1e3, "M": 1e6, "G": 1e9}
+
+# perf script: sample header and stack frame lines
+PERF_SCRIPT_FRAME_REGEX = re.compile(r"^\s+[0-9a-fA-F]+\s+(\S.*?)\s+\((.*)\)\s*$")
+PERF_SCRIPT_INLINE_FRAME_REGEX = re.compile(r"\s[0-9a-fA-F]+\s+(\S+)\s+\(([^)]*)\)\s*$")
+
+# Folded stacks: "root;child;leaf 123"
+FOLDED_ROW_REGEX = re.compile(r"^(\S.*?)\s+(\d+)\s*$")
+
+
+# --- Helper Functions ---
+
+def strip_symbol_offset(symbol: str) -> str:
+    """Removes the '+0x1f' offset perf appends to symbol names."""
+    return re.sub(r"\+0x[0-9a-fA-F]+$", "", symbol)
+
+
+def detect_format(profile_file: Path) -> str | None:
+    """Guesses the profile format from the first lines of the file."""
+    try:
+        with open(profile_file, "r", errors="ignore") as f:
+            head = [line for _, line in zip(range(60), f)]
+    except OSError as e:
+        print(f"Warning: Could not read {profile_file}: {e}", file=sys.stderr)
+        return None
+
+    text = "".join(head)
+    if "Flat profile:" in text or "Each sample counts as" in text:
+        return "gprof"
+    if any(line.startswith("# Samples:") or line.startswith("# Overhead") or line.startswith("# Children")
+           for line in head):
+        return "perf_report"
+    data_lines = [line for line in head if line.strip() and not line.startswith("#")]
+    if data_lines and all(FOLDED_ROW_REGEX.match(line) for line in data_lines):
+        return "folded"
+    if data_lines:
+        return "perf_script"
+    return None
+
+
+def parse_gprof_flat(profile_file: Path) -> dict[str, dict[str, float]]:
+    """
+    Parses a gprof flat profile into {function: {"self": s, "total": s}}.
+    Total time is calls * total/call; functions without call counts get total = self.
+    """
+    functions = {}
+    unit_scale = 1.0
+    in_table = False
+    with open(profile_file, "r", errors="ignore") as f:
+        for line in f:
+            if not in_table:
+                if "name" in line and "/call" in line:
+                    units = GPROF_UNIT_REGEX.findall(line)
+                    if units:
+                        unit_scale = GPROF_UNIT_SCALE[units[-1]]
+                    in_table = True
+                continue
+            if not line.strip():
+                # The flat table ends at the first blank line after its header
+                if functions:
+                    break
+                continue
+            match = GPROF_ROW_REGEX.match(line)
+            if not match:
+                continue
+            self_s = float(match.group(3))
+            calls = match.group(4)
+            name = match.group(7)
+            total_s = self_s
+            if calls is not None:
+                total_s = max(self_s, int(calls) * float(match.group(6)) * unit_scale)
+            entry = functions.setdefault(name, {"self": 0.0, "total": 0.0})
+            entry["self"] += self_s
+            entry["total"] += total_s
+    return functions
+
+
+def parse_perf_report(profile_file: Path, runtime_s: float | None = None,
+                      sample_freq: int = DEFAULT_SAMPLE_FREQ) -> dict[str, dict[str, float]]:
+    """
+    Parses `perf report --stdio` into {function: {"self": s, "total": s}}.
+    Percentages are converted to seconds using the run time if known, otherwise
+    using the header sample count divided by the sampling frequency. Total time
+    is only available if the report was produced with --children.
+    """
+    rows = []
+    sample_count = None
+    with open(profile_file, "r", errors="ignore") as f:
+        for line in f:
+            if line.startswith("#"):
+                samples_match = PERF_REPORT_SAMPLES_REGEX.match(line)
+                if samples_match and sample_count is None:
+                    sample_count = float(samples_match.group(1)) * SAMPLE_SUFFIX_SCALE[samples_match.group(2)]
+                continue
+            match = PERF_REPORT_ROW_REGEX.match(line)
+            if match:
+                rows.append(match.groups())
+
+    if runtime_s is None:
+        if sample_count is None:
+            print(f"Warning: No run time given and no sample count in {profile_file.name}; "
+                  f"values are left as percentages.", file=sys.stderr)
+            runtime_s = 100.0
+        else:
+            runtime_s = sample_count / sample_freq
+
+    functions = {}
+    for first_pct, second_pct, symbol in rows:
+        name = strip_symbol_offset(symbol)
+        if second_pct is not None:
+            total_s = float(first_pct) / 100 * runtime_s
+            self_s = float(second_pct) / 100 * runtime_s
+        else:
+            self_s = float(first_pct) / 100 * runtime_s
+            total_s = float("nan")
+        entry = functions.setdefault(name, {"self": 0.0, "total": 0.0})
+        entry["self"] += self_s
+        entry["total"] += total_s
+    return functions
+
+
+def collapse_perf_script(profile_file: Path) -> Counter:
+    """
+    Collapses `perf script` output into folded stacks (root;...;leaf -> samples),
+    the same transformation stackcollapse-perf.pl performs.
+    """
+    stacks = Counter()
+    frames = []
+    inline_frame = None
+
+    def flush():
+        if frames:
+            stacks[";".join(reversed(frames))] += 1
+        elif inline_frame:
+            stacks[inline_frame] += 1
+
+    with open(profile_file, "r", errors="ignore") as f:
+        for line in f:
+            if not line.strip():
+                flush()
+                frames = []
+                inline_frame = None
+                continue
+            if line[0].isspace():
+                match = PERF_SCRIPT_FRAME_REGEX.match(line)
+                if match:
+                    frames.append(strip_symbol_offset(match.group(1)))
+                continue
+            # New sample header; samples recorded without -g carry the frame inline
+            flush()
+            frames = []
+            inline_match = PERF_SCRIPT_INLINE_FRAME_REGEX.search(line)
+            inline_frame = strip_symbol_offset(inline_match.group(1)) if inline_match else None
+    flush()
+    return stacks
+
+
+def parse_folded(profile_file: Path) -> Counter:
+    """Reads folded stacks ("a;b;c 123") into a Counter."""
+    stacks = Counter()
+    with open(profile_file, "r", errors="ignore") as f:
+        for line in f:
+            match = FOLDED_ROW_REGEX.match(line)
+            if match:
+                stacks[match.group(1)] += int(match.group(2))
+    return stacks
+
+
+def functions_from_stacks(stacks: Counter, sample_freq: int = DEFAULT_SAMPLE_FREQ) -> dict[str, dict[str, float]]:
+    """Derives self (leaf) and total (on stack) time per function from folded stacks."""
+    functions = {}
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        seconds = count / sample_freq
+        leaf = functions.setdefault(frames[-1], {"self": 0.0, "total": 0.0})
+        leaf["self"] += seconds
+        # Count recursive functions only once per stack
+        for name in set(frames):
+            functions.setdefault(name, {"self": 0.0, "total": 0.0})["total"] += seconds
+    return functions
+
+
+def build_tables(profiles: dict[str, dict[str, dict[str, float]]], top_n: int | None = TOP_N_FUNCTIONS):
+    """Builds the Metric-indexed self and total time tables (functions x configurations)."""
+    self_table = pd.DataFrame({
+        config: {name: values["self"] for name, values in functions.items()}
+        for config, functions in profiles.items()
+    })
+    total_table = pd.DataFrame({
+        config: {name: values["total"] for name, values in functions.items()}
+        for config, functions in profiles.items()
+    })
+    self_table.index.name = "Metric"
+    total_table.index.name = "Metric"
+
+    order = self_table.fillna(0).sum(axis=1).sort_values(ascending=False).index
+    if top_n:
+        order = order[:top_n]
+    return self_table.reindex(order), total_table.reindex(order)
+
+
+# --- Flame Graphs ---
+
+def build_stack_tree(stacks: Counter) -> dict:
+    """Builds a nested {name, value, children} tree from folded stacks."""
+    root = {"name": "all", "value": 0, "children": {}}
+    for stack, count in stacks.items():
+        node = root
+        node["value"] += count
+        for frame in stack.split(";"):
+            node = node["children"].setdefault(frame, {"name": frame, "value": 0, "children": {}})
+            node["value"] += count
+    return root
+
+
+def flame_color(name: str):
+    """Deterministic warm color per function, like flamegraph.pl's 'hot' palette."""
+    digest = hashlib.md5(name.encode()).digest()
+    return (0.80 + digest[0] / 255 * 0.2, 0.25 + digest[1] / 255 * 0.55, digest[2] / 255 * 0.2)
+
+
+def diff_color(delta: float, max_delta: float):
+    """Red for frames that grew, blue for frames that shrank, white for no change."""
+    if max_delta <= 0:
+        return (1.0, 1.0, 1.0)
+    intensity = min(1.0, abs(delta) / max_delta)
+    if delta > 0:
+        return (1.0, 1.0 - intensity * 0.8, 1.0 - intensity * 0.8)
+    return (1.0 - intensity * 0.8, 1.0 - intensity * 0.8, 1.0)
+
+
+def node_shares(tree: dict, prefix: tuple = ()) -> dict[tuple, float]:
+    """Maps each stack path to its share of all samples."""
+    total = tree["value"] or 1
+    shares = {}
+
+    def walk(node, path):
+        for child in node["children"].values():
+            child_path = path + (child["name"],)
+            shares[child_path] = child["value"] / total
+            walk(child, child_path)
+
+    walk(tree, prefix)
+    return shares
+
+
+def render_flamegraph(tree: dict, output_file: Path, title: str, colors: dict[tuple, tuple] | None = None):
+    """Draws a flame graph of the stack tree (root at the bottom) to a PNG file."""
+    total = tree["value"]
+    if total == 0:
+        print(f"Warning: No samples to draw for {output_file.name}", file=sys.stderr)
+        return
+
+    frames = []  # (x, depth, width, name, path)
+
+    def walk(node, x, depth, path):
+        for child in sorted(node["children"].values(), key=lambda n: n["name"]):
+            child_path = path + (child["name"],)
+            frames.append((x, depth, child["value"], child["name"], child_path))
+            walk(child, x, depth + 1, child_path)
+            x += child["value"]
+
+    walk(tree, 0, 0, ())
+    max_depth = max(depth for _, depth, _, _, _ in frames) + 1
+
+    fig, ax = plt.subplots(figsize=(16, max(4, 0.3 * max_depth + 1)))
+    fig.set_facecolor('white')
+    for x, depth, width, name, path in frames:
+        color = colors.get(path, (0.9, 0.9, 0.9)) if colors is not None else flame_color(name)
+        ax.add_patch(Rectangle((x / total, depth), width / total, 0.95,
+                               facecolor=color, edgecolor='white', linewidth=0.3))
+        if width / total >= FLAMEGRAPH_MIN_LABEL_FRACTION:
+            max_chars = int(width / total * 180)
+            label = name if len(name) <= max_chars else name[:max(max_chars - 2, 1)] + ".."
+            ax.text((x + width / 2) / total, depth + 0.45, label,
+                    ha='center', va='center', fontsize=7, clip_on=True)
+
+    ax.set_xlim(0, 1)
+    ax.set_ylim(0, max_depth)
+    ax.set_yticks([])
+    ax.set_xlabel("Fraction of samples")
+    ax.set_title(title)
+    plt.tight_layout()
+    try:
+        plt.savefig(output_file, format='png', dpi=150, facecolor=fig.get_facecolor())
+        print(f"Flame graph saved to {output_file}")
+    except Exception as e:
+        print(f"ERROR: Failed to save flame graph {output_file}: {e}", file=sys.stderr)
+    finally:
+        plt.close(fig)
+
+
+def render_diff_flamegraph(stacks_before: Counter, stacks_after: Counter, output_file: Path, title: str):
+    """
+    Differential flame graph: frame widths come from the 'after' profile, colors
+    show how each frame's share of samples changed relative to 'before'.
+    """
+    tree_before = build_stack_tree(stacks_before)
+    tree_after = build_stack_tree(stacks_after)
+    shares_before = node_shares(tree_before)
+    shares_after = node_shares(tree_after)
+    deltas = {path: share - shares_before.get(path, 0.0) for path, share in shares_after.items()}
+    max_delta = max((abs(d) for d in deltas.values()), default=0.0)
+    colors = {path: diff_color(delta, max_delta) for path, delta in deltas.items()}
+    render_flamegraph(tree_after, output_file, title, colors=colors)
+
+
+# --- Main Execution ---
+
+def parse_inputs(specs: list[str]) -> list[tuple[str, Path]]:
+    """Splits CONFIG=PATH arguments."""
+    inputs = []
+    for spec in specs:
+        if "=" not in spec:
+            print(f"ERROR: Expected CONFIG=PATH, got '{spec}'", file=sys.stderr)
+            sys.exit(1)
+        config_name, path = spec.split("=", 1)
+        inputs.append((config_name, Path(path)))
+    return inputs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Aggregate gprof/perf profiles into the sheet03 profile table and flame graphs.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument('inputs', nargs='+',
+                        help="Profiles as CONFIG=PATH (gprof flat profile, perf report --stdio, perf script or folded stacks).")
+    parser.add_argument('--runtime', action='append', default=[],
+                        help="CONFIG=SECONDS run time used to scale perf report percentages.")
+    parser.add_argument('--freq', type=int, default=DEFAULT_SAMPLE_FREQ,
+                        help="Sampling frequency (Hz) of perf record, to convert samples into seconds.")
+    parser.add_argument('--diff', action='append', default=[],
+                        help="BEFORE:AFTER configuration pair for a differential flame graph.")
+    parser.add_argument('--top', type=int, default=TOP_N_FUNCTIONS,
+                        help="Number of functions kept in the table (0 keeps all).")
+    parser.add_argument('--output-csv', type=Path, default=OUTPUT_CSV_FILE)
+    parser.add_argument('--output-total-csv', type=Path, default=OUTPUT_TOTAL_CSV_FILE)
+    parser.add_argument('--flamegraph-dir', type=Path, default=FLAMEGRAPH_DIR)
+    args = parser.parse_args()
+
+    runtimes = {config_name: float(value) for config_name, value in
+                (spec.split("=", 1) for spec in args.runtime)}
+
+    profiles = {}
+    stacks_per_config = {}
+    for config_name, profile_file in parse_inputs(args.inputs):
+        if not profile_file.is_file():
+            print(f"Warning: Profile file not found: {profile_file}", file=sys.stderr)
+            continue
+        fmt = detect_format(profile_file)
+        print(f"Processing: {profile_file.name} (Configuration: {config_name}, Format: {fmt})")
+
+        if fmt == "gprof":
+            functions = parse_gprof_flat(profile_file)
+        elif fmt == "perf_report":
+            functions = parse_perf_report(profile_file, runtimes.get(config_name), args.freq)
+        elif fmt in ("perf_script", "folded"):
+            stacks = collapse_perf_script(profile_file) if fmt == "perf_script" else parse_folded(profile_file)
+            stacks_per_config.setdefault(config_name, Counter()).update(stacks)
+            functions = functions_from_stacks(stacks, args.freq)
+        else:
+            print(f"Warning: Unrecognized profile format: {profile_file}", file=sys.stderr)
+            continue
+
+        if not functions:
+            print(f"Warning: No functions extracted from {profile_file.name}", file=sys.stderr)
+            continue
+        # Several files for one configuration (e.g. per-thread profiles) are summed
+        merged = profiles.setdefault(config_name, {})
+        for name, values in functions.items():
+            entry = merged.setdefault(name, {"self": 0.0, "total": 0.0})
+            entry["self"] += values["self"]
+            entry["total"] += values["total"]
+
+    if not profiles:
+        print("ERROR: No profile data could be extracted.", file=sys.stderr)
+        sys.exit(1)
+
+    # --- Tables ---
+    self_table, total_table = build_tables(profiles, args.top or None)
+    print("\n--- Self Time per Function (seconds) ---")
+    print(self_table.to_string(float_format="%.6g"))
+    print("\n--- Total Time per Function (seconds) ---")
+    print(total_table.to_string(float_format="%.6g"))
+    self_table.to_csv(args.output_csv, float_format="%.6g")
+    total_table.to_csv(args.output_total_csv, float_format="%.6g")
+    print(f"\nSelf time table saved to {args.output_csv} (plot it with python.py)")
+    print(f"Total time table saved to {args.output_total_csv}")
+
+    # --- Flame Graphs ---
+    if stacks_per_config:
+        args.flamegraph_dir.mkdir(parents=True, exist_ok=True)
+    for config_name, stacks in stacks_per_config.items():
+        render_flamegraph(build_stack_tree(stacks), args.flamegraph_dir / f"flamegraph_{config_name}.png",
+                          f"Flame Graph: {config_name}")
+    for pair in args.diff:
+        before, _, after = pair.partition(":")
+        if before not in stacks_per_config or after not in stacks_per_config:
+            print(f"Warning: Differential flame graph {pair} needs stack profiles (perf script/folded) "
+                  f"for both configurations.", file=sys.stderr)
+            continue
+        render_diff_flamegraph(stacks_per_config[before], stacks_per_config[after],
+                               args.flamegraph_dir / f"flamegraph_diff_{before}_vs_{after}.png",
+                               f"Differential Flame Graph: {before} -> {after} (red = larger share, blue = smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 #!/usr/bin/env python3
 
 import re
+import os
 import pandas as pd
 import matplotlib.pyplot as plt
 from pathlib import Path
+from file_lines import iter_file_lines # Streaming line reader (file_lines.py next to this script)
 import sys
+from parse_cache import cached_parse # SQLite parse cache (parse_cache.py next to this script)
 import io  # Needed for creating the markdown string
 
 # --- Configuration ---
@@ -21,6 +24,30 @@ OUTPUT_MARKDOWN_FILE = Path(
     "/scratch/cb761223/exercises/sheet04/results_summary.md"
 )
 
+# Directory holding the massif.out.<job_name> files written by massif.py
+MASSIF_OUTPUTS_DIR = Path(
+    "/scratch/cb761223/exercises/sheet04/massif_outputs"
+)
+# Output PNG plot with the heap timeline of every program
+OUTPUT_HEAP_PLOT_FILE = Path(
+    "/scratch/cb761223/exercises/sheet04/massif_heap_timelines_high_dpi.png"
+)
+# Worker processes used to parse massif.out files in parallel
+PARSE_WORKERS = min(8, os.cpu_count() or 1)
+# Number of allocation sites listed per program below the summary table
+TOP_N_ALLOCATION_SITES = 5
+# Allocation wrappers that are looked through when ranking allocation sites,
+# so the site is the caller of the wrapper (e.g. ssca2's _mymalloc)
+ALLOCATION_WRAPPERS = {"_mymalloc"}
+
+# SQLite index of parsed files; unchanged files are not parsed again (None disables it)
+PARSE_CACHE_FILE = Path(
+    "/scratch/cb761223/exercises/sheet04/parse_cache.sqlite"
+)
+# Bump when a parser's output changes so cached results are re-parsed
+LOG_PARSER_VERSION = 1
+MASSIF_PARSER_VERSION = 1
+
 # Regex to parse filenames (adjust if your naming changes)
 FILENAME_REGEX = re.compile(
     r"^(npb_bt|ssca2)_([A-Za-z0-9]+)_(baseline|massif)\.log$"
@@ -29,6 +56,16 @@ FILENAME_REGEX = re.compile(
 # Regex to find the 'real' time output from the `time` command
 TIME_REGEX = re.compile(r"^\s*real\s+(\d+)m([\d.]+)s", re.MULTILINE)
 
+# Regexes for the massif.out format (see `ms_print` for the reference reader)
+MASSIF_FILENAME_REGEX = re.compile(r"^massif\.out\.(npb_bt|ssca2)_([A-Za-z0-9]+)_massif$")
+MASSIF_KEY_VALUE_REGEX = re.compile(r"^(\w+)[=:]\s*(.*)$")
+# One heap tree node: indentation gives the depth, then "n<children>: <bytes> <label>"
+MASSIF_TREE_NODE_REGEX = re.compile(r"^( *)n(\d+): (\d+) (.*)$")
+# Node label of a real code location: "0x4018DD: computeGraph (in /path/ssca2)"
+MASSIF_SITE_REGEX = re.compile(r"^0x[0-9A-Fa-f]+: (.+?)(?: \((?:in |at )?(.+)\))?$")
+
+BYTES_PER_MIB = 1024 * 1024
+
 
 # --- Helper Functions ---
 
@@ -45,14 +82,18 @@ def parse_time_to_seconds(time_str: str) -> float | None:
     return None
 
 
+
 def extract_time_from_log(log_file: Path) -> float | None:
     """Reads a log file and extracts the 'real' execution time in seconds."""
     if not log_file.is_file():
         print(f"Warning: Log file not found: {log_file}", file=sys.stderr)
         return None
     try:
-        content = log_file.read_text()
-        return parse_time_to_seconds(content)
+        for line in iter_file_lines(log_file):
+            seconds = parse_time_to_seconds(line)
+            if seconds is not None:
+                return seconds
+        return None
     except Exception as e:
         print(
             f"Warning: Error reading or parsing {log_file}: {e}",
@@ -61,6 +102,247 @@ def extract_time_from_log(log_file: Path) -> float | None:
         return None
 
 
+def iter_massif_records(massif_file: Path):
+    """
+    Streams a massif.out file as records:
+      ("header", key, value)            - desc/cmd/time_unit lines
+      ("snapshot", fields)              - one per snapshot, once its heap_tree line is read
+      ("node", depth, children, bytes, label) - heap tree nodes of the preceding snapshot
+    """
+    current = None
+    for line in iter_file_lines(massif_file):
+        if line.startswith("#"):
+            continue
+        match = MASSIF_TREE_NODE_REGEX.match(line)
+        if match:
+            yield "node", len(match.group(1)), int(match.group(2)), int(match.group(3)), match.group(4)
+            continue
+        match = MASSIF_KEY_VALUE_REGEX.match(line)
+        if not match:
+            continue
+        key, value = match.groups()
+        if key == "snapshot":
+            current = {"snapshot": int(value)}
+        elif current is None:
+            yield "header", key, value
+        elif key == "heap_tree":
+            current["heap_tree"] = value
+            yield "snapshot", current
+        else:
+            current[key] = int(value)
+
+
+def accumulate_allocation_site(stack: list, sites: dict[str, int], depth: int, num_children: int,
+                               node_bytes: int, label: str):
+    """
+    Adds one streamed heap tree node to the allocation site totals.
+    Sites are the direct children of the root; wrapper functions are looked
+    through so the bytes are attributed to the wrapper's callers instead.
+    `stack` holds (depth, kind) of the ancestors of the current node.
+    """
+    while stack and stack[-1][0] >= depth:
+        stack.pop()
+    parent_kind = stack[-1][1] if stack else None
+    if parent_kind is None:
+        kind = "root"
+    elif parent_kind in ("root", "wrapper"):
+        match = MASSIF_SITE_REGEX.match(label)
+        if not match:
+            # "in N places, below massif's threshold" entries
+            kind = "skip"
+        elif match.group(1) in ALLOCATION_WRAPPERS and num_children > 0:
+            kind = "wrapper"
+        else:
+            kind = "site"
+            sites[match.group(1)] = sites.get(match.group(1), 0) + node_bytes
+    else:
+        kind = "skip"
+    stack.append((depth, kind))
+
+
+def parse_massif_file(massif_file: Path) -> dict | None:
+    """
+    Parses a massif.out file into a snapshot time series, the peak snapshot and
+    the allocation sites ranked by the bytes they hold at the peak.
+    Heap trees are aggregated while they stream past and never kept in memory.
+    """
+    time_unit = "i"
+    timeline = []
+    peak = None  # snapshot number marked heap_tree=peak
+    peak_sites = None
+    largest_detailed = (-1, None)  # (total bytes, sites) fallback if there is no peak tree
+    sites, stack, tree_total = None, [], 0
+    try:
+        for record in iter_massif_records(massif_file):
+            kind = record[0]
+            if kind == "node":
+                if sites is not None:
+                    accumulate_allocation_site(stack, sites, *record[1:])
+                continue
+            if kind == "header":
+                if record[1] == "time_unit":
+                    time_unit = record[2]
+                continue
+
+            # New snapshot: finish the tree of the previous one
+            if sites is not None and tree_total > largest_detailed[0]:
+                largest_detailed = (tree_total, sites)
+            sites, stack = None, []
+
+            fields = record[1]
+            total = (fields.get("mem_heap_B", 0) + fields.get("mem_heap_extra_B", 0)
+                     + fields.get("mem_stacks_B", 0))
+            timeline.append((fields["snapshot"], fields.get("time", 0), fields.get("mem_heap_B", 0),
+                             fields.get("mem_heap_extra_B", 0), fields.get("mem_stacks_B", 0), total))
+            if fields["heap_tree"] == "peak":
+                peak = fields["snapshot"]
+                sites = peak_sites = {}
+            elif fields["heap_tree"] == "detailed" and peak_sites is None and total > largest_detailed[0]:
+                sites, tree_total = {}, total
+        if sites is not None and sites is not peak_sites and tree_total > largest_detailed[0]:
+            largest_detailed = (tree_total, sites)
+    except Exception as e:
+        print(f"Warning: Error reading {massif_file}: {e}", file=sys.stderr)
+        return None
+
+    if not timeline:
+        print(f"Warning: No snapshots found in {massif_file}", file=sys.stderr)
+        return None
+
+    df = pd.DataFrame(
+        timeline,
+        columns=["snapshot", "time", "mem_heap_B", "mem_heap_extra_B", "mem_stacks_B", "mem_total_B"],
+    ).set_index("snapshot")
+
+    # Massif marks the peak it saw with heap_tree=peak; fall back to the largest snapshot
+    if peak is None:
+        peak = int(df["mem_total_B"].idxmax())
+    # Without a peak tree (e.g. --peak-inaccuracy) use the largest detailed snapshot
+    sites = peak_sites if peak_sites is not None else (largest_detailed[1] or {})
+
+    return {
+        "time_unit": time_unit,
+        "timeline": df,
+        "peak_snapshot": peak,
+        "peak": df.loc[peak],
+        "sites": sorted(sites.items(), key=lambda item: item[1], reverse=True),
+    }
+
+
+def load_massif_results(massif_dir: Path) -> dict[str, dict]:
+    """
+    Parses every massif.out file in the directory, keyed by full_id.
+    Files are parsed in parallel worker processes; unchanged files are taken
+    from the parse cache.
+    """
+    results = {}
+    if not massif_dir.is_dir():
+        print(f"Warning: Massif output directory not found: {massif_dir}", file=sys.stderr)
+        return results
+    jobs = {}
+    for massif_file in sorted(massif_dir.glob("massif.out.*")):
+        match = MASSIF_FILENAME_REGEX.match(massif_file.name)
+        if not match:
+            print(f"Warning: Skipping massif file with unexpected name: {massif_file.name}", file=sys.stderr)
+            continue
+        jobs[f"{match.group(1)}_{match.group(2)}"] = massif_file
+    if not jobs:
+        return results
+
+    parsed_files = cached_parse(jobs.values(), parse_massif_file, MASSIF_PARSER_VERSION,
+                                PARSE_CACHE_FILE, workers=PARSE_WORKERS)
+    for full_id, massif_file in jobs.items():
+        if parsed_files[massif_file] is not None:
+            results[full_id] = parsed_files[massif_file]
+    return results
+
+
+def add_memory_columns(df: pd.DataFrame, massif_results: dict[str, dict]):
+    """
+    Adds the peak memory columns to the per-program DataFrame.
+    Peak Memory is the useful heap at the peak snapshot; the "with Massif"
+    column adds the allocator overhead (extra heap) and stacks massif measured.
+    """
+    heap, total, source = [], [], []
+    for full_id in df.index:
+        result = massif_results.get(full_id)
+        if result is None:
+            heap.append(float("nan"))
+            total.append(float("nan"))
+            source.append(None)
+            continue
+        heap.append(result["peak"]["mem_heap_B"] / BYTES_PER_MIB)
+        total.append(result["peak"]["mem_total_B"] / BYTES_PER_MIB)
+        source.append(result["sites"][0][0] if result["sites"] else None)
+    df["peak_heap_mib"] = heap
+    df["peak_total_mib"] = total
+    df["memory_overhead_percent"] = [
+        (t - h) / h * 100 if h > 0 else float("nan") for h, t in zip(heap, total)
+    ]
+    df["largest_source"] = source
+
+
+def format_value(value, fmt: str = ".2f") -> str:
+    """Formats a number for the Markdown table, '---' if it is missing."""
+    if value is None or pd.isna(value):
+        return "---"
+    return f"{value:{fmt}}"
+
+
+def generate_allocation_sites_markdown(massif_results: dict[str, dict]) -> str:
+    """Lists the top allocation sites at the peak snapshot of every program."""
+    md_string_io = io.StringIO()
+    md_string_io.write(f"\n### Top {TOP_N_ALLOCATION_SITES} Allocation Sites at Peak\n")
+    for full_id, result in sorted(massif_results.items()):
+        peak_heap = result["peak"]["mem_heap_B"]
+        md_string_io.write(f"\n**{full_id}** (peak snapshot {result['peak_snapshot']}, "
+                           f"{peak_heap / BYTES_PER_MIB:.2f} MiB heap)\n\n")
+        md_string_io.write("| Function | Bytes | Share of Heap (%) |\n|---|---|---|\n")
+        for function, site_bytes in result["sites"][:TOP_N_ALLOCATION_SITES]:
+            share = site_bytes / peak_heap * 100 if peak_heap > 0 else 0
+            md_string_io.write(f"| `{function}` | {site_bytes} | {share:.2f} |\n")
+    return md_string_io.getvalue()
+
+
+def plot_heap_timelines(massif_results: dict[str, dict], output_file: Path):
+    """Plots heap, extra heap and stack usage over time, one subplot per program."""
+    print(f"\n--- Generating Heap Timeline Plot: {output_file} ---")
+    num_programs = len(massif_results)
+    num_cols = min(3, num_programs)
+    num_rows = (num_programs + num_cols - 1) // num_cols
+    fig, axes = plt.subplots(num_rows, num_cols, figsize=(6 * num_cols, 4 * num_rows), squeeze=False)
+    fig.set_facecolor('white')
+
+    for ax, (full_id, result) in zip(axes.flat, sorted(massif_results.items())):
+        timeline = result["timeline"].sort_values("time")
+        ax.stackplot(
+            timeline["time"],
+            timeline["mem_heap_B"] / BYTES_PER_MIB,
+            timeline["mem_heap_extra_B"] / BYTES_PER_MIB,
+            timeline["mem_stacks_B"] / BYTES_PER_MIB,
+            labels=["heap", "extra heap", "stacks"],
+            colors=['blue', 'orange', 'green'],
+            alpha=0.7,
+        )
+        peak = result["peak"]
+        ax.axvline(peak["time"], color='red', linestyle='--', linewidth=1, label="peak")
+        ax.set_title(full_id)
+        ax.set_xlabel(f"Time ({result['time_unit']})")
+        ax.set_ylabel("Memory (MiB)")
+        ax.grid(linestyle="--", alpha=0.7, color='grey')
+        ax.legend(loc="upper left", fontsize="small")
+    for ax in list(axes.flat)[num_programs:]:
+        ax.set_visible(False)
+
+    plt.tight_layout()
+    try:
+        plt.savefig(output_file, format='png', dpi=300, facecolor=fig.get_facecolor())
+        print(f"Plot saved successfully to {output_file}")
+    except Exception as e:
+        print(f"ERROR: Failed to save plot: {e}", file=sys.stderr)
+    plt.close(fig)
+
+
 def generate_markdown_table(df: pd.DataFrame) -> str:
     """Generates a Markdown table from the processed DataFrame."""
     # Use StringIO to build the table string efficiently
@@ -87,11 +369,12 @@ def generate_markdown_table(df: pd.DataFrame) -> str:
         massif_time_str = f"{massif_time:.2f}"
         time_overhead_str = f"{time_overhead:.2f}"
 
-        # Add placeholders for memory columns
-        mem_baseline = "---"
-        mem_massif = "---"
-        mem_overhead = "---"
-        largest_source = "---"
+        # Memory columns come from the massif.out peak snapshot
+        mem_baseline = format_value(row.get("peak_heap_mib"))
+        mem_massif = format_value(row.get("peak_total_mib"))
+        mem_overhead = format_value(row.get("memory_overhead_percent"))
+        largest_source = row.get("largest_source")
+        largest_source = f"`{largest_source}`" if largest_source else "---"
 
         md_string_io.write(
             f"| {program_id} | {baseline_time_str} | {massif_time_str} | {time_overhead_str} | {mem_baseline} | {mem_massif} | {mem_overhead} | {largest_source} |\n"
@@ -113,11 +396,15 @@ if __name__ == "__main__":
         sys.exit(1)
 
     results = []
-    log_files_found = 0
 
-    # --- Log Parsing ---
-    for log_file in SLURM_LOGS_DIR.glob("*.log"):
-        log_files_found += 1
+    # --- Log Parsing (unchanged logs come from the parse cache) ---
+    log_files = list(SLURM_LOGS_DIR.glob("*.log"))
+    log_files_found = len(log_files)
+    log_times = cached_parse(
+        [f for f in log_files if FILENAME_REGEX.match(f.name)],
+        extract_time_from_log, LOG_PARSER_VERSION, PARSE_CACHE_FILE,
+    )
+    for log_file in log_files:
         match = FILENAME_REGEX.match(log_file.name)
         if not match:
             print(
@@ -132,7 +419,7 @@ if __name__ == "__main__":
         full_id = f"{benchmark_name}_{identifier}"
 
         # print(f"Processing: {log_file.name} (Benchmark: {full_id}, Type: {run_type})")
-        real_time = extract_time_from_log(log_file)
+        real_time = log_times[log_file]
 
         if real_time is not None:
             results.append(
@@ -204,12 +491,20 @@ if __name__ == "__main__":
         axis=1,
     )
 
+    # --- Massif Output Parsing ---
+    print(f"\n--- Parsing massif outputs in: {MASSIF_OUTPUTS_DIR} ---")
+    massif_results = load_massif_results(MASSIF_OUTPUTS_DIR)
+    print(f"Parsed {len(massif_results)} massif output files.")
+    add_memory_columns(df_pivot, massif_results)
+
     print("\n--- Processed Data with Overhead ---")
     print(df_pivot)
 
     # --- Generate and Output Markdown Table ---
     print("\n--- Generating Markdown Summary Table ---")
     markdown_table = generate_markdown_table(df_pivot)
+    if massif_results:
+        markdown_table += generate_allocation_sites_markdown(massif_results)
     print(markdown_table) # Print to console
 
     if OUTPUT_MARKDOWN_FILE:
@@ -258,4 +553,7 @@ if __name__ == "__main__":
 
     plt.close(fig)
 
+    if massif_results:
+        plot_heap_timelines(massif_results, OUTPUT_HEAP_PLOT_FILE)
+
     print("\n--- Analysis Complete ---")
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+import re
+import math
+import pandas as pd
+import numpy as np
+import scipy.stats as stats
+import matplotlib.pyplot as plt
+from pathlib import Path
+from file_lines import iter_file_lines # Streaming line reader (file_lines.py next to this script)
+import sys
+import io
+
+# --- Configuration ---
+# *** Directory with the *_overhead.log files written by the overhead.py jobs ***
+OVERHEAD_BASE_DIR = Path("/scratch/cb761223/exercises/sheet04/overhead")
+SLURM_LOGS_DIR = OVERHEAD_BASE_DIR / "slurm_logs"
+
+# Output files
+OUTPUT_PLOT_FILE = OVERHEAD_BASE_DIR / "tool_overhead_high_dpi.png"
+OUTPUT_MARKDOWN_FILE = OVERHEAD_BASE_DIR / "tool_overhead_summary.md"
+OUTPUT_CSV_FILE = OVERHEAD_BASE_DIR / "tool_overhead.csv"
+
+# Regex to parse filenames (adjust if your naming changes)
+FILENAME_REGEX = re.compile(r"^(npb_bt|ssca2)_([A-Za-z0-9]+)_overhead\.log$")
+
+# One line per run, printed by the overhead.py Slurm script
+RUN_REGEX = re.compile(
+    r"^OVERHEAD_RUN round=(\d+) variant=(\S+) seconds=([\d.]+) exit=(\d+)\s*$"
+)
+
+
+# --- Helper Functions ---
+
+def parse_overhead_log(log_file: Path) -> list[dict]:
+    """Extracts the successful OVERHEAD_RUN lines of one log, streaming it line by line."""
+    try:
+        matches = [m for m in map(RUN_REGEX.match, iter_file_lines(log_file)) if m]
+    except Exception as e:
+        print(f"Warning: Error reading {log_file}: {e}", file=sys.stderr)
+        return []
+    runs = []
+    for match in matches:
+        round_num, variant, seconds, exit_code = match.groups()
+        if int(exit_code) != 0:
+            print(f"Warning: Ignoring failed run ({variant}, round {round_num}) in {log_file.name}", file=sys.stderr)
+            continue
+        runs.append({"round": int(round_num), "variant": variant, "seconds": float(seconds)})
+    return runs
+
+
+def overhead_ratio_stats(df_runs: pd.DataFrame) -> pd.DataFrame:
+    """
+    Overhead of every tool relative to the baseline run of the same round.
+    The ratios are paired per round and averaged on a log scale, so the result
+    is a geometric mean ratio with a 95% t confidence interval.
+    """
+    rows = []
+    pivot = df_runs.pivot_table(index=["full_id", "round"], columns="variant", values="seconds")
+    if "baseline" not in pivot.columns:
+        return pd.DataFrame()
+    for full_id, df_program in pivot.groupby(level="full_id"):
+        baseline = df_program["baseline"]
+        for tool in df_program.columns:
+            if tool == "baseline":
+                continue
+            paired = pd.concat([baseline, df_program[tool]], axis=1).dropna()
+            paired = paired[paired.iloc[:, 0] > 0]
+            if paired.empty:
+                continue
+            log_ratios = np.log(paired.iloc[:, 1] / paired.iloc[:, 0])
+            n = len(log_ratios)
+            mean = log_ratios.mean()
+            half_width = stats.t.ppf(0.975, n - 1) * log_ratios.std(ddof=1) / math.sqrt(n) if n > 1 else math.nan
+            rows.append({
+                "full_id": full_id,
+                "tool": tool,
+                "rounds": n,
+                "baseline_s": paired.iloc[:, 0].mean(),
+                "tool_s": paired.iloc[:, 1].mean(),
+                "ratio": math.exp(mean),
+                "ci_low": math.exp(mean - half_width),
+                "ci_high": math.exp(mean + half_width),
+            })
+    return pd.DataFrame(rows)
+
+
+def generate_markdown(df_stats: pd.DataFrame, df_ranking: pd.DataFrame) -> str:
+    """Per-program overhead table plus a ranking of the tools."""
+    md_io = io.StringIO()
+    md_io.write("# Instrumentation Tool Overhead\n\n")
+    md_io.write("Baseline and tool runs alternate in random order on the same node; the ratio "
+                "is the geometric mean of the per-round tool/baseline ratios with a "
+                "95% confidence interval.\n\n")
+    md_io.write("| Program | Tool | Rounds | Baseline (s) | With Tool (s) | Ratio | 95% CI | Overhead (%) |\n")
+    md_io.write("|---|---|---|---|---|---|---|---|\n")
+    for _, row in df_stats.iterrows():
+        ci = "---" if math.isnan(row["ci_low"]) else f"[{row['ci_low']:.2f}, {row['ci_high']:.2f}]"
+        md_io.write(
+            f"| {row['full_id']} | {row['tool']} | {row['rounds']} | {row['baseline_s']:.2f} | "
+            f"{row['tool_s']:.2f} | {row['ratio']:.2f} | {ci} | {(row['ratio'] - 1) * 100:.1f} |\n"
+        )
+    md_io.write("\n## Tools Ranked by Overhead\n\n")
+    md_io.write("Geometric mean of the ratios over all programs, cheapest first.\n\n")
+    md_io.write(df_ranking.to_markdown(floatfmt=".2f"))
+    md_io.write("\n")
+    return md_io.getvalue()
+
+
+def plot_overhead(df_stats: pd.DataFrame, output_file: Path):
+    """Grouped bar chart of the overhead ratios with their confidence intervals."""
+    print(f"\n--- Generating Plot: {output_file} ---")
+    plt.rcParams['figure.dpi'] = 150
+    fig, ax = plt.subplots(figsize=(14, 8))
+    fig.set_facecolor('white')
+
+    programs = sorted(df_stats["full_id"].unique())
+    tools = list(dict.fromkeys(df_stats["tool"]))
+    width = 0.8 / len(tools)
+    x = np.arange(len(programs))
+    colors = plt.cm.tab10(np.linspace(0, 1, len(tools)))
+    for i, tool in enumerate(tools):
+        df_tool = df_stats[df_stats["tool"] == tool].set_index("full_id").reindex(programs)
+        errors = np.vstack([
+            (df_tool["ratio"] - df_tool["ci_low"]).fillna(0),
+            (df_tool["ci_high"] - df_tool["ratio"]).fillna(0),
+        ])
+        ax.bar(x + i * width - 0.4 + width / 2, df_tool["ratio"], width, yerr=errors,
+               capsize=3, label=tool, color=colors[i])
+
+    ax.axhline(1.0, color='black', linewidth=1)
+    ax.set_yscale("log")
+    ax.set_xticks(x)
+    ax.set_xticklabels(programs, rotation=45)
+    ax.set_title("Instrumentation Overhead (tool / baseline run time)")
+    ax.set_xlabel("Benchmark and Identifier/Scale")
+    ax.set_ylabel("Run Time Ratio (log scale)")
+    ax.grid(axis="y", linestyle="--", alpha=0.7, color='grey')
+    ax.legend(title="Tool")
+    plt.tight_layout()
+    try:
+        plt.savefig(output_file, format='png', dpi=300, facecolor=fig.get_facecolor())
+        print(f"Plot saved successfully to {output_file}")
+    except Exception as e:
+        print(f"ERROR: Failed to save plot: {e}", file=sys.stderr)
+    plt.close(fig)
+
+
+# --- Main Execution ---
+
+if __name__ == "__main__":
+    print(f"--- Analyzing overhead logs in: {SLURM_LOGS_DIR} ---")
+
+    if not SLURM_LOGS_DIR.is_dir():
+        print(f"ERROR: Log directory not found: {SLURM_LOGS_DIR}", file=sys.stderr)
+        sys.exit(1)
+
+    results = []
+    for log_file in sorted(SLURM_LOGS_DIR.glob("*_overhead.log")):
+        match = FILENAME_REGEX.match(log_file.name)
+        if not match:
+            print(f"Warning: Skipping file with unexpected name: {log_file.name}", file=sys.stderr)
+            continue
+        full_id = f"{match.group(1)}_{match.group(2)}"
+        for run in parse_overhead_log(log_file):
+            results.append({"full_id": full_id, **run})
+
+    if not results:
+        print("\nERROR: No OVERHEAD_RUN lines found in any log file.", file=sys.stderr)
+        sys.exit(1)
+
+    df_runs = pd.DataFrame(results)
+    df_stats = overhead_ratio_stats(df_runs)
+    if df_stats.empty:
+        print("\nERROR: No rounds with both a baseline and a tool run.", file=sys.stderr)
+        sys.exit(1)
+
+    df_ranking = (
+        df_stats.assign(log_ratio=np.log(df_stats["ratio"]))
+        .groupby("tool")["log_ratio"].mean().apply(math.exp)
+        .sort_values().to_frame("Geo. Mean Ratio")
+    )
+
+    print("\n--- Overhead per Program and Tool ---")
+    print(df_stats.to_string(index=False, float_format="%.3f"))
+    print("\n--- Tools Ranked by Overhead ---")
+    print(df_ranking.to_string(float_format="%.2f"))
+
+    df_stats.to_csv(OUTPUT_CSV_FILE, index=False, float_format="%.4f")
+    print(f"\nOverhead table saved to {OUTPUT_CSV_FILE}")
+
+    markdown = generate_markdown(df_stats, df_ranking)
+    try:
+        OUTPUT_MARKDOWN_FILE.write_text(markdown)
+        print(f"Markdown summary saved successfully to {OUTPUT_MARKDOWN_FILE}")
+    except Exception as e:
+        print(f"ERROR: Failed to save markdown summary: {e}", file=sys.stderr)
+
+    plot_overhead(df_stats, OUTPUT_PLOT_FILE)
+
+    print("\n--- Analysis Complete ---")
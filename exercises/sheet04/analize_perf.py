@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
 
 import re
+import os
 import pandas as pd
 import numpy as np # Make sure NumPy is imported
 import matplotlib.pyplot as plt
 from pathlib import Path
+from file_lines import iter_file_lines # Streaming line reader (file_lines.py next to this script)
 import sys
 import io
 import math
+import roofline # Roofline ceilings per host (roofline.py next to this script)
+from parse_cache import cached_parse # SQLite parse cache (parse_cache.py next to this script)
 # Removed base64 import as it's no longer needed
 
 # --- Configuration ---
@@ -19,11 +23,17 @@ PERF_OUTPUTS_DIR = PERF_BASE_DIR / "perf_outputs"
 # Output directory for plots and the final report
 REPORT_OUTPUT_DIR = PERF_BASE_DIR / "analysis_report"
 REPORT_OUTPUT_DIR.mkdir(exist_ok=True)
+# SQLite index of parsed files; unchanged files are not parsed again (None disables it)
+PARSE_CACHE_FILE = PERF_BASE_DIR / "parse_cache.sqlite"
+# Bump when a parser's output changes so cached results are re-parsed
+LOG_PARSER_VERSION = 1
+PERF_PARSER_VERSION = 1
 
 # Output files
 OUTPUT_TIME_PLOT_FILE = REPORT_OUTPUT_DIR / "perf_time_perturbation.png"
 OUTPUT_REL_METRICS_PLOT_FILE = REPORT_OUTPUT_DIR / "relative_metrics_comparison.png"
 OUTPUT_MARKDOWN_FILE = REPORT_OUTPUT_DIR / "perf_analysis_summary.md"
+OUTPUT_ROOFLINE_PLOT_PATTERN = "roofline_{host}.png" # One roofline plot per compute node
 
 # Regex to parse Slurm log filenames
 SLURM_FILENAME_REGEX = re.compile(
@@ -37,6 +47,8 @@ PERF_FILENAME_REGEX = re.compile(
 
 # Regex to find the 'real' time output from the `time` command in Slurm logs
 TIME_REGEX = re.compile(r"^\s*real\s+(\d+)m([\d.]+)s", re.MULTILINE)
+# Regex to find the compute node a Slurm job ran on
+HOST_REGEX = re.compile(r"^Running on host: (\S+)")
 
 # Regex to extract perf counter values
 PERF_COUNTER_REGEX = re.compile(
@@ -46,6 +58,19 @@ PERF_NOT_SUPPORTED_REGEX = re.compile(
     r"^\s*<not supported>\s+([\w-]+(?:[:\.,]\w+)*)\s*.*$", re.MULTILINE
 )
 
+# Machine-readable `perf stat -x,` output. Each row is
+#   value,unit,event[,noise%],time_running_ns,running_pct[,metric_value,metric_unit]
+# where the noise column is only present when perf stat ran with -r.
+PERF_CSV_SEPARATOR = ","
+# perf stat scales multiplexed counts by time_enabled/time_running unless it ran
+# with --no-scale. Set to False for raw (unscaled) CSV output so the scaling is
+# applied here instead.
+PERF_CSV_COUNTS_ARE_SCALED = True
+# Counters that ran for less than this share of their enabled time were multiplexed
+MULTIPLEX_WARNING_PCT = 100.0
+# Worker processes used to parse the perf output files in parallel
+PARSE_WORKERS = min(8, os.cpu_count() or 1)
+
 # Define ALL counters we might be interested in, based on user request
 ALL_TARGET_COUNTERS = [
     "L1-dcache-load-misses", "L1-dcache-loads",
@@ -64,19 +89,58 @@ ALL_TARGET_COUNTERS = [
     "node-store-misses", "node-stores",
     # Add instructions and cycles if available and needed for CPI etc.
     "instructions", "cycles"
-]
-
-# Define the counters needed as denominators for relative metrics calculation
-# This helps ensure we check for their existence and non-zero value
-REQUIRED_DENOMINATORS = [
-    "L1-dcache-loads", "L1-dcache-stores", "L1-dcache-prefetches",
-    "L1-icache-loads",
-    "LLC-loads", "LLC-stores", "LLC-prefetches",
-    "branch-loads",
-    "dTLB-loads", "dTLB-stores",
-    "iTLB-loads",
-    "node-loads", "node-stores", "node-prefetches",
-]
+] + list(roofline.ROOFLINE_FLOP_EVENTS) # FLOP counters for the roofline
+
+# Derived metrics: name -> definition. "num" and "den" are expressions over the
+# aggregated counter columns, with counter names in backticks (DataFrame.eval
+# syntax). The result is scale * num / den; rates in % are 0 when both are 0.
+# Counters listed in "optional" count as 0 when unsupported or not measured
+# (store events are missing on many CPUs); such values are marked loads-only.
+# Adding a metric only needs a new entry here.
+LOAD_ACCESS_BYTES = 8  # Average bytes per load/store, used for the TLB reach estimate
+DERIVED_METRICS = {
+    "L1d_Load_Miss_Rate": {"num": "`L1-dcache-load-misses`", "den": "`L1-dcache-loads`", "scale": 100, "unit": "%"},
+    "L1d_Store_Miss_Rate": {"num": "`L1-dcache-store-misses`", "den": "`L1-dcache-stores`", "scale": 100, "unit": "%"},
+    "L1d_Prefetch_Miss_Rate": {"num": "`L1-dcache-prefetch-misses`", "den": "`L1-dcache-prefetches`", "scale": 100, "unit": "%"},
+    "L1i_Load_Miss_Rate": {"num": "`L1-icache-load-misses`", "den": "`L1-icache-loads`", "scale": 100, "unit": "%"},
+    "LLC_Load_Miss_Rate": {"num": "`LLC-load-misses`", "den": "`LLC-loads`", "scale": 100, "unit": "%"},
+    "LLC_Store_Miss_Rate": {"num": "`LLC-store-misses`", "den": "`LLC-stores`", "scale": 100, "unit": "%"},
+    "LLC_Prefetch_Miss_Rate": {"num": "`LLC-prefetch-misses`", "den": "`LLC-prefetches`", "scale": 100, "unit": "%"},
+    "Branch_Load_Miss_Rate": {"num": "`branch-load-misses`", "den": "`branch-loads`", "scale": 100, "unit": "%",
+                              "note": "This might represent branch *misses* if `branch-misses` event was used instead of `branch-load-misses`"},
+    "dTLB_Load_Miss_Rate": {"num": "`dTLB-load-misses`", "den": "`dTLB-loads`", "scale": 100, "unit": "%"},
+    "dTLB_Store_Miss_Rate": {"num": "`dTLB-store-misses`", "den": "`dTLB-stores`", "scale": 100, "unit": "%"},
+    "iTLB_Load_Miss_Rate": {"num": "`iTLB-load-misses`", "den": "`iTLB-loads`", "scale": 100, "unit": "%"},
+    "Node_Load_Miss_Rate": {"num": "`node-load-misses`", "den": "`node-loads`", "scale": 100, "unit": "%",
+                            "note": "Often relates to NUMA remote memory accesses"},
+    "Node_Store_Miss_Rate": {"num": "`node-store-misses`", "den": "`node-stores`", "scale": 100, "unit": "%",
+                             "note": "Often relates to NUMA remote memory accesses"},
+    "Node_Prefetch_Miss_Rate": {"num": "`node-prefetch-misses`", "den": "`node-prefetches`", "scale": 100, "unit": "%",
+                                "note": "Often relates to NUMA remote memory accesses"},
+    "CPI": {"num": "`cycles`", "den": "`instructions`", "scale": 1, "unit": "cycles/instruction",
+            "note": "Lower is generally better"},
+    "IPC": {"num": "`instructions`", "den": "`cycles`", "scale": 1, "unit": "instructions/cycle"},
+    "L1d_MPKI": {"num": "`L1-dcache-load-misses` + `L1-dcache-store-misses`", "den": "`instructions`",
+                 "scale": 1000, "unit": "misses/1000 instructions", "optional": ["L1-dcache-store-misses"]},
+    "LLC_MPKI": {"num": "`LLC-load-misses` + `LLC-store-misses`", "den": "`instructions`",
+                 "scale": 1000, "unit": "misses/1000 instructions", "optional": ["LLC-store-misses"]},
+    "dTLB_MPKI": {"num": "`dTLB-load-misses` + `dTLB-store-misses`", "den": "`instructions`",
+                  "scale": 1000, "unit": "misses/1000 instructions", "optional": ["dTLB-store-misses"]},
+    "dTLB_Effective_Reach_KiB": {"num": "`dTLB-loads` + `dTLB-stores`", "den": "`dTLB-load-misses` + `dTLB-store-misses`",
+                                 "scale": LOAD_ACCESS_BYTES / 1024, "unit": "KiB",
+                                 "optional": ["dTLB-stores", "dTLB-store-misses"],
+                                 "note": f"Bytes accessed per dTLB miss, assuming {LOAD_ACCESS_BYTES} bytes per access"},
+}
+
+# Counter names referenced by a metric expression
+COUNTER_REFERENCE_REGEX = re.compile(r"`([^`]+)`")
+
+# The counters needed as denominators for relative metrics calculation, derived
+# from DERIVED_METRICS so we can check for their existence and non-zero value
+REQUIRED_DENOMINATORS = sorted({
+    counter for metric in DERIVED_METRICS.values()
+    for counter in COUNTER_REFERENCE_REGEX.findall(metric["den"])
+})
 
 
 # --- Helper Functions ---
@@ -99,12 +163,33 @@ def extract_time_from_log(log_file: Path) -> float | None:
         print(f"Warning: Slurm log file not found: {log_file}", file=sys.stderr)
         return None
     try:
-        content = log_file.read_text()
-        return parse_time_to_seconds(content)
+        for line in iter_file_lines(log_file):
+            seconds = parse_time_to_seconds(line)
+            if seconds is not None:
+                return seconds
+        return None
     except Exception as e:
         print(f"Warning: Error reading/parsing Slurm log {log_file}: {e}", file=sys.stderr)
         return None
 
+def extract_host_from_log(log_file: Path) -> str | None:
+    """Reads a Slurm log file and extracts the host the job ran on."""
+    try:
+        for line in iter_file_lines(log_file):
+            match = HOST_REGEX.match(line)
+            if match:
+                return roofline.short_hostname(match.group(1)) # Same key as the ceiling cache
+    except Exception as e:
+        print(f"Warning: Error reading Slurm log {log_file}: {e}", file=sys.stderr)
+    return None
+
+def parse_slurm_log(log_file: Path) -> dict | None:
+    """Run time and host of one Slurm log, or None if the log has no time (yet)."""
+    real_time = extract_time_from_log(log_file)
+    if real_time is None:
+        return None
+    return {"time_seconds": real_time, "host": extract_host_from_log(log_file)}
+
 def parse_perf_output(perf_file: Path) -> dict[str, float]:
     """Reads a perf output file and extracts counter values."""
     counters = {}
@@ -112,9 +197,17 @@ def parse_perf_output(perf_file: Path) -> dict[str, float]:
         print(f"Warning: Perf output file not found: {perf_file}", file=sys.stderr)
         return counters
     try:
-        content = perf_file.read_text()
-        # Find numeric values
-        for match in PERF_COUNTER_REGEX.finditer(content):
+        not_supported = []
+        for line in iter_file_lines(perf_file):
+            # Remember <not supported> events and mark them as NaN at the end
+            match = PERF_NOT_SUPPORTED_REGEX.match(line)
+            if match:
+                not_supported.append(match.group(1).strip())
+                continue
+            # Find numeric values
+            match = PERF_COUNTER_REGEX.match(line)
+            if not match:
+                continue
             try:
                 value_str = match.group(1).replace(",", "")
                 value = float(value_str)
@@ -127,9 +220,8 @@ def parse_perf_output(perf_file: Path) -> dict[str, float]:
             except ValueError:
                 print(f"Warning: Could not parse value in {perf_file} for line: {match.group(0)}", file=sys.stderr)
                 continue
-        # Find <not supported> events and mark them as NaN
-        for match in PERF_NOT_SUPPORTED_REGEX.finditer(content):
-             event = match.group(1).strip()
+        # Mark <not supported> events as NaN
+        for event in not_supported:
              event_base = event.split(':')[0]
              if event_base not in counters: # Only mark as NaN if no numeric value was found
                  counters[event_base] = math.nan
@@ -138,63 +230,169 @@ def parse_perf_output(perf_file: Path) -> dict[str, float]:
         print(f"Warning: Error reading/parsing perf output {perf_file}: {e}", file=sys.stderr)
     return counters
 
-def calculate_relative_metrics(row: pd.Series) -> pd.Series:
-    """Calculates relative metrics from aggregated counter columns."""
-    # Define all potential metrics
-    metric_names = [
-        'L1d_Load_Miss_Rate', 'L1d_Store_Miss_Rate', 'L1d_Prefetch_Miss_Rate',
-        'L1i_Load_Miss_Rate',
-        'LLC_Load_Miss_Rate', 'LLC_Store_Miss_Rate', 'LLC_Prefetch_Miss_Rate',
-        'Branch_Load_Miss_Rate', # Or Misprediction Rate if using branch-misses
-        'dTLB_Load_Miss_Rate', 'dTLB_Store_Miss_Rate',
-        'iTLB_Load_Miss_Rate',
-        'Node_Load_Miss_Rate', 'Node_Store_Miss_Rate', 'Node_Prefetch_Miss_Rate',
-        'CPI' # Cycles Per Instruction
-    ]
-    metrics = pd.Series(index=metric_names, dtype=float)
-
-    # Helper function for safe division (rate calculation)
-    def safe_rate(num_event, den_event):
-        num = row.get(num_event)
-        den = row.get(den_event)
-        # Ensure denominator exists, is not NaN, and is greater than 0
-        # Ensure numerator exists and is not NaN
-        if pd.notna(den) and den > 0 and pd.notna(num):
-            return (num / den) * 100
-        elif pd.notna(den) and den == 0 and pd.notna(num) and num == 0:
-             return 0.0 # If both are zero, rate is 0%
-        else:
-            # Return NaN if calculation is not possible
-            # (missing counter, NaN counter, or zero denominator with non-zero numerator)
-            return math.nan
-
-    # Helper function for safe division (ratio calculation, e.g., CPI)
-    def safe_ratio(num_event, den_event):
-        num = row.get(num_event)
-        den = row.get(den_event)
-        if pd.notna(den) and den > 0 and pd.notna(num):
-            return num / den
-        else:
-            return math.nan
-
-    # Calculate each metric
-    metrics['L1d_Load_Miss_Rate'] = safe_rate('L1-dcache-load-misses', 'L1-dcache-loads')
-    metrics['L1d_Store_Miss_Rate'] = safe_rate('L1-dcache-store-misses', 'L1-dcache-stores')
-    metrics['L1d_Prefetch_Miss_Rate'] = safe_rate('L1-dcache-prefetch-misses', 'L1-dcache-prefetches')
-    metrics['L1i_Load_Miss_Rate'] = safe_rate('L1-icache-load-misses', 'L1-icache-loads')
-    metrics['LLC_Load_Miss_Rate'] = safe_rate('LLC-load-misses', 'LLC-loads')
-    metrics['LLC_Store_Miss_Rate'] = safe_rate('LLC-store-misses', 'LLC-stores')
-    metrics['LLC_Prefetch_Miss_Rate'] = safe_rate('LLC-prefetch-misses', 'LLC-prefetches')
-    metrics['Branch_Load_Miss_Rate'] = safe_rate('branch-load-misses', 'branch-loads')
-    metrics['dTLB_Load_Miss_Rate'] = safe_rate('dTLB-load-misses', 'dTLB-loads')
-    metrics['dTLB_Store_Miss_Rate'] = safe_rate('dTLB-store-misses', 'dTLB-stores')
-    metrics['iTLB_Load_Miss_Rate'] = safe_rate('iTLB-load-misses', 'iTLB-loads')
-    metrics['Node_Load_Miss_Rate'] = safe_rate('node-load-misses', 'node-loads')
-    metrics['Node_Store_Miss_Rate'] = safe_rate('node-store-misses', 'node-stores')
-    metrics['Node_Prefetch_Miss_Rate'] = safe_rate('node-prefetch-misses', 'node-prefetches')
-    metrics['CPI'] = safe_ratio('cycles', 'instructions')
-
-    return metrics
+def is_perf_csv_output(perf_file: Path) -> bool:
+    """Checks whether a perf output file was written by `perf stat -x,`."""
+    try:
+        with open(perf_file, "r", errors="ignore") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                return len(line.split(PERF_CSV_SEPARATOR)) >= 5
+    except Exception as e:
+        print(f"Warning: Error reading perf output {perf_file}: {e}", file=sys.stderr)
+    return False
+
+def parse_perf_csv_line(line: str) -> tuple[str, float, float, float] | None:
+    """
+    Parses one `perf stat -x,` row into (event_base, count, variance, running_pct).
+    Unsupported or uncounted events yield a NaN count. The variance is derived from
+    the relative noise perf prints with -r (NaN without -r).
+    """
+    fields = [field.strip() for field in line.rstrip("\n").split(PERF_CSV_SEPARATOR)]
+    if len(fields) < 5:
+        return None
+    value_str, event = fields[0], fields[2]
+    rest = fields[3:]
+    noise_pct = math.nan
+    if rest and rest[0].endswith("%"):
+        try:
+            noise_pct = float(rest[0].rstrip("%"))
+        except ValueError:
+            pass
+        rest = rest[1:]
+    try:
+        running_pct = float(rest[1]) if len(rest) > 1 and rest[1] else 100.0
+    except ValueError:
+        running_pct = 100.0
+
+    event_base = event.split(':')[0]
+    if not event_base:
+        return None
+    try:
+        count = float(value_str)
+    except ValueError:
+        # <not supported> / <not counted>
+        return event_base, math.nan, math.nan, 0.0
+
+    if not PERF_CSV_COUNTS_ARE_SCALED and 0 < running_pct < 100:
+        count = count * 100.0 / running_pct
+    variance = (noise_pct / 100.0 * count) ** 2 if not math.isnan(noise_pct) else math.nan
+    return event_base, count, variance, running_pct
+
+def parse_perf_csv_output(perf_file: Path) -> tuple[dict[str, float], dict[str, float], dict[str, float]]:
+    """
+    Reads a `perf stat -x,` output file line by line.
+    Returns (counters, variances, running_pct) keyed by base event name; the
+    :u/:k variants of an event are summed like in parse_perf_output.
+    """
+    counters, variances, running = {}, {}, {}
+    with open(perf_file, "r", errors="ignore") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            parsed = parse_perf_csv_line(line)
+            if parsed is None:
+                continue
+            event_base, count, variance, running_pct = parsed
+            running[event_base] = min(running.get(event_base, 100.0), running_pct)
+            if math.isnan(count):
+                counters.setdefault(event_base, math.nan)
+                continue
+            if math.isnan(counters.get(event_base, 0.0)):
+                counters[event_base] = 0.0
+            counters[event_base] = counters.get(event_base, 0.0) + count
+            if not math.isnan(variance):
+                variances[event_base] = variances.get(event_base, 0.0) + variance
+    return counters, variances, running
+
+def parse_perf_record(perf_file: Path):
+    """
+    Parses one perf output file (human-readable or -x, CSV).
+    Returns (full_id, group_num, counters, variances, running_pct) or None.
+    """
+    match = PERF_FILENAME_REGEX.match(perf_file.name)
+    if not match:
+        return None
+    benchmark, identifier, group_num_str = match.group(1), match.group(2), match.group(3)
+    try:
+        group_num = int(group_num_str)
+    except ValueError:
+        print(f"Warning: Invalid group number in filename {perf_file.name}", file=sys.stderr)
+        return None
+
+    full_id = f"{benchmark}_{identifier}"
+    if is_perf_csv_output(perf_file):
+        try:
+            counters, variances, running = parse_perf_csv_output(perf_file)
+        except Exception as e:
+            print(f"Warning: Error reading/parsing perf CSV output {perf_file}: {e}", file=sys.stderr)
+            return None
+    else:
+        counters, variances, running = parse_perf_output(perf_file), {}, {}
+    if not counters:
+        print(f"Warning: No counters extracted from {perf_file.name}", file=sys.stderr)
+        return None
+    return full_id, group_num, counters, variances, running
+
+def iter_perf_records(perf_files):
+    """
+    Streams the parsed perf output files, parsing new or changed ones in parallel
+    worker processes and taking the rest from the parse cache.
+    Yields (full_id, group_num, counters, variances, running_pct) per file.
+    """
+    perf_files = list(perf_files)
+    if not perf_files:
+        return
+    records = cached_parse(perf_files, parse_perf_record, PERF_PARSER_VERSION,
+                           PARSE_CACHE_FILE, workers=PARSE_WORKERS)
+    for record in records.values():
+        if record is not None:
+            yield record
+
+def metric_required_counters(metrics: dict = DERIVED_METRICS) -> dict[str, list[str]]:
+    """Returns the counters each derived metric needs, in expression order."""
+    return {
+        name: list(dict.fromkeys(COUNTER_REFERENCE_REGEX.findall(metric["num"] + " " + metric["den"])))
+        for name, metric in metrics.items()
+    }
+
+def evaluate_metric_expression(df: pd.DataFrame, expression: str, optional=()) -> np.ndarray:
+    """
+    Evaluates a counter expression for all rows at once, NaN for missing
+    counters except the optional ones, which count as 0.
+    """
+    counters = COUNTER_REFERENCE_REGEX.findall(expression)
+    frame = df.reindex(columns=list(dict.fromkeys(counters))).astype(float)
+    optional = [c for c in optional if c in frame.columns]
+    frame[optional] = frame[optional].fillna(0.0)
+    return np.asarray(frame.eval(expression, engine="python"), dtype=float)
+
+def calculate_relative_metrics(df: pd.DataFrame, metrics: dict = DERIVED_METRICS) -> pd.DataFrame:
+    """
+    Calculates all derived metrics from aggregated counter columns, vectorized
+    over the rows. Division is NaN-safe: a missing or NaN counter, or a zero
+    denominator with a non-zero numerator, gives NaN. Rows whose value lacks an
+    optional counter are listed per metric in the result's attrs["loads_only"].
+    """
+    results = {}
+    loads_only = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for name, metric in metrics.items():
+            optional = metric.get("optional", [])
+            num = evaluate_metric_expression(df, metric["num"], optional)
+            den = evaluate_metric_expression(df, metric["den"], optional)
+            valid = np.isfinite(num) & np.isfinite(den) & (den > 0)
+            values = np.where(valid, num / np.where(valid, den, 1.0) * metric["scale"], np.nan)
+            if metric["unit"] == "%":
+                values[(num == 0) & (den == 0)] = 0.0  # If both are zero, rate is 0%
+            results[name] = values
+            if optional:
+                lacking = df.reindex(columns=optional).isna().any(axis=1).to_numpy() & valid
+                if lacking.any():
+                    loads_only[name] = list(df.index[lacking])
+    df_metrics = pd.DataFrame(results, index=df.index)
+    df_metrics.attrs["loads_only"] = loads_only
+    return df_metrics
 
 def plot_time_comparison(df_times: pd.DataFrame, output_file: Path):
     """Generates a bar plot comparing baseline and perf run times."""
@@ -303,7 +501,7 @@ def plot_relative_metrics(df_metrics: pd.DataFrame, output_file: Path):
 
             df_metrics_plot[metric].plot(kind='bar', ax=ax, color=colors, rot=0)
             ax.set_title(metric.replace('_', ' '))
-            ax.set_ylabel("Rate (%)" if is_rate else "Value") # Adjust label
+            ax.set_ylabel("Rate (%)" if is_rate else DERIVED_METRICS.get(metric, {}).get("unit", "Value")) # Adjust label
             ax.grid(axis="y", linestyle="--", alpha=0.7, color='grey')
 
             if ax.containers:
@@ -366,6 +564,10 @@ if __name__ == "__main__":
     print("\n--- Parsing Slurm Logs for Execution Times ---")
     log_files = list(SLURM_LOGS_DIR.glob("*.log"))
     print(f"Found {len(log_files)} files in {SLURM_LOGS_DIR}")
+    log_records = cached_parse(
+        [f for f in log_files if SLURM_FILENAME_REGEX.match(f.name)],
+        parse_slurm_log, LOG_PARSER_VERSION, PARSE_CACHE_FILE, workers=PARSE_WORKERS,
+    )
     for log_file in log_files:
         match = SLURM_FILENAME_REGEX.match(log_file.name)
         if not match:
@@ -373,19 +575,17 @@ if __name__ == "__main__":
             continue
         benchmark, identifier, run_type_full = match.group(1), match.group(2), match.group(3)
         full_id = f"{benchmark}_{identifier}"
-        real_time = extract_time_from_log(log_file)
-        if real_time is not None:
-            # print(f"DEBUG: Found time for {full_id} ({run_type_full}): {real_time:.2f}s")
-            time_results.append({
-                "full_id": full_id, "type": run_type_full, "time_seconds": real_time,
-            })
+        log_record = log_records[log_file]
+        if log_record is not None:
+            # print(f"DEBUG: Found time for {full_id} ({run_type_full}): {log_record['time_seconds']:.2f}s")
+            time_results.append({"full_id": full_id, "type": run_type_full, **log_record})
         else:
              print(f"Warning: Could not extract time from {log_file.name}", file=sys.stderr)
 
     if not time_results:
         print("WARNING: No execution times could be extracted from Slurm logs.", file=sys.stderr)
         # Don't exit, maybe perf data is still useful
-        df_times = pd.DataFrame(columns=["full_id", "type", "time_seconds"]) # Create empty df
+        df_times = pd.DataFrame(columns=["full_id", "type", "time_seconds", "host"]) # Create empty df
     else:
         df_times = pd.DataFrame(time_results)
         print(f"Successfully parsed time results for {len(df_times)} runs.")
@@ -396,27 +596,16 @@ if __name__ == "__main__":
     print("\n--- Parsing Perf Output Files for Counters ---")
     perf_files = list(PERF_OUTPUTS_DIR.glob("perf.out.*"))
     print(f"Found {len(perf_files)} files in {PERF_OUTPUTS_DIR}")
-    for perf_file in perf_files:
-        match = PERF_FILENAME_REGEX.match(perf_file.name)
-        if not match:
-            # print(f"DEBUG: Skipping file (no regex match): {perf_file.name}")
-            continue
-        benchmark, identifier, group_num_str = match.group(1), match.group(2), match.group(3)
-        try:
-            group_num = int(group_num_str)
-        except ValueError:
-            print(f"Warning: Invalid group number in filename {perf_file.name}", file=sys.stderr)
-            continue
-
-        full_id = f"{benchmark}_{identifier}"
-        counters = parse_perf_output(perf_file)
-        if counters:
-            # print(f"DEBUG: Parsed counters for {full_id} (grp {group_num}): {list(counters.keys())}")
-            record = {"full_id": full_id, "group_num": group_num, **counters}
-            perf_results.append(record)
-            all_found_counters.update(counters.keys())
-        else:
-            print(f"Warning: No counters extracted from {perf_file.name}", file=sys.stderr)
+    variance_results = []
+    running_results = []
+    for full_id, group_num, counters, variances, running in iter_perf_records(perf_files):
+        # print(f"DEBUG: Parsed counters for {full_id} (grp {group_num}): {list(counters.keys())}")
+        perf_results.append({"full_id": full_id, "group_num": group_num, **counters})
+        all_found_counters.update(counters.keys())
+        if variances:
+            variance_results.append({"full_id": full_id, "group_num": group_num, **variances})
+        if running:
+            running_results.append({"full_id": full_id, "group_num": group_num, **running})
 
     if not perf_results:
         print("ERROR: No performance counter data could be extracted from perf output files. Exiting.", file=sys.stderr)
@@ -451,6 +640,31 @@ if __name__ == "__main__":
         # Display with nice formatting for large numbers, showing N/A for NaN
         print(df_perf_agg.to_string(max_rows=20, float_format="{:,.0f}".format))
 
+    # Variances (perf stat -r) of independent groups add up like the counts do
+    df_perf_var = pd.DataFrame()
+    if variance_results:
+        df_var_raw = pd.DataFrame(variance_results)
+        var_cols = [c for c in counters_to_aggregate if c in df_var_raw.columns]
+        if var_cols:
+            df_perf_var = df_var_raw.groupby("full_id")[var_cols].sum(min_count=1)
+            print("\n--- Counter Standard Deviation (from perf stat -r) ---")
+            print(np.sqrt(df_perf_var).to_string(max_rows=20, float_format="{:,.0f}".format))
+
+    # Share of the enabled time each counter was actually running (<100% = multiplexed)
+    df_perf_running = pd.DataFrame()
+    if running_results:
+        df_running_raw = pd.DataFrame(running_results)
+        running_cols = [c for c in counters_to_aggregate if c in df_running_raw.columns]
+        if running_cols:
+            df_perf_running = df_running_raw.groupby("full_id")[running_cols].min()
+            multiplexed = df_perf_running.lt(MULTIPLEX_WARNING_PCT) & df_perf_running.gt(0)
+            if multiplexed.any().any():
+                scaled_how = "were scaled by perf" if PERF_CSV_COUNTS_ARE_SCALED else "were scaled here"
+                print(f"\nWARNING: Some counters were multiplexed; their counts {scaled_how} "
+                      f"by time_enabled/time_running and are estimates:")
+                print(df_perf_running.where(multiplexed).dropna(how='all').dropna(axis=1, how='all')
+                      .to_string(float_format="%.2f"))
+
     # --- 4. Calculate Time Overhead ---
     print("\n--- Calculating Time Overhead ---")
     if df_times.empty:
@@ -506,13 +720,46 @@ if __name__ == "__main__":
         print("WARNING: Aggregated perf data is empty, cannot calculate relative metrics.")
         df_relative_metrics = pd.DataFrame() # Empty DataFrame
     else:
-        df_relative_metrics = df_perf_agg.apply(calculate_relative_metrics, axis=1)
+        available = set(df_perf_agg.columns)
+        for metric, counters in metric_required_counters().items():
+            optional = DERIVED_METRICS[metric].get("optional", [])
+            missing = [c for c in counters if c not in available and c not in optional]
+            missing_optional = [c for c in optional if c not in available]
+            if missing:
+                print(f"INFO: {metric} cannot be calculated, missing counters: {', '.join(missing)}")
+            elif missing_optional:
+                print(f"INFO: {metric} is loads-only, missing counters: {', '.join(missing_optional)}")
+        df_relative_metrics = calculate_relative_metrics(df_perf_agg)
         print("\n--- Calculated Relative Metrics (%) ---")
         if df_relative_metrics.empty:
             print("WARNING: Relative metrics DataFrame is empty after calculation.")
         else:
             print(df_relative_metrics.to_string(float_format="%.3f")) # Increased precision
 
+    # --- 5b. Roofline ---
+    # Achieved GFLOP/s uses the baseline run time; counters come from the perf runs
+    print("\n--- Roofline Analysis ---")
+    df_roofline = pd.DataFrame()
+    roofline_plots = {} # host -> plot file
+    if df_perf_agg.empty or not any(e in df_perf_agg.columns for e in roofline.ROOFLINE_FLOP_EVENTS):
+        print(f"INFO: No FLOP counters ({', '.join(roofline.ROOFLINE_FLOP_EVENTS)}) found, skipping the roofline.")
+    else:
+        df_roofline = roofline.compute_roofline_points(df_perf_agg, df_times_pivot['baseline'])
+        run_hosts = df_times.dropna(subset=["host"]).groupby("full_id")["host"].agg(lambda h: h.mode().iloc[0])
+        df_roofline["host"] = run_hosts.reindex(df_roofline.index)
+        df_roofline["bound"] = "n/a"
+        for host, df_host in df_roofline.groupby("host"):
+            ceilings = roofline.get_ceilings(host)
+            if ceilings is None:
+                print(f"Warning: No roofline ceilings cached for {host}; run roofline.py on that node "
+                      f"(perf.py generates a job for it).", file=sys.stderr)
+                continue
+            df_roofline.loc[df_host.index, "bound"] = roofline.classify_bound(df_host, ceilings)
+            plot_file = REPORT_OUTPUT_DIR / OUTPUT_ROOFLINE_PLOT_PATTERN.format(host=host)
+            roofline.plot_roofline(df_roofline.loc[df_host.index], ceilings, host, plot_file)
+            roofline_plots[host] = plot_file
+        print(df_roofline.to_string(float_format="%.3g"))
+
     # --- 6. Generate Plots ---
     # Pass the potentially modified df_times_pivot which is aligned with perf data index
     plot_time_comparison(df_times_pivot.reset_index().melt(id_vars='full_id', var_name='type', value_name='time_seconds'), OUTPUT_TIME_PLOT_FILE)
@@ -570,6 +817,18 @@ if __name__ == "__main__":
             print(f"ERROR: Failed to generate Aggregated Counters Markdown table: {e}", file=sys.stderr)
             md_io.write(f"*Error generating raw counters table: {e}*\n\n")
 
+    # --- Counter Uncertainty Tables (perf stat -x, output only) ---
+    if not df_perf_var.empty:
+        md_io.write("### Counter Standard Deviation\n\n")
+        md_io.write("Standard deviation of each aggregated counter across the `perf stat -r` repetitions (variances of the groups are summed).\n\n")
+        md_io.write(np.sqrt(df_perf_var).to_markdown(floatfmt=".0f"))
+        md_io.write("\n\n")
+    if not df_perf_running.empty:
+        md_io.write("### Counter Running Time (%)\n\n")
+        md_io.write("Share of the enabled time each counter was actually counting. Values below 100% mean the counter was multiplexed and its count is scaled by time_enabled/time_running.\n\n")
+        md_io.write(df_perf_running.to_markdown(floatfmt=".2f"))
+        md_io.write("\n\n")
+
     # --- Relative Metrics Table ---
     md_io.write("## Relative Performance Metrics\n\n")
     md_io.write("Key relative metrics calculated from the aggregated counters (N/A indicates the metric could not be calculated, e.g., due to missing counters or division by zero).\n\n")
@@ -582,6 +841,9 @@ if __name__ == "__main__":
             # Display relative metrics with more precision
             md_io.write(df_relative_metrics.to_markdown())
             md_io.write("\n\n")
+            for metric, rows in df_relative_metrics.attrs.get("loads_only", {}).items():
+                md_io.write(f"*{metric} is loads-only (store counters unsupported or not measured) for: "
+                            f"{', '.join(map(str, rows))}*\n\n")
             print("DEBUG: Relative metrics table written to Markdown buffer.")
         except Exception as e:
             print(f"ERROR: Failed to generate Relative Metrics Markdown table: {e}", file=sys.stderr)
@@ -590,21 +852,16 @@ if __name__ == "__main__":
     # --- Relative Metrics Calculation Explanation --- <--- NEW SECTION
     md_io.write("## Explanation of Calculated Relative Metrics\n\n")
     md_io.write("The relative metrics are calculated using the aggregated raw counters as follows:\n\n")
-    md_io.write("*   **L1d_Load_Miss_Rate (%)**: `(L1-dcache-load-misses / L1-dcache-loads) * 100`\n")
-    md_io.write("*   **L1d_Store_Miss_Rate (%)**: `(L1-dcache-store-misses / L1-dcache-stores) * 100`\n")
-    md_io.write("*   **L1d_Prefetch_Miss_Rate (%)**: `(L1-dcache-prefetch-misses / L1-dcache-prefetches) * 100`\n")
-    md_io.write("*   **L1i_Load_Miss_Rate (%)**: `(L1-icache-load-misses / L1-icache-loads) * 100`\n")
-    md_io.write("*   **LLC_Load_Miss_Rate (%)**: `(LLC-load-misses / LLC-loads) * 100`\n")
-    md_io.write("*   **LLC_Store_Miss_Rate (%)**: `(LLC-store-misses / LLC-stores) * 100`\n")
-    md_io.write("*   **LLC_Prefetch_Miss_Rate (%)**: `(LLC-prefetch-misses / LLC-prefetches) * 100`\n")
-    md_io.write("*   **Branch_Load_Miss_Rate (%)**: `(branch-load-misses / branch-loads) * 100` (Note: This might represent branch *misses* if `branch-misses` event was used instead of `branch-load-misses`)\n")
-    md_io.write("*   **dTLB_Load_Miss_Rate (%)**: `(dTLB-load-misses / dTLB-loads) * 100`\n")
-    md_io.write("*   **dTLB_Store_Miss_Rate (%)**: `(dTLB-store-misses / dTLB-stores) * 100`\n")
-    md_io.write("*   **iTLB_Load_Miss_Rate (%)**: `(iTLB-load-misses / iTLB-loads) * 100`\n")
-    md_io.write("*   **Node_Load_Miss_Rate (%)**: `(node-load-misses / node-loads) * 100` (Often relates to NUMA remote memory accesses)\n")
-    md_io.write("*   **Node_Store_Miss_Rate (%)**: `(node-store-misses / node-stores) * 100` (Often relates to NUMA remote memory accesses)\n")
-    md_io.write("*   **Node_Prefetch_Miss_Rate (%)**: `(node-prefetch-misses / node-prefetches) * 100` (Often relates to NUMA remote memory accesses)\n")
-    md_io.write("*   **CPI (Cycles Per Instruction)**: `cycles / instructions` (Lower is generally better)\n\n")
+    for metric, definition in DERIVED_METRICS.items():
+        num, den = (f"({expr})" if " " in expr else expr for expr in (definition["num"], definition["den"]))
+        formula = f"{num} / {den}".replace("`", "")
+        if definition["scale"] != 1:
+            formula += f" * {definition['scale']:g}"
+        note = f" ({definition['note']})" if "note" in definition else ""
+        if definition.get("optional"):
+            note += f" ({', '.join(definition['optional'])} count as 0 where unsupported: loads-only)"
+        md_io.write(f"*   **{metric} ({definition['unit']})**: `{formula}`{note}\n")
+    md_io.write("\n")
     print("DEBUG: Explanation section written to Markdown buffer.")
 
     # --- Relative Metrics Plot ---
@@ -613,6 +870,25 @@ if __name__ == "__main__":
     md_io.write(create_markdown_image_link(OUTPUT_REL_METRICS_PLOT_FILE, REPORT_OUTPUT_DIR))
     md_io.write("\n\n")
 
+    # --- Roofline Section ---
+    md_io.write("## Roofline\n\n")
+    if df_roofline.empty:
+        md_io.write("*No FLOP counters were collected, so runs could not be placed on the roofline.*\n\n")
+    else:
+        md_io.write("FLOPs are estimated from the FP counters, traffic as cache lines missing in (DRAM) "
+                    "or accessing (LLC) the last level cache, and GFLOP/s from the baseline run time. "
+                    "Runs left of the DRAM ridge point are memory-bound.\n\n")
+        try:
+            md_io.write(df_roofline[["host", "gflops", "DRAM_intensity", "LLC_intensity", "bound"]]
+                        .to_markdown(floatfmt=".3g"))
+            md_io.write("\n\n")
+        except Exception as e:
+            md_io.write(f"*Error generating roofline table: {e}*\n\n")
+        for host, plot_file in roofline_plots.items():
+            md_io.write(f"### Roofline of {host}\n\n")
+            md_io.write(create_markdown_image_link(plot_file, REPORT_OUTPUT_DIR))
+            md_io.write("\n\n")
+
     # --- Save Markdown File ---
     print(f"DEBUG: Final Markdown content length before writing: {len(md_io.getvalue())}")
     try:
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+
+import re
+import os
+import pandas as pd
+from pathlib import Path
+from file_lines import iter_file_lines # Streaming line reader (file_lines.py next to this script)
+import sys
+import io
+from concurrent.futures import ProcessPoolExecutor
+
+# --- Configuration ---
+# *** Base directory for the perf analysis outputs (same as analize_perf.py) ***
+PERF_BASE_DIR = Path("/scratch/cb761223/exercises/sheet04/perf")
+PERF_RECORDS_DIR = PERF_BASE_DIR / "perf_records"
+
+# Output directory for the hotspot tables and the report
+REPORT_OUTPUT_DIR = PERF_BASE_DIR / "analysis_report"
+OUTPUT_MARKDOWN_FILE = REPORT_OUTPUT_DIR / "perf_record_hotspots.md"
+
+# Number of symbols / source lines listed per event table
+TOP_N_SYMBOLS = 15
+TOP_N_SOURCE_LINES = 20
+# Worker processes used to parse the perf script dumps in parallel
+PARSE_WORKERS = min(8, os.cpu_count() or 1)
+# Column order for NPB classes; SSCA2 scales are sorted numerically after them
+NPB_CLASS_ORDER = ["s", "w", "a", "b", "c"]
+
+# Regex to parse perf script dump filenames written by perf.py
+PERF_SCRIPT_FILENAME_REGEX = re.compile(
+    r"^perf\.script\.(npb_bt|ssca2)_([A-Za-z0-9_.-]+)_record$"
+)
+
+# `perf script -F event,period,ip,sym,srcline` sample line, e.g.
+#   "     10007 L1-dcache-load-misses:u:            4015a4 compute_rhs+0x24"
+# The period is optional so dumps without the period field still parse (1 per sample)
+PERF_SCRIPT_SAMPLE_REGEX = re.compile(
+    r"^\s*(?:(\d+)\s+)?([A-Za-z][\w.-]*(?::[A-Za-z]+)*):\s+([0-9a-fA-F]+)\s+(\S+)"
+)
+# The srcline field follows on its own indented line: "  rhs.c:123" or "  ??:0"
+PERF_SCRIPT_SRCLINE_REGEX = re.compile(r"^\s+(\S+:(?:\d+|\?))(?:\s|$)")
+SYMBOL_OFFSET_REGEX = re.compile(r"\+0x[0-9a-fA-F]+$")
+
+
+# --- Helper Functions ---
+
+
+def parse_perf_script(script_file: Path) -> dict[str, dict] | None:
+    """
+    Aggregates a perf script dump on the fly into, per event:
+      'symbols': symbol -> [samples, estimated events (sum of periods)]
+      'lines':   (source line, symbol) -> [samples, estimated events]
+    """
+    events = {}
+    last = None  # (event, symbol, period) of the sample still waiting for its srcline
+    try:
+        for line in iter_file_lines(script_file):
+            match = PERF_SCRIPT_SAMPLE_REGEX.match(line)
+            if match:
+                period = int(match.group(1)) if match.group(1) else 1
+                event = match.group(2).split(":")[0]
+                symbol = SYMBOL_OFFSET_REGEX.sub("", match.group(4))
+                per_event = events.setdefault(event, {"symbols": {}, "lines": {}})
+                entry = per_event["symbols"].setdefault(symbol, [0, 0])
+                entry[0] += 1
+                entry[1] += period
+                last = (event, symbol, period)
+                continue
+            match = PERF_SCRIPT_SRCLINE_REGEX.match(line)
+            if match and last is not None:
+                event, symbol, period = last
+                source_line = match.group(1)
+                if source_line.startswith("??"):
+                    source_line = "??"
+                else:
+                    source_line = Path(source_line).name  # Drop the build path
+                entry = events[event]["lines"].setdefault((source_line, symbol), [0, 0])
+                entry[0] += 1
+                entry[1] += period
+                last = None
+    except Exception as e:
+        print(f"Warning: Error reading/parsing perf script dump {script_file}: {e}", file=sys.stderr)
+        return None
+    return events
+
+
+def column_sort_key(full_id: str):
+    """Orders NPB classes S/W/A/B/C first, then SSCA2 scales numerically."""
+    benchmark, _, identifier = full_id.rpartition("_")
+    if identifier.lower() in NPB_CLASS_ORDER:
+        return (benchmark, NPB_CLASS_ORDER.index(identifier.lower()), identifier)
+    digits = re.sub(r"\D", "", identifier)
+    return (benchmark, int(digits) if digits else len(NPB_CLASS_ORDER), identifier)
+
+
+def build_share_table(profiles: dict[str, dict], event: str, granularity: str, top_n: int) -> pd.DataFrame:
+    """
+    Side-by-side table for one event: rows are symbols (or source lines), one
+    column per program configuration, values are the share (%) of the event's
+    estimated count. Rows are the top_n entries by their largest share.
+    """
+    columns = {}
+    for full_id, events in profiles.items():
+        per_event = events.get(event)
+        if not per_event or not per_event[granularity]:
+            continue
+        totals = per_event[granularity]
+        event_total = sum(period for _, period in totals.values())
+        if event_total <= 0:
+            continue
+        if granularity == "lines":
+            shares = {f"{src} ({sym})": period / event_total * 100 for (src, sym), (_, period) in totals.items()}
+        else:
+            shares = {sym: period / event_total * 100 for sym, (_, period) in totals.items()}
+        columns[full_id] = pd.Series(shares)
+
+    if not columns:
+        return pd.DataFrame()
+    df = pd.DataFrame(columns)
+    df = df[sorted(df.columns, key=column_sort_key)]
+    df = df.loc[df.max(axis=1).sort_values(ascending=False).index[:top_n]]
+    return df
+
+
+def build_sample_count_table(profiles: dict[str, dict]) -> pd.DataFrame:
+    """Samples and estimated event counts per event and program configuration."""
+    rows = {}
+    for full_id, events in profiles.items():
+        for event, per_event in events.items():
+            samples = sum(s for s, _ in per_event["symbols"].values())
+            estimated = sum(p for _, p in per_event["symbols"].values())
+            rows.setdefault(full_id, {})[f"{event} samples"] = samples
+            rows.setdefault(full_id, {})[f"{event} est. count"] = estimated
+    df = pd.DataFrame(rows).T
+    return df.loc[sorted(df.index, key=column_sort_key)]
+
+
+# --- Main Execution ---
+
+if __name__ == "__main__":
+    print(f"--- Analyzing perf record dumps in: {PERF_RECORDS_DIR} ---")
+
+    if not PERF_RECORDS_DIR.is_dir():
+        print(f"ERROR: perf record directory not found: {PERF_RECORDS_DIR}", file=sys.stderr)
+        sys.exit(1)
+    REPORT_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    jobs = {}
+    for script_file in sorted(PERF_RECORDS_DIR.glob("perf.script.*")):
+        match = PERF_SCRIPT_FILENAME_REGEX.match(script_file.name)
+        if not match:
+            print(f"Warning: Skipping file with unexpected name: {script_file.name}", file=sys.stderr)
+            continue
+        jobs[f"{match.group(1)}_{match.group(2)}"] = script_file
+
+    if not jobs:
+        print(f"ERROR: No perf.script.*_record files found in {PERF_RECORDS_DIR}", file=sys.stderr)
+        sys.exit(1)
+
+    # --- Parsing (one worker per dump) ---
+    profiles = {}
+    with ProcessPoolExecutor(max_workers=min(PARSE_WORKERS, len(jobs))) as pool:
+        for full_id, events in zip(jobs, pool.map(parse_perf_script, jobs.values())):
+            if events:
+                profiles[full_id] = events
+                print(f"Parsed {jobs[full_id].name}: events {', '.join(sorted(events))}")
+            else:
+                print(f"Warning: No samples extracted from {jobs[full_id].name}", file=sys.stderr)
+
+    if not profiles:
+        print("\nERROR: No samples found in any perf script dump.", file=sys.stderr)
+        sys.exit(1)
+
+    all_events = sorted({event for events in profiles.values() for event in events})
+
+    # --- Tables ---
+    md_io = io.StringIO()
+    md_io.write("# perf record Hotspot Report\n\n")
+    md_io.write(f"*   **perf record dumps:** `{PERF_RECORDS_DIR}`\n")
+    md_io.write(f"*   **Report Generated:** `{pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}`\n\n")
+    md_io.write("Values are the share (%) of each event's estimated count (sum of sample periods) "
+                "that falls on a symbol or source line. For `cycles` this is the share of run time; "
+                "for cache miss events it shows where the misses happen.\n\n")
+
+    df_counts = build_sample_count_table(profiles)
+    print("\n--- Samples per Event ---")
+    print(df_counts.to_string(float_format="{:,.0f}".format))
+    md_io.write("## Samples per Event\n\n")
+    md_io.write(df_counts.to_markdown(floatfmt=",.0f"))
+    md_io.write("\n\n")
+
+    for event in all_events:
+        md_io.write(f"## {event}\n\n")
+        for granularity, top_n, title in (("symbols", TOP_N_SYMBOLS, "Symbol"),
+                                          ("lines", TOP_N_SOURCE_LINES, "Source Line")):
+            df_table = build_share_table(profiles, event, granularity, top_n)
+            md_io.write(f"### Top {top_n} by {title} (% of {event})\n\n")
+            if df_table.empty:
+                note = " (was the program built with -g?)" if granularity == "lines" else ""
+                md_io.write(f"*No {granularity} data for {event}{note}.*\n\n")
+                continue
+            print(f"\n--- {event}: share per {title.lower()} (%) ---")
+            print(df_table.to_string(float_format="%.2f"))
+            csv_file = REPORT_OUTPUT_DIR / f"perf_record_{event}_{granularity}.csv"
+            df_table.to_csv(csv_file, float_format="%.3f")
+            print(f"Table saved to {csv_file}")
+            md_io.write(df_table.to_markdown(floatfmt=".2f"))
+            md_io.write("\n\n")
+
+    try:
+        OUTPUT_MARKDOWN_FILE.write_text(md_io.getvalue(), encoding="utf-8")
+        print(f"\nMarkdown report saved successfully to {OUTPUT_MARKDOWN_FILE}")
+    except Exception as e:
+        print(f"ERROR: Failed to save Markdown report: {e}", file=sys.stderr)
+
+    print("\n--- Analysis Complete ---")
@@ -4,7 +4,9 @@ import re
 import pandas as pd
 import matplotlib.pyplot as plt # Import pyplot
 from pathlib import Path
+from file_lines import iter_file_lines # Streaming line reader (file_lines.py next to this script)
 import sys
+from parse_cache import cached_parse # SQLite parse cache (parse_cache.py next to this script)
 
 # --- Configuration ---
 # *** IMPORTANT: Set this to the correct path where your .log files are ***
@@ -16,6 +18,13 @@ OUTPUT_PLOT_FILE = Path(
     "/scratch/cb761223/exercises/sheet04/massif_time_perturbation_high_dpi.png"
 )
 
+# SQLite index of parsed files; unchanged files are not parsed again (None disables it)
+PARSE_CACHE_FILE = Path(
+    "/scratch/cb761223/exercises/sheet04/parse_cache.sqlite"
+)
+# Bump when a parser's output changes so cached results are re-parsed
+LOG_PARSER_VERSION = 1
+
 # Regex to parse filenames (adjust if your naming changes)
 FILENAME_REGEX = re.compile(
     r"^(npb_bt|ssca2)_([A-Za-z0-9]+)_(baseline|massif)\.log$"
@@ -40,14 +49,18 @@ def parse_time_to_seconds(time_str: str) -> float | None:
     return None
 
 
+
 def extract_time_from_log(log_file: Path) -> float | None:
     """Reads a log file and extracts the 'real' execution time in seconds."""
     if not log_file.is_file():
         print(f"Warning: Log file not found: {log_file}", file=sys.stderr)
         return None
     try:
-        content = log_file.read_text()
-        return parse_time_to_seconds(content)
+        for line in iter_file_lines(log_file):
+            seconds = parse_time_to_seconds(line)
+            if seconds is not None:
+                return seconds
+        return None
     except Exception as e:
         print(
             f"Warning: Error reading or parsing {log_file}: {e}",
@@ -69,11 +82,15 @@ if __name__ == "__main__":
         sys.exit(1)
 
     results = []
-    log_files_found = 0
 
-    # --- Log Parsing (Identical to previous script) ---
-    for log_file in SLURM_LOGS_DIR.glob("*.log"):
-        log_files_found += 1
+    # --- Log Parsing (unchanged logs come from the parse cache) ---
+    log_files = list(SLURM_LOGS_DIR.glob("*.log"))
+    log_files_found = len(log_files)
+    log_times = cached_parse(
+        [f for f in log_files if FILENAME_REGEX.match(f.name)],
+        extract_time_from_log, LOG_PARSER_VERSION, PARSE_CACHE_FILE,
+    )
+    for log_file in log_files:
         match = FILENAME_REGEX.match(log_file.name)
         if not match:
             print(
@@ -88,7 +105,7 @@ if __name__ == "__main__":
         full_id = f"{benchmark_name}_{identifier}"
 
         print(f"Processing: {log_file.name} (Benchmark: {full_id}, Type: {run_type})")
-        real_time = extract_time_from_log(log_file)
+        real_time = log_times[log_file]
 
         if real_time is not None:
             results.append(
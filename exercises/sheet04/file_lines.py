@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Streaming line reader shared by the sheet04 analysis scripts (analyze.py,
+analize_massif.py, analize_perf.py, analize_perf_record.py and
+analize_overhead.py), so large logs and perf dumps are never read whole.
+"""
+
+import mmap
+import os
+from pathlib import Path
+
+
+def iter_file_lines(path: Path):
+    """
+    Yields the lines of a file through a read-only memory map, so only the pages
+    currently being scanned are resident however large the file is.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            for raw_line in iter(mm.readline, b""):
+                yield raw_line.decode("utf-8", errors="ignore").rstrip("\r\n")
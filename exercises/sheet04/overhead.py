@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import stat
+import time
+import shlex
+from pathlib import Path
+
+# --- Configuration ---
+BASE_DIR = Path("/scratch/cb761223/perf-oriented-dev/larger_samples")
+NPB_BT_BUILD_DIR = BASE_DIR / "npb_bt" / "build"  # Built by massif.py / perf.py
+SSCA2_BUILD_DIR = BASE_DIR / "ssca2" / "build"
+
+# Main output directory for the overhead measurements
+BASE_OUTPUT_DIR = Path("/scratch/cb761223/exercises/sheet04/overhead")
+BASE_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+# Subdirectories for organization
+SLURM_SCRIPTS_DIR = BASE_OUTPUT_DIR / "slurm_scripts"
+SLURM_LOGS_DIR = BASE_OUTPUT_DIR / "slurm_logs"
+SLURM_SCRIPTS_DIR.mkdir(exist_ok=True)
+SLURM_LOGS_DIR.mkdir(exist_ok=True)
+
+# Programs to measure; valgrind tools slow programs down 10-100x, so the large
+# NPB classes are left out by default
+SSCA2_EXE = "ssca2"
+NPB_BT_CLASSES = ["s", "w", "a"]
+SSCA2_SCALES = [8, 17]
+
+# Number of rounds; every round runs the baseline and each tool once, in random order
+OVERHEAD_ROUNDS = 5
+SLURM_TIME_LIMIT = "08:00:00"
+
+# Instrumentation tools to compare against the baseline. Each entry is the
+# command prefix put in front of the program; {out} is replaced by a scratch
+# output file that is deleted after the run (writing it is part of the overhead).
+OVERHEAD_TOOLS = {
+    "massif": ["valgrind", "--tool=massif", "--massif-out-file={out}"],
+    "callgrind": ["valgrind", "--tool=callgrind", "--callgrind-out-file={out}"],
+    "cachegrind": ["valgrind", "--tool=cachegrind", "--cachegrind-out-file={out}"],
+    "perf_stat": ["perf", "stat", "-e", "cycles,instructions,cache-misses", "-o", "{out}", "--"],
+    "perf_record_100Hz": ["perf", "record", "-F", "100", "-o", "{out}", "--"],
+    "perf_record_1kHz": ["perf", "record", "-F", "1000", "-o", "{out}", "--"],
+    "perf_record_10kHz": ["perf", "record", "-F", "10000", "-o", "{out}", "--"],
+    "perf_record_1kHz_g": ["perf", "record", "-F", "1000", "-g", "-o", "{out}", "--"],
+}
+
+# Modules to load in Slurm jobs
+MODULES = [
+    "gcc/12.2.0-gcc-8.5.0-p4pe45v",
+    "cmake/3.24.3-gcc-8.5.0-svdlhox",
+    "ninja/1.11.1-python-3.10.8-gcc-8.5.0-2oc4wj6",
+    "python/3.10.8-gcc-8.5.0-r5lf3ij",
+]
+
+# --- Helper Functions ---
+
+def run_command(cmd, cwd=None, env=None, check=True):
+    """Runs a command and prints output."""
+    print(f"Running: {' '.join(cmd)} in {cwd or os.getcwd()}")
+    result = subprocess.run(
+        cmd,
+        capture_output=True,
+        text=True,
+        cwd=cwd,
+        env=env
+    )
+    if result.stdout:
+        print(f"STDOUT:\n{result.stdout}")
+    if result.stderr:
+        print(f"STDERR:\n{result.stderr}")
+    if check and result.returncode != 0:
+        print(f"Command failed with exit code {result.returncode}")
+        raise RuntimeError(f"Command failed: {' '.join(cmd)}")
+    return result
+
+def generate_overhead_script(job_name: str, program_command: list[str], executable_dir: Path) -> Path:
+    """
+    Generates a Slurm script that interleaves baseline and instrumented runs of
+    one program on the same node. Every round shuffles the order of the variants
+    so slow drifts (thermal, other jobs on the file system) hit all of them alike.
+    Each run prints one line parsed by analize_overhead.py:
+        OVERHEAD_RUN round=<n> variant=<name> seconds=<wall time> exit=<code>
+    """
+    slurm_script_path = SLURM_SCRIPTS_DIR / f"{job_name}.sh"
+    output_log_path = (SLURM_LOGS_DIR / f"{job_name}.log").resolve()
+    program_str = " ".join(shlex.quote(item) for item in program_command)
+
+    variant_cases = [f'        baseline) cmd="{program_str}" ;;']
+    for tool, prefix in OVERHEAD_TOOLS.items():
+        prefix_str = " ".join(shlex.quote(item) for item in prefix).replace("{out}", "$run_out")
+        variant_cases.append(f'        {tool}) cmd="{prefix_str} {program_str}" ;;')
+    variants = " ".join(["baseline"] + list(OVERHEAD_TOOLS))
+
+    script_content = f"""#!/bin/bash
+
+#SBATCH --partition=lva
+#SBATCH --job-name={job_name}
+#SBATCH --output={output_log_path}
+#SBATCH --ntasks=1
+#SBATCH --ntasks-per-node=1
+#SBATCH --exclusive
+#SBATCH --time={SLURM_TIME_LIMIT}
+
+echo "--- Job Info ---"
+echo "Job ID: $SLURM_JOB_ID"
+echo "Job Name: $SLURM_JOB_NAME"
+echo "Running on host: $(hostname)"
+echo "Job started at: $(date)"
+echo "--- Loading Modules ---"
+
+# Load required modules
+{chr(10).join([f"module load {mod}" for mod in MODULES])}
+module list
+
+echo "--- Execution ---"
+cd {executable_dir.resolve()}
+scratch_dir=$(mktemp -d)
+trap 'rm -rf "$scratch_dir"' EXIT
+
+for round in $(seq 1 {OVERHEAD_ROUNDS}); do
+    for variant in $(shuf -e {variants}); do
+        run_out="$scratch_dir/$variant.out"
+        case "$variant" in
+{chr(10).join(variant_cases)}
+        esac
+        start=$(date +%s.%N)
+        eval "$cmd" > /dev/null 2> "$scratch_dir/stderr"
+        exit_code=$?
+        end=$(date +%s.%N)
+        seconds=$(awk -v s="$start" -v e="$end" 'BEGIN {{ printf "%.6f", e - s }}')
+        echo "OVERHEAD_RUN round=$round variant=$variant seconds=$seconds exit=$exit_code"
+        if [ $exit_code -ne 0 ]; then
+            echo "Warning: $variant failed in round $round:"
+            tail -n 5 "$scratch_dir/stderr"
+        fi
+        rm -rf "$run_out" "$run_out".*
+    done
+done
+
+echo "--- Completion ---"
+echo "Job finished at: $(date)"
+"""
+    with open(slurm_script_path, "w") as f:
+        f.write(script_content)
+
+    st = os.stat(slurm_script_path)
+    os.chmod(slurm_script_path, st.st_mode | stat.S_IEXEC)
+
+    print(f"Generated Slurm script: {slurm_script_path}")
+    return slurm_script_path
+
+def submit_slurm_job(script_path: Path):
+    """Submits a Slurm script using sbatch."""
+    sbatch_cmd = ["sbatch", str(script_path)]
+    try:
+        result = run_command(sbatch_cmd, check=True)
+        job_id = result.stdout.strip().split()[-1]
+        print(f"Successfully submitted job {job_id} from {script_path.name}")
+        return job_id
+    except Exception as e:
+        print(f"!!! Failed to submit job from {script_path.name}: {e}")
+        return None
+
+# --- Main Execution ---
+
+if __name__ == "__main__":
+    print("Starting Instrumentation Overhead Measurement Script")
+    print(f"Base output directory: {BASE_OUTPUT_DIR}")
+    print(f"Tools compared against the baseline: {', '.join(OVERHEAD_TOOLS)}")
+    print(f"Rounds per program: {OVERHEAD_ROUNDS}")
+
+    # Collect the programs (built beforehand by massif.py or perf.py)
+    programs = {}
+    for npb_class in NPB_BT_CLASSES:
+        exe_path = NPB_BT_BUILD_DIR / f"npb_bt_{npb_class}"
+        if exe_path.is_file() and os.access(exe_path, os.X_OK):
+            programs[f"npb_bt_{npb_class}"] = ([str(exe_path)], NPB_BT_BUILD_DIR)
+        else:
+            print(f"WARNING: NPB BT executable not found: {exe_path}. Build it with perf.py first.")
+    ssca2_exe_path = SSCA2_BUILD_DIR / SSCA2_EXE
+    if ssca2_exe_path.is_file() and os.access(ssca2_exe_path, os.X_OK):
+        for scale in SSCA2_SCALES:
+            programs[f"ssca2_s{scale}"] = ([str(ssca2_exe_path), str(scale)], SSCA2_BUILD_DIR)
+    else:
+        print(f"WARNING: SSCA2 executable not found: {ssca2_exe_path}. Build it with perf.py first.")
+
+    if not programs:
+        print("ERROR: No programs to measure. Exiting.")
+        exit(1)
+
+    should_submit = input("\nSubmit generated Slurm jobs? (y/n): ").lower() == 'y'
+    submitted_jobs = {}
+
+    print("\n--- Generating and Submitting Slurm Jobs ---")
+    for full_id, (command, executable_dir) in programs.items():
+        job_name = f"{full_id}_overhead"
+        script_path = generate_overhead_script(job_name, command, executable_dir)
+        if should_submit:
+            job_id = submit_slurm_job(script_path)
+            if job_id: submitted_jobs[job_name] = job_id
+            time.sleep(0.2)
+        else:
+            print(f"Generated Slurm script (not submitted): {script_path}")
+
+    print("\nSubmitted Slurm jobs:")
+    if submitted_jobs:
+        for name in sorted(submitted_jobs.keys()):
+            print(f"  Job Name: {name}, Job ID: {submitted_jobs[name]}")
+    else:
+        print("  No jobs were submitted (or submission was skipped).")
+
+    print(f"\nOnce the jobs are done, run analize_overhead.py on {SLURM_LOGS_DIR}.")
+    print("\nScript finished.")
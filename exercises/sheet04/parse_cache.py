@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Incremental parse cache for the sheet04 analysis scripts.
+
+analyze.py, analize_massif.py and analize_perf.py pass their per-file parsers
+through cached_parse(). Results are stored in an SQLite index keyed by file
+path and parser name; an entry is reused while the file's size and mtime and
+the parser's version are unchanged, so a re-run only parses new or modified
+files. Bump a script's parser version whenever its parser changes output.
+"""
+
+import pickle
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parse_cache (
+    path     TEXT    NOT NULL,
+    parser   TEXT    NOT NULL,
+    version  INTEGER NOT NULL,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    result   BLOB    NOT NULL,
+    PRIMARY KEY (path, parser)
+)
+"""
+
+
+def open_cache(cache_file: Path) -> sqlite3.Connection:
+    """Opens (and creates) the cache database."""
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(cache_file)
+    connection.execute(SCHEMA)
+    return connection
+
+
+def file_key(path: Path) -> tuple[int, int] | None:
+    """(size, mtime_ns) identifying the current contents of a file."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def parse_files(parser, files: list[Path], workers: int) -> list:
+    """Runs the parser on every file, in worker processes if workers > 1."""
+    if workers > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(files))) as pool:
+            return list(pool.map(parser, files, chunksize=8))
+    return [parser(path) for path in files]
+
+
+def cached_parse(files, parser, version: int, cache_file: Path | None, workers: int = 1) -> dict:
+    """
+    Returns {path: parser(path)} for all files, taking unchanged files from the
+    cache and parsing the others (in parallel with workers > 1). None results
+    (unreadable or incomplete files) are not cached. cache_file=None disables
+    the cache.
+    """
+    files = [Path(f) for f in files]
+    if cache_file is None:
+        return dict(zip(files, parse_files(parser, files, workers)))
+
+    parser_name = parser.__name__
+    results = {}
+    try:
+        connection = open_cache(cache_file)
+    except sqlite3.Error as e:
+        print(f"Warning: Parse cache {cache_file} unusable ({e}), parsing all files.", file=sys.stderr)
+        return dict(zip(files, parse_files(parser, files, workers)))
+
+    with closing(connection):
+        cached = {
+            path: (version_, size, mtime_ns, blob)
+            for path, version_, size, mtime_ns, blob in connection.execute(
+                "SELECT path, version, size, mtime_ns, result FROM parse_cache WHERE parser = ?",
+                (parser_name,),
+            )
+        }
+        keys = {path: file_key(path) for path in files}
+        stale = []
+        for path in files:
+            entry = cached.get(str(path))
+            if entry is not None and entry[0] == version and keys[path] == (entry[1], entry[2]):
+                try:
+                    results[path] = pickle.loads(entry[3])
+                    continue
+                except Exception:
+                    pass  # Corrupt or incompatible entry: parse again
+            stale.append(path)
+
+        rows = []
+        for path, result in zip(stale, parse_files(parser, stale, workers)):
+            results[path] = result
+            if result is not None and keys[path] is not None:
+                rows.append((str(path), parser_name, version, *keys[path],
+                             pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)))
+        try:
+            with connection:
+                connection.executemany("INSERT OR REPLACE INTO parse_cache VALUES (?, ?, ?, ?, ?, ?)", rows)
+        except sqlite3.Error as e:
+            print(f"Warning: Could not update parse cache {cache_file}: {e}", file=sys.stderr)
+
+    print(f"INFO: {parser_name}: {len(files) - len(stale)} files from cache, {len(stale)} parsed ({cache_file.name})")
+    return {path: results[path] for path in files}
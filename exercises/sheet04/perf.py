@@ -7,6 +7,8 @@ import time
 from pathlib import Path
 import re
 import math
+import shlex
+from roofline import ROOFLINE_FLOP_EVENTS
 
 # --- Configuration ---
 BASE_DIR = Path("/scratch/cb761223/perf-oriented-dev/larger_samples")
@@ -21,9 +23,11 @@ BASE_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 SLURM_SCRIPTS_DIR = BASE_OUTPUT_DIR / "slurm_scripts"
 SLURM_LOGS_DIR = BASE_OUTPUT_DIR / "slurm_logs"
 PERF_OUTPUTS_DIR = BASE_OUTPUT_DIR / "perf_outputs" # New directory for perf results
+PERF_RECORDS_DIR = BASE_OUTPUT_DIR / "perf_records" # perf record data and perf script dumps
 SLURM_SCRIPTS_DIR.mkdir(exist_ok=True)
 SLURM_LOGS_DIR.mkdir(exist_ok=True)
 PERF_OUTPUTS_DIR.mkdir(exist_ok=True)
+PERF_RECORDS_DIR.mkdir(exist_ok=True)
 
 
 # Executable names (SSCA2 is fixed, NPB BT will be discovered)
@@ -73,16 +77,43 @@ PERF_EVENTS = [
     "node-store-misses",         
     "node-stores",               
 ]
+# FLOP counters for the roofline in analize_perf.py (dropped if the node lacks them)
+PERF_EVENTS += list(ROOFLINE_FLOP_EVENTS)
 
-# Max number of hardware events per perf run (adjust based on hardware limits)
-EVENTS_PER_GROUP = 4
-num_groups = math.ceil(len(PERF_EVENTS) / EVENTS_PER_GROUP)
-event_groups = [
-    PERF_EVENTS[i * EVENTS_PER_GROUP:(i + 1) * EVENTS_PER_GROUP]
-    for i in range(num_groups)
-]
+# Write machine-readable `perf stat -x,` output (parsed by analize_perf.py together
+# with the running time of each counter, so multiplexing is visible)
+PERF_STAT_CSV = True
+# Repeat each perf stat run this many times (-r); >1 adds per-counter variance
+PERF_STAT_REPEATS = 1
 
-print(f"Dividing {len(PERF_EVENTS)} events into {num_groups} groups of up to {EVENTS_PER_GROUP}.")
+# Fallback number of programmable counters if probing the PMU fails
+EVENTS_PER_GROUP = 4
+# Upper bound when probing how many events fit into one counter group
+MAX_PROBED_COUNTERS = 8
+
+# How perf stat jobs are scheduled:
+#   "grouped"     - supported events are bin-packed into as few full runs as the
+#                   node's counters allow (ratio pairs stay in the same run)
+#   "multiplexed" - a single run with all events; the kernel time-multiplexes the
+#                   counters and the counts are scaled estimates
+PERF_SCHEDULE_MODE = "grouped"
+# Expected runtime of one program run, used for the multiplexing accuracy estimate
+MULTIPLEX_EXPECTED_RUNTIME_S = 80.0
+# Kernel default for /sys/bus/event_source/devices/cpu/perf_event_mux_interval_ms
+DEFAULT_MUX_INTERVAL_MS = 4.0
+
+# --- Perf Record (Sampling) Configuration ---
+# Also generate one `perf record` job per program (analyzed by analize_perf_record.py)
+PERF_RECORD_ENABLED = True
+# Events to sample; every sample is attributed to the symbol and source line it hit
+PERF_RECORD_EVENTS = ["cycles", "L1-dcache-load-misses", "LLC-load-misses"]
+# Sampling frequency in Hz (-F); None samples every PERF_RECORD_PERIOD events (-c) instead
+PERF_RECORD_FREQ = 999
+PERF_RECORD_PERIOD = 10007
+# Fields of the `perf script` dump written after the run (srcline needs debug info)
+PERF_SCRIPT_FIELDS = "event,period,ip,sym,srcline"
+# Compile with -g so samples resolve to source lines (does not change the generated code)
+BUILD_WITH_DEBUG_INFO = True
 
 def run_command(cmd, cwd=None, env=None, check=True):
     """Runs a command and prints output."""
@@ -113,6 +144,158 @@ def run_command(cmd, cwd=None, env=None, check=True):
         raise RuntimeError(f"Command failed: {' '.join(cmd)}")
     return result
 
+# --- Perf Event Scheduling ---
+
+def probe_counted_events(event_spec: str) -> dict[str, bool]:
+    """
+    Runs `perf stat -x,` on `true` with the given event spec and reports, per
+    event, whether it produced a count (False for <not supported>/<not counted>).
+    """
+    result = subprocess.run(
+        ["perf", "stat", "-x", ",", "-e", event_spec, "--", "true"],
+        capture_output=True, text=True,
+    )
+    counted = {}
+    # perf stat writes its counters to stderr
+    for line in result.stderr.splitlines():
+        fields = line.split(",")
+        if len(fields) < 3 or line.startswith("#"):
+            continue
+        event = fields[2].split(":")[0]
+        counted[event] = not fields[0].startswith("<")
+    return counted
+
+def probe_supported_events(events: list[str]) -> list[str]:
+    """Returns the events the PMU of this node supports, in their original order."""
+    counted = {}
+    for event in events:
+        # One probe per event so an unknown event name can't fail the whole list
+        counted.update(probe_counted_events(event))
+    supported = [e for e in events if counted.get(e)]
+    dropped = [e for e in events if not counted.get(e)]
+    if dropped:
+        print(f"Dropping {len(dropped)} events not supported on this node: {', '.join(dropped)}")
+    return supported
+
+def probe_num_counters(events: list[str]) -> int:
+    """
+    Finds how many of the given events fit into one perf group at the same
+    time, i.e. the number of free programmable counters (the NMI watchdog may
+    take one). Falls back to EVENTS_PER_GROUP if probing is not possible.
+    """
+    if len(events) < 2:
+        return EVENTS_PER_GROUP
+    fits = 1
+    for n in range(2, min(MAX_PROBED_COUNTERS, len(events)) + 1):
+        group = events[:n]
+        counted = probe_counted_events("{" + ",".join(group) + "}")
+        if not counted:
+            # perf itself failed (permissions, no PMU access): keep the old default
+            return EVENTS_PER_GROUP if n == 2 else fits
+        if not all(counted.get(e.split(":")[0]) for e in group):
+            break
+        fits = n
+    return fits
+
+def pair_ratio_events(events: list[str]) -> list[list[str]]:
+    """
+    Groups each '<x>-misses' event with its access counter ('<x>s' or '<x>es',
+    e.g. LLC-load-misses with LLC-loads) so ratios are computed from one run.
+    Events without a partner stay on their own.
+    """
+    remaining = list(events)
+    items = []
+    for event in events:
+        if event not in remaining or not event.endswith("-misses"):
+            continue
+        base = event[:-len("-misses")]
+        partner = next((p for p in (base + "s", base + "es") if p in remaining), None)
+        if partner:
+            remaining.remove(event)
+            remaining.remove(partner)
+            items.append([event, partner])
+    items.extend([event] for event in remaining)
+    return items
+
+def pack_event_groups(events: list[str], num_counters: int) -> list[list[str]]:
+    """
+    First-fit-decreasing bin packing of ratio pairs and single events into
+    groups of at most num_counters events, one perf run per group.
+    """
+    items = pair_ratio_events(events)
+    if num_counters < 2:
+        items = [[event] for item in items for event in item]
+    groups = []
+    for item in sorted(items, key=len, reverse=True):
+        for group in groups:
+            if len(group) + len(item) <= num_counters:
+                group.extend(item)
+                break
+        else:
+            groups.append(list(item))
+    return groups
+
+def read_mux_interval_ms() -> float:
+    """Reads the kernel's counter multiplexing interval for the CPU PMU."""
+    try:
+        return float(Path("/sys/bus/event_source/devices/cpu/perf_event_mux_interval_ms").read_text())
+    except (OSError, ValueError):
+        return DEFAULT_MUX_INTERVAL_MS
+
+def estimate_multiplexing_accuracy(num_events: int, num_counters: int, runtime_s: float,
+                                   mux_interval_ms: float) -> tuple[float, float]:
+    """
+    Estimates (running share, relative error) of scaled counts when all events
+    share the counters in one run. The error assumes per-slice event rates vary
+    by about their own mean (coefficient of variation 1), so it is pessimistic
+    for steady loops like NPB BT and optimistic for very phase-heavy programs.
+    """
+    share = min(1.0, num_counters / max(num_events, 1))
+    if share >= 1.0:
+        return 1.0, 0.0
+    slices = max(runtime_s * 1000.0 / mux_interval_ms, 1.0)
+    rel_error = math.sqrt((1.0 - share) / (share * slices))
+    return share, rel_error
+
+def schedule_event_groups(events: list[str], mode: str = PERF_SCHEDULE_MODE) -> list[list[str]]:
+    """
+    Builds the list of perf stat event lists, one per Slurm job. Unsupported
+    events are dropped up front; in multiplexed mode a single job gets all
+    events, with ratio pairs as perf groups ({a,b}) so they are co-scheduled.
+    """
+    supported = probe_supported_events(events)
+    if not supported:
+        print("WARNING: No supported events found by probing; using the full event list.")
+        supported = list(events)
+    num_counters = probe_num_counters(supported)
+    print(f"Detected {num_counters} usable programmable counters.")
+
+    if mode == "multiplexed":
+        share, rel_error = estimate_multiplexing_accuracy(
+            len(supported), num_counters, MULTIPLEX_EXPECTED_RUNTIME_S, read_mux_interval_ms()
+        )
+        print(f"Multiplexed mode: 1 run with {len(supported)} events, each counting ~{share * 100:.1f}% "
+              f"of the time (estimated relative error of scaled counts ~{rel_error * 100:.2f}% "
+              f"for a {MULTIPLEX_EXPECTED_RUNTIME_S:.0f} s run).")
+        group_specs = [
+            "{" + ",".join(item) + "}" if len(item) > 1 and num_counters >= 2 else item[0]
+            for item in pair_ratio_events(supported)
+        ]
+        return [group_specs]
+
+    groups = pack_event_groups(supported, num_counters)
+    print(f"Packed {len(supported)} supported events into {len(groups)} groups of up to {num_counters} "
+          f"(previously {math.ceil(len(events) / EVENTS_PER_GROUP)} fixed groups of {EVENTS_PER_GROUP}).")
+    return groups
+
+def cached_cmake_value(cache_file: Path, name: str) -> str | None:
+    """Value of a variable in a CMakeCache.txt (None if it is not set)."""
+    prefix = f"{name}:"
+    for line in cache_file.read_text(errors="ignore").splitlines():
+        if line.startswith(prefix) and "=" in line:
+            return line.split("=", 1)[1]
+    return None
+
 def build_program(src_dir: Path, build_dir: Path):
     """Builds a program using CMake and Ninja."""
     print(f"\n--- Building {src_dir.name} ---")
@@ -124,11 +307,16 @@ def build_program(src_dir: Path, build_dir: Path):
             "-G", "Ninja",
             "-DCMAKE_BUILD_TYPE=Release", # Use Release for performance measurements
         ]
+        # Always passed (CMake keeps -D values in its cache), so toggling the debug info reconfigures
+        c_flags = "-g" if BUILD_WITH_DEBUG_INFO else "" # Source lines for perf record samples
+        cmake_cmd.append(f"-DCMAKE_C_FLAGS={c_flags}")
         cache_file = build_dir / "CMakeCache.txt"
         cmakelists_file = src_dir / "CMakeLists.txt"
         run_cmake = True
         if cache_file.exists():
-             if cmakelists_file.exists():
+             if (cached_c_flags := cached_cmake_value(cache_file, "CMAKE_C_FLAGS") or "") != c_flags:
+                 print(f"CMAKE_C_FLAGS changed ('{cached_c_flags}' -> '{c_flags}'), running CMake.")
+             elif cmakelists_file.exists():
                  if cache_file.stat().st_mtime >= cmakelists_file.stat().st_mtime:
                      print("CMake cache is up-to-date, skipping CMake execution.")
                      run_cmake = False
@@ -162,9 +350,11 @@ def generate_slurm_script(
     executable_dir: Path,
     perf_events: list[str] = None, # List of events for perf stat
     perf_output_dir: Path = None, # Directory for perf output file
-    perf_output_filename: str = None # Specific name for perf output file
+    perf_output_filename: str = None, # Specific name for perf output file
+    perf_mode: str = "stat", # "stat" counts events, "record" samples them
+    perf_script_filename: str = None # perf script dump written after a record run
 ):
-    """Generates a Slurm script file. Can optionally wrap command with perf."""
+    """Generates a Slurm script file. Can optionally wrap command with perf stat or perf record."""
     slurm_script_path = scripts_dir / f"{job_name}.sh"
     output_log_path = logs_dir / output_log_name # Slurm log file
 
@@ -205,11 +395,22 @@ def generate_slurm_script(
              final_command_list = abs_program_command
         else:
             abs_perf_output_path = (perf_output_dir / perf_output_filename).resolve()
-            events_str = ",".join(perf_events)
+            # Quote the list: perf group syntax ({a,b}) would otherwise be brace-expanded by bash
+            events_str = shlex.quote(",".join(perf_events))
             # Use -o for output file, -- to separate perf options from program
-            final_command_list = [
-                "perf", "stat",
-                "-e", events_str,
+            if perf_mode == "record":
+                final_command_list = ["perf", "record", "-e", events_str]
+                if PERF_RECORD_FREQ:
+                    final_command_list += ["-F", str(PERF_RECORD_FREQ)]
+                else:
+                    final_command_list += ["-c", str(PERF_RECORD_PERIOD)]
+            else:
+                final_command_list = ["perf", "stat", "-e", events_str]
+                if PERF_STAT_CSV:
+                    final_command_list += ["-x", ","]
+                if PERF_STAT_REPEATS > 1:
+                    final_command_list += ["-r", str(PERF_STAT_REPEATS)]
+            final_command_list += [
                 "-o", str(abs_perf_output_path),
                 "--"
             ] + abs_program_command
@@ -266,6 +467,16 @@ echo "Job finished at: $(date)"
 
 # Check if perf output file was created (if perf was used)
 """
+    if perf_mode == "record" and perf_script_filename and perf_output_dir and perf_output_filename:
+        # Symbolize on the compute node, where the binary and its debug info are at hand
+        abs_perf_data_path_str = str((perf_output_dir / perf_output_filename).resolve())
+        abs_perf_script_path_str = str((perf_output_dir / perf_script_filename).resolve())
+        script_content += f"""
+echo "--- perf script ---"
+perf script -i "{abs_perf_data_path_str}" -F {PERF_SCRIPT_FIELDS} > "{abs_perf_script_path_str}"
+echo "perf script dump written to: {abs_perf_script_path_str}"
+"""
+        perf_output_filename = perf_script_filename # Preview the text dump, not perf.data
     if perf_output_filename and perf_output_dir:
         abs_perf_output_path_str = str((perf_output_dir / perf_output_filename).resolve())
         script_content += f"""
@@ -331,6 +542,18 @@ if __name__ == "__main__":
         exit(1)
 
 
+    # Decide which events go into which perf run on this node's PMU
+    # (probed on the submit host; assumes the compute nodes use the same CPU model)
+    event_groups = schedule_event_groups(PERF_EVENTS)
+    print(f"Dividing {sum(len(g) for g in event_groups)} events into {len(event_groups)} perf runs per program.")
+    # perf record fails as a whole on a single unknown event, so its events are probed too
+    record_events = []
+    if PERF_RECORD_ENABLED:
+        record_events = probe_supported_events(PERF_RECORD_EVENTS)
+        if not record_events:
+            print("WARNING: No supported record events found by probing; using the full record event list.")
+            record_events = list(PERF_RECORD_EVENTS)
+
     # 1. Build Programs
     npb_bt_build_dir = NPB_BT_SRC_DIR / "build" # Use separate build dir if desired
     ssca2_build_dir = SSCA2_SRC_DIR / "build"   # Use separate build dir if desired
@@ -371,6 +594,24 @@ if __name__ == "__main__":
 
     print("\n--- Generating and Submitting Slurm Jobs ---")
 
+    # --- Roofline Ceilings (measured once per node, cached by roofline.py) ---
+    job_name_roofline = "roofline_ceilings"
+    script_dir = Path(__file__).resolve().parent
+    script_path_roofline = generate_slurm_script(
+        job_name=job_name_roofline,
+        program_command=["python3", str(script_dir / "roofline.py")],
+        scripts_dir=SLURM_SCRIPTS_DIR,
+        logs_dir=SLURM_LOGS_DIR,
+        output_log_name=f"{job_name_roofline}.log",
+        executable_dir=script_dir,
+    )
+    if should_submit:
+        job_id = submit_slurm_job(script_path_roofline)
+        if job_id: submitted_jobs[job_name_roofline] = job_id
+        time.sleep(0.2)
+    else:
+        print(f"Generated Slurm script (not submitted): {script_path_roofline}")
+
     # --- NPB BT Runs ---
     if npb_bt_executables:
         npb_regex = re.compile(r"npb_bt_([A-Za-z0-9_.-]+)")
@@ -428,6 +669,29 @@ if __name__ == "__main__":
                 else:
                     print(f"Generated Slurm script (not submitted): {script_path_npb_perf}")
 
+            # Perf Record Run (sampling profile, symbolized with perf script)
+            if PERF_RECORD_ENABLED:
+                job_name_npb_record = f"npb_bt_{npb_identifier}_record"
+                script_path_npb_record = generate_slurm_script(
+                    job_name=job_name_npb_record,
+                    program_command=[str(npb_bt_exe_path)],
+                    scripts_dir=SLURM_SCRIPTS_DIR,
+                    logs_dir=SLURM_LOGS_DIR,
+                    output_log_name=f"{job_name_npb_record}.log",
+                    executable_dir=npb_bt_build_dir,
+                    perf_events=record_events,
+                    perf_output_dir=PERF_RECORDS_DIR,
+                    perf_output_filename=f"perf.data.{job_name_npb_record}",
+                    perf_mode="record",
+                    perf_script_filename=f"perf.script.{job_name_npb_record}"
+                )
+                if should_submit:
+                    job_id = submit_slurm_job(script_path_npb_record)
+                    if job_id: submitted_jobs[job_name_npb_record] = job_id
+                    time.sleep(0.2) # Small delay
+                else:
+                    print(f"Generated Slurm script (not submitted): {script_path_npb_record}")
+
     # --- SSCA2 Runs ---
     if ssca2_exists:
         print(f"\n--- Processing SSCA2 ---")
@@ -476,6 +740,29 @@ if __name__ == "__main__":
                     time.sleep(0.2)
                 else:
                     print(f"Generated Slurm script (not submitted): {script_path_ssca2_perf}")
+
+            # Perf Record Run (sampling profile, symbolized with perf script)
+            if PERF_RECORD_ENABLED:
+                job_name_ssca2_record = f"ssca2_s{scale}_record"
+                script_path_ssca2_record = generate_slurm_script(
+                    job_name=job_name_ssca2_record,
+                    program_command=[str(ssca2_exe_path), str(scale)],
+                    scripts_dir=SLURM_SCRIPTS_DIR,
+                    logs_dir=SLURM_LOGS_DIR,
+                    output_log_name=f"{job_name_ssca2_record}.log",
+                    executable_dir=ssca2_build_dir,
+                    perf_events=record_events,
+                    perf_output_dir=PERF_RECORDS_DIR,
+                    perf_output_filename=f"perf.data.{job_name_ssca2_record}",
+                    perf_mode="record",
+                    perf_script_filename=f"perf.script.{job_name_ssca2_record}"
+                )
+                if should_submit:
+                    job_id = submit_slurm_job(script_path_ssca2_record)
+                    if job_id: submitted_jobs[job_name_ssca2_record] = job_id
+                    time.sleep(0.2)
+                else:
+                    print(f"Generated Slurm script (not submitted): {script_path_ssca2_record}")
     else:
         print("\nSkipping SSCA2 job generation because executable was not found or not executable.")
 
@@ -516,6 +803,12 @@ if __name__ == "__main__":
     print(f"   - Each file contains the counts for one group of events for a specific run.")
     print(f"   - Example: cat {PERF_OUTPUTS_DIR}/perf.out.npb_bt_A_perf_grp1")
     print(f"   - Collect the counts for all events for each program configuration (NPB identifier or SSCA2 scale) by looking across the group files.")
+    if PERF_RECORD_ENABLED:
+        print(f"   - Sampling profiles (perf.script.*_record) are in {PERF_RECORDS_DIR}; run analize_perf_record.py")
+        print(f"     to see which functions and source lines the samples and cache misses fall on, per class/scale.")
+
+    print("\n   - The roofline_ceilings job caches the peak FLOP rate and bandwidths of its node; analize_perf.py")
+    print("     places every run on the roofline of the node it ran on (rerun roofline.py on other nodes).")
 
     print("\n4. Calculate Relative Metrics:")
     print("   - Use the collected counts to calculate meaningful ratios (miss rates, etc.). Examples:")
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Roofline model for the sheet04 perf runs.
+
+Run this script once on a compute node (perf.py generates a Slurm job for it)
+to measure the node's ceilings with small NumPy micro-kernels:
+  - peak FLOP rate: double precision matrix multiplication
+  - DRAM bandwidth: copying arrays much larger than the last level cache
+  - LLC bandwidth:  copying arrays that fit into the last level cache
+All ceilings use ROOFLINE_THREADS threads (the copy kernels run on one core,
+so the BLAS is limited to one thread as well), otherwise the ridge point
+would mix a multi-core FLOP rate with a single-core bandwidth.
+The ceilings are cached per host in ROOFLINE_CACHE_FILE. analize_perf.py
+imports this module to place every run on the roofline of the host it ran on.
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+# --- Configuration ---
+ROOFLINE_CACHE_FILE = Path("/scratch/cb761223/exercises/sheet04/perf/roofline_ceilings.json")
+
+# Micro-kernel sizes and repetitions (the best repetition is kept)
+PEAK_FLOPS_MATRIX_SIZE = 2048
+MICRO_KERNEL_REPEATS = 5
+DEFAULT_LLC_BYTES = 8 * 1024 * 1024  # Used if sysfs does not report the LLC size
+DRAM_ARRAY_LLC_MULTIPLE = 8  # DRAM kernel arrays are this many times the LLC size
+CACHE_LINE_BYTES = 64
+# Threads of every ceiling (the sheet04 programs are single-threaded)
+ROOFLINE_THREADS = 1
+BLAS_THREAD_ENV_VARS = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"]
+
+# FLOP counting events and the FLOPs each count represents. Raw FP events are
+# CPU specific (these are Intel Westmere's, the LCC3 nodes; see `perf list`);
+# perf.py drops the ones a node does not support.
+ROOFLINE_FLOP_EVENTS = {
+    "fp_comp_ops_exe.sse_fp_scalar": 1,
+    "fp_comp_ops_exe.sse_fp_packed": 2,  # Two doubles per packed SSE operation
+    "fp_comp_ops_exe.x87": 1,
+}
+# Counters whose sum times CACHE_LINE_BYTES is the traffic at each memory level
+ROOFLINE_TRAFFIC_EVENTS = {
+    "DRAM": ["LLC-load-misses", "LLC-store-misses", "LLC-prefetch-misses"],
+    "LLC": ["LLC-loads", "LLC-stores", "LLC-prefetches"],
+}
+
+
+# --- Micro-Kernels ---
+
+def read_llc_bytes() -> int:
+    """Size of the largest CPU cache according to sysfs."""
+    sizes = []
+    for size_file in Path("/sys/devices/system/cpu/cpu0/cache").glob("index*/size"):
+        text = size_file.read_text().strip()
+        scale = {"K": 1024, "M": 1024 * 1024}.get(text[-1:], 1)
+        try:
+            sizes.append(int(text.rstrip("KM")) * scale)
+        except ValueError:
+            continue
+    return max(sizes) if sizes else DEFAULT_LLC_BYTES
+
+
+def best_time(kernel, repeats: int = MICRO_KERNEL_REPEATS) -> float:
+    """Runs a kernel repeatedly and returns the fastest wall time in seconds."""
+    kernel()  # Warm-up: page faults, BLAS thread start-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        kernel()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def measure_peak_gflops(n: int = PEAK_FLOPS_MATRIX_SIZE, threads: int = ROOFLINE_THREADS) -> float:
+    """
+    Double precision GEMM rate of the BLAS NumPy is linked against, with
+    `threads` BLAS threads. The BLAS reads its thread count when NumPy is
+    first imported, so the kernel runs in a fresh interpreter.
+    """
+    env = dict(os.environ, **{var: str(threads) for var in BLAS_THREAD_ENV_VARS})
+    result = subprocess.run([sys.executable, __file__, "--peak-gflops", str(n)],
+                            env=env, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def gemm_gflops(n: int) -> float:
+    """GEMM rate with the BLAS threads of the current process."""
+    a = np.random.rand(n, n)
+    b = np.random.rand(n, n)
+    c = np.empty((n, n))
+    seconds = best_time(lambda: np.matmul(a, b, out=c))
+    return 2 * n ** 3 / seconds / 1e9
+
+
+def measure_copy_bandwidth_gbs(array_bytes: int, passes: int = 1) -> float:
+    """Read + write bandwidth of copying one array into another (one core)."""
+    elements = max(array_bytes // 8, 1)
+    src = np.random.rand(elements)
+    dst = np.empty_like(src)
+
+    def kernel():
+        for _ in range(passes):
+            np.copyto(dst, src)
+
+    seconds = best_time(kernel)
+    return 2 * elements * 8 * passes / seconds / 1e9
+
+
+def measure_ceilings() -> dict:
+    """Measures the ceilings of the current host."""
+    llc_bytes = read_llc_bytes()
+    print(f"Measuring roofline ceilings on {short_hostname()} (LLC {llc_bytes / 2**20:.1f} MiB, "
+          f"{ROOFLINE_THREADS} thread(s))...")
+    peak_gflops = measure_peak_gflops()
+    print(f"  Peak FLOP rate:  {peak_gflops:.1f} GFLOP/s")
+    dram_gbs = measure_copy_bandwidth_gbs(DRAM_ARRAY_LLC_MULTIPLE * llc_bytes)
+    print(f"  DRAM bandwidth:  {dram_gbs:.1f} GB/s")
+    # Two arrays of a quarter LLC each stay cache resident; repeat to get a measurable time
+    llc_gbs = measure_copy_bandwidth_gbs(llc_bytes // 4, passes=50)
+    print(f"  LLC bandwidth:   {llc_gbs:.1f} GB/s")
+    return {
+        "peak_gflops": peak_gflops,
+        "bandwidth_gbs": {"DRAM": dram_gbs, "LLC": llc_gbs},
+        "llc_bytes": llc_bytes,
+        "threads": ROOFLINE_THREADS,
+        "measured_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+# --- Ceiling Cache ---
+
+def short_hostname(host: str | None = None) -> str:
+    """
+    Host name without the domain (default: this host). Used for every cache key
+    and lookup, since gethostname() returns an FQDN on some nodes and the short
+    name on others.
+    """
+    return (host or socket.gethostname()).split(".")[0]
+
+
+def load_ceiling_cache(cache_file: Path = ROOFLINE_CACHE_FILE) -> dict:
+    """All cached ceilings, keyed by short host name."""
+    if not cache_file.is_file():
+        return {}
+    try:
+        return {short_hostname(host): entry for host, entry in json.loads(cache_file.read_text()).items()}
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Warning: Could not read roofline cache {cache_file}: {e}", file=sys.stderr)
+        return {}
+
+
+def get_ceilings(host: str | None = None, remeasure: bool = False,
+                 cache_file: Path = ROOFLINE_CACHE_FILE) -> dict | None:
+    """
+    Returns the ceilings of a host. The current host is measured (and cached)
+    if it has no entry yet; for other hosts only the cache is consulted.
+    """
+    current_host = short_hostname()
+    host = short_hostname(host or current_host)
+    cache = load_ceiling_cache(cache_file)
+    # Entries without a matching thread count mixed multi-core FLOPs with single-core bandwidth
+    valid = host in cache and cache[host].get("threads") == ROOFLINE_THREADS
+    if valid and not remeasure:
+        return cache[host]
+    if host != current_host:
+        if host in cache:
+            print(f"Warning: Cached ceilings of {host} were not measured with {ROOFLINE_THREADS} thread(s); "
+                  f"run roofline.py --remeasure on that node.", file=sys.stderr)
+        return None
+    cache[host] = measure_ceilings()
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        cache_file.write_text(json.dumps(cache, indent=2))
+        print(f"Roofline ceilings for {host} cached in {cache_file}")
+    except OSError as e:
+        print(f"Warning: Could not write roofline cache {cache_file}: {e}", file=sys.stderr)
+    return cache[host]
+
+
+# --- Analysis ---
+
+def compute_roofline_points(df_counters: pd.DataFrame, runtimes: pd.Series) -> pd.DataFrame:
+    """
+    Estimates FLOPs, traffic per memory level, arithmetic intensity and achieved
+    GFLOP/s per run from aggregated counters and run times (seconds).
+    Runs without FLOP counters get NaN.
+    """
+    flop_events = [e for e in ROOFLINE_FLOP_EVENTS if e in df_counters.columns]
+    points = pd.DataFrame(index=df_counters.index)
+    if not flop_events:
+        points["flops"] = np.nan
+    else:
+        weights = pd.Series({e: ROOFLINE_FLOP_EVENTS[e] for e in flop_events})
+        points["flops"] = df_counters[flop_events].fillna(0).mul(weights).sum(axis=1)
+    points["seconds"] = runtimes.reindex(df_counters.index)
+    points["gflops"] = points["flops"] / points["seconds"] / 1e9
+    for level, events in ROOFLINE_TRAFFIC_EVENTS.items():
+        available = [e for e in events if e in df_counters.columns]
+        traffic = df_counters[available].sum(axis=1, min_count=1) * CACHE_LINE_BYTES if available else np.nan
+        points[f"{level}_bytes"] = traffic
+        points[f"{level}_intensity"] = points["flops"] / points[f"{level}_bytes"].replace(0, np.nan)
+    return points
+
+
+def classify_bound(points: pd.DataFrame, ceilings: dict, level: str = "DRAM") -> pd.Series:
+    """'memory' if the run sits left of the ridge point of a level, else 'compute'."""
+    ridge = ceilings["peak_gflops"] / ceilings["bandwidth_gbs"][level]
+    return points[f"{level}_intensity"].apply(
+        lambda ai: "n/a" if pd.isna(ai) else ("memory" if ai < ridge else "compute")
+    )
+
+
+def plot_roofline(points: pd.DataFrame, ceilings: dict, host: str, output_file: Path):
+    """Log-log roofline of one host with every run as a point (one marker per memory level)."""
+    print(f"--- Generating Roofline Plot: {output_file} ---")
+    plt.rcParams['figure.dpi'] = 100
+    fig, ax = plt.subplots(figsize=(10, 7))
+    fig.set_facecolor('white')
+
+    intensities = np.logspace(-3, 3, 200)
+    peak = ceilings["peak_gflops"]
+    line_styles = {"DRAM": "-", "LLC": "--"}
+    for level, bandwidth in ceilings["bandwidth_gbs"].items():
+        ax.plot(intensities, np.minimum(peak, bandwidth * intensities), color='black',
+                linestyle=line_styles.get(level, ":"), label=f"{level} {bandwidth:.1f} GB/s")
+    ax.axhline(peak, color='grey', linewidth=0.5)
+    ax.text(intensities[0], peak * 1.1, f"Peak {peak:.1f} GFLOP/s", fontsize=9)
+
+    markers = {"DRAM": "o", "LLC": "s"}
+    colors = plt.cm.viridis(np.linspace(0, 1, max(len(points), 1)))
+    for color, (full_id, row) in zip(colors, points.iterrows()):
+        for level, marker in markers.items():
+            ai = row.get(f"{level}_intensity")
+            if pd.notna(ai) and pd.notna(row["gflops"]) and ai > 0 and row["gflops"] > 0:
+                ax.scatter(ai, row["gflops"], color=color, marker=marker,
+                           label=f"{full_id} ({level})", zorder=3)
+
+    ax.set_xscale("log")
+    ax.set_yscale("log")
+    ax.set_xlabel("Arithmetic Intensity (FLOP/byte)")
+    ax.set_ylabel("Performance (GFLOP/s)")
+    ax.set_title(f"Roofline: {host}")
+    ax.grid(which="both", linestyle="--", alpha=0.5, color='grey')
+    ax.legend(fontsize="small", loc="lower right")
+    plt.tight_layout()
+    try:
+        plt.savefig(output_file, format='png', dpi=300, facecolor=fig.get_facecolor())
+        print(f"Roofline plot saved successfully to {output_file}")
+    except Exception as e:
+        print(f"ERROR: Failed to save roofline plot: {e}", file=sys.stderr)
+    plt.close(fig)
+
+
+# --- Main Execution ---
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--peak-gflops"]: # Child of measure_peak_gflops
+        print(gemm_gflops(int(sys.argv[2])))
+        sys.exit(0)
+    remeasure = "--remeasure" in sys.argv[1:]
+    ceilings = get_ceilings(remeasure=remeasure)
+    print(json.dumps({short_hostname(): ceilings}, indent=2))
@@ -1,29 +1,48 @@
+import os
 import re
+import mmap
 import statistics
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import pandas as pd
 import numpy as np
 
 import config # For subdirs
+import binary_dedup
+
+# One pass over a log finds all three: error markers, the `time -p` real time
+# (',' or '.' as decimal separator) and the exit code line
+LOG_SCAN_REGEX = re.compile(
+    rb"(?P<error>slurmstepd: error:|ERROR|Failed)"
+    rb"|^real\s+(?P<real>[\d.,]+)"
+    rb"|Command finished with exit code: (?P<exit>\d+)",
+    re.MULTILINE,
+)
 
 def parse_slurm_log(log_path: Path):
     """
     Parses a Slurm log file to find the 'real' time from 'time -p',
     handling both '.' and ',' as decimal separators.
+    The file is memory-mapped and scanned once.
     """
     if not log_path.is_file(): return None, "missing"
     try:
-        with open(log_path, 'r', errors='ignore') as f: content = f.read()
-
-        # --- Error Checking Logic (remains the same) ---
         is_error = False
-        if "slurmstepd: error:" in content or "ERROR" in content or "Failed" in content:
-             is_error = True # Mark potential error, check exit code later
-
-        exit_match = re.search(r"Command finished with exit code: (\d+)", content)
-        exit_code_str = exit_match.group(1) if exit_match else None
-        exit_code_int = int(exit_code_str) if exit_code_str is not None else None
+        time_bytes = None
+        exit_code_int = None
+        with open(log_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size > 0:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for match in LOG_SCAN_REGEX.finditer(mm):
+                        if match.group("error"):
+                            is_error = True # Mark potential error, check exit code later
+                        elif match.group("real") is not None:
+                            if time_bytes is None: time_bytes = match.group("real")
+                        elif exit_code_int is None:
+                            exit_code_int = int(match.group("exit"))
 
+        # --- Error Checking Logic (remains the same) ---
         if is_error:
             if exit_code_int is not None and exit_code_int != 0:
                 return None, "program_error" # Error keyword + non-zero exit = program error
@@ -31,12 +50,8 @@ def parse_slurm_log(log_path: Path):
                 # Error keyword but zero or missing exit code = likely Slurm/setup error
                 return None, "slurm_error"
 
-        # --- Time Extraction (Modified Regex) ---
-        # Match digits, allow comma OR period as separator
-        match = re.search(r"^real\s+([\d.,]+)", content, re.MULTILINE)
-
-        if match:
-            time_str = match.group(1)
+        if time_bytes is not None:
+            time_str = time_bytes.decode()
             # Normalize the time string (replace comma with period)
             time_str_normalized = time_str.replace(',', '.')
             try:
@@ -65,6 +80,32 @@ def parse_slurm_log(log_path: Path):
         print(f"ERROR: Parsing log file {log_path}: {e}")
         return None, "parse_error"
 
+def parse_log_chunk(log_paths):
+    """Parses a chunk of logs in a worker process; returns (times, statuses) lists."""
+    times, statuses = [], []
+    for log_path in log_paths:
+        real_time, status = parse_slurm_log(log_path)
+        times.append(real_time if status == "success" else np.nan)
+        statuses.append(status)
+    return times, statuses
+
+def parse_logs_parallel(log_paths):
+    """
+    Parses all logs in chunks of config.LOG_PARSE_CHUNK_SIZE on a process pool.
+    Returns (times array with NaN for failed runs, statuses list) in input order.
+    """
+    chunk_size = config.LOG_PARSE_CHUNK_SIZE
+    chunks = [log_paths[i:i + chunk_size] for i in range(0, len(log_paths), chunk_size)]
+    workers = min(config.LOG_PARSE_WORKERS, len(chunks))
+    if workers <= 1:
+        results = [parse_log_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(parse_log_chunk, chunks))
+    times = np.fromiter((t for chunk_times, _ in results for t in chunk_times), dtype=float, count=len(log_paths))
+    statuses = [status for _, chunk_statuses in results for status in chunk_statuses]
+    return times, statuses
+
 # --- analyze_log_files function remains the same ---
 # (It uses the return values from the corrected parse_slurm_log)
 def analyze_log_files(programs_to_run, flag_configs, num_runs, base_output_dir):
@@ -77,67 +118,62 @@ def analyze_log_files(programs_to_run, flag_configs, num_runs, base_output_dir):
         print("INFO: No programs were selected to run, skipping analysis.")
         return None
 
-    results_data = []
-    total_logs_expected = len(programs_to_run) * len(flag_configs) * num_runs
-    logs_processed = 0
-    logs_missing = 0
-    logs_parsed_error = 0
-    successful_runs = 0
-    program_errors = 0
-    slurm_errors = 0
-    no_time_errors = 0
 
+    # Configurations with a binary identical to an earlier one reuse its logs
+    aliases = binary_dedup.load_aliases(base_output_dir)
+    if aliases:
+        print(f"INFO: {len(aliases)} configurations share the runs of an identical binary.")
 
+    # Expected logs, one row of num_runs logs per (program, flags) configuration
+    config_rows = []
+    log_paths = []
     for prog in programs_to_run:
         prog_name = prog['name']
-        # Use the sanitized flags ID consistent with build/results structure
-        for flags_id_orig, flags_list in flag_configs.items():
-            run_times = []
-            statuses = []
+        # flags_id (the flag_configs key) is the key used for logs and builds
+        for flags_id, flags_list in flag_configs.items():
             flags_string = " ".join(sorted(flags_list)) # Recreate for storage
-            # Need the sanitized ID to match build structure if different from original key
-            # This assumes utils.sanitize_flags is available or logic is replicated
-            # For simplicity here, assume flags_id_orig is the key used everywhere
-            # If build.py uses sanitized_flags_id, analysis needs it too.
-            # Let's assume flags_id_orig IS the key used throughout for now.
-            flags_id = flags_id_orig
-
-
+            representative = aliases.get((prog_name, flags_id), flags_id)
+            config_rows.append((prog_name, flags_id, flags_string, representative))
             for i in range(num_runs):
-                logs_processed += 1
-                # Construct job name using the consistent flags_id
-                job_name = f"{prog_name}_{flags_id}_run{i + 1}"
-                log_file = logs_dir / f"{job_name}.log"
-                real_time, status = parse_slurm_log(log_file)
-                statuses.append(status)
-
-                if status == "success":
-                    run_times.append(real_time)
-                    successful_runs += 1
-                else:
-                    run_times.append(np.nan)
-                    if status == "missing": logs_missing += 1
-                    elif status == "parse_error": logs_parsed_error += 1
-                    elif status == "program_error": program_errors += 1
-                    elif status == "slurm_error": slurm_errors += 1
-                    elif status == "no_time_found": no_time_errors += 1
-
-
-            # Calculate stats, ignoring NaNs
-            mean_time = np.nanmean(run_times) if not all(np.isnan(run_times)) else np.nan
-            stdev_time = np.nanstd(run_times) if np.count_nonzero(~np.isnan(run_times)) > 1 else 0.0
-            success_count = np.count_nonzero(~np.isnan(run_times))
-
-            results_data.append({
-                "Program": prog_name,
-                "FlagsID": flags_id, # Store the ID used for matching logs/builds
-                "FlagsStr": flags_string, # Store the full flags string
-                "MeanTime": mean_time,
-                "StdDev": stdev_time,
-                "Runs": success_count, # Number of successful runs found
-                "RawTimes": run_times, # Store list of times (incl NaNs)
-                "Statuses": statuses, # Store list of statuses
-            })
+                log_paths.append(logs_dir / f"{prog_name}_{representative}_run{i + 1}.log")
+
+    # Parse each log once, even if aliases share it
+    unique_paths = list(dict.fromkeys(log_paths))
+    unique_times, unique_statuses = parse_logs_parallel(unique_paths)
+    log_index = {path: i for i, path in enumerate(unique_paths)}
+    order = np.fromiter((log_index[path] for path in log_paths), dtype=int, count=len(log_paths))
+    times = unique_times[order]
+    statuses = [unique_statuses[i] for i in order]
+    logs_processed = len(unique_paths)
+    total_logs_expected = len(unique_paths)
+    status_counts = Counter(unique_statuses) # Logs actually on disk, not the fanned-out copies
+    successful_runs = status_counts["success"]
+    logs_missing = status_counts["missing"]
+    logs_parsed_error = status_counts["parse_error"]
+    program_errors = status_counts["program_error"]
+    slurm_errors = status_counts["slurm_error"]
+    no_time_errors = status_counts["no_time_found"]
+
+    # Statistics per configuration, ignoring NaNs (population stdev as before)
+    times_matrix = times.reshape(len(config_rows), num_runs)
+    success_counts = np.count_nonzero(~np.isnan(times_matrix), axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_times = np.nansum(times_matrix, axis=1) / success_counts
+        mean_times[success_counts == 0] = np.nan
+        deviations = np.nansum((times_matrix - mean_times[:, None]) ** 2, axis=1)
+        stdev_times = np.where(success_counts > 1, np.sqrt(deviations / success_counts), 0.0)
+
+    results_data = {
+        "Program": [row[0] for row in config_rows],
+        "FlagsID": [row[1] for row in config_rows], # Store the ID used for matching logs/builds
+        "FlagsStr": [row[2] for row in config_rows], # Store the full flags string
+        "SameBinaryAs": [row[3] if row[3] != row[1] else "" for row in config_rows], # Representative whose runs are reused
+        "MeanTime": mean_times,
+        "StdDev": stdev_times,
+        "Runs": success_counts, # Number of successful runs found
+        "RawTimes": times_matrix.tolist(), # Store list of times (incl NaNs)
+        "Statuses": [statuses[i * num_runs:(i + 1) * num_runs] for i in range(len(config_rows))], # Store list of statuses
+    }
 
     print(f"\n--- Analysis Summary ---")
     print(f"Expected logs: {total_logs_expected}")
@@ -150,7 +186,7 @@ def analyze_log_files(programs_to_run, flag_configs, num_runs, base_output_dir):
     print(f"Runs with no time found (but exit 0): {no_time_errors}")
 
 
-    if not results_data:
+    if not config_rows:
          print("ERROR: No results could be parsed. Cannot proceed.")
          return None
 
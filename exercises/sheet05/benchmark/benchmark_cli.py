@@ -16,6 +16,11 @@ import build
 import slurm
 import analyze
 import report
+import flag_search
+import binary_dedup
+import local_runner
+import pipeline
+import profile_diff
 
 def load_program_definitions(config_file_path):
     """Loads program definitions from the JSON file."""
@@ -55,7 +60,8 @@ def load_program_definitions(config_file_path):
 def prepare_program_configurations(all_program_defs):
     """
     Creates specific program instance configurations for ALL programs
-    defined in the JSON, expanding identity parameters.
+    defined in the JSON, expanding identity parameters and sweeping compile
+    parameters that list "options" (one instance per combination).
     Assumes src_dir in definitions is absolute.
     """
     programs_to_run = []
@@ -93,6 +99,14 @@ def prepare_program_configurations(all_program_defs):
                  single_instance_params[identity_param_key] = identity_param_info["default"]
             instances_to_create.append(single_instance_params)
 
+        # Compile parameter sweeps: every combination of their options
+        sweep_keys = [key for key, info in defined_params.items()
+                      if info.get("type") == "compile" and len(info.get("options", [])) > 1]
+        for key in sweep_keys:
+            instances_to_create = [dict(params, **{key: value})
+                                   for params in instances_to_create
+                                   for value in defined_params[key]["options"]]
+
         # Configure each instance
         for instance_params in instances_to_create:
             prog = copy.deepcopy(base_config) # Start with a copy of the base definition
@@ -107,11 +121,16 @@ def prepare_program_configurations(all_program_defs):
             else:
                  print(f"DEBUG Configuring instance '{instance_name}' from base '{base_name}' (no identity expansion or default)")
 
+            # Swept compile parameters become part of the instance name (e.g. nbody_N1000_M100)
+            for key in sweep_keys:
+                instance_name += f"_{key}{instance_params[key]}"
+
             prog['name'] = instance_name # Set the unique name for this instance
 
             # --- Apply Parameters (Defaults and Identity) ---
             prog['run_args'] = []
             prog['compile_defs'] = []
+            prog['compile_params'] = {} # Compile parameter values (pipeline.py orders builds by them)
 
             # Use instance_params (identity) + defaults for others
             current_params = {}
@@ -145,6 +164,7 @@ def prepare_program_configurations(all_program_defs):
                 elif param_type == "compile":
                     fmt = param_info.get("format", "-D{key}={value}")
                     prog['compile_defs'].append(fmt.format(key=param_key, value=value))
+                    prog['compile_params'][param_key] = value
                 elif param_type == "identity":
                     # Handle updates based on identity param (e.g., NPB class)
                     if param_info.get("updates_exe_name"):
@@ -196,13 +216,14 @@ def main():
     )
     parser.add_argument(
         '--flags-mode',
-        choices=['levels', 'o2_vs_o3_diff', 'o2_to_o3_cumulative'], # Added new choice
+        choices=['levels', 'o2_vs_o3_diff', 'o2_to_o3_cumulative', 'pgo_lto'],
         default='levels',
         help=(
             "Which set of flag configurations to test: "
             "'levels' for O0-Ofast, "
             "'o2_vs_o3_diff' for individual O3 flags added to O2 (Exercise B default), "
-            "'o2_to_o3_cumulative' for adding O3 flags cumulatively to O2."
+            "'o2_to_o3_cumulative' for adding O3 flags cumulatively to O2, "
+            "'pgo_lto' for profile-guided and link-time optimized builds of O2/O3."
         )
     )
     parser.add_argument(
@@ -210,13 +231,29 @@ def main():
     )
     # Add subparsers or other arguments as needed...
     parser.add_argument('--force-rebuild', action='store_true', help="Force rebuild even if executables exist.")
+    parser.add_argument('-j', '--build-jobs', type=int, default=config.DEFAULT_BUILD_JOBS, help="CPU budget for parallel builds (shared with ninja through a jobserver).")
     parser.add_argument('--submit', action='store_true', help="Actually submit Slurm jobs (default is generate only).")
-    parser.add_argument('--action', choices=['full-run', 'build', 'run', 'analyze', 'report'], default='full-run', help="Action to perform.")
+    parser.add_argument('--backend', choices=['slurm', 'local'], default='slurm',
+                        help="Where the run stage executes: Slurm jobs, or this machine with runs pinned to isolated physical cores.")
+    parser.add_argument('--local-workers', type=int, default=None,
+                        help="Maximum concurrent runs for --backend local (default: one per isolated physical core).")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="full-run: run configurations while others are still building and delete finished builds "
+                             "(for large compile parameter sweeps). Slurm backend requires --submit.")
+    parser.add_argument('--pipeline-depth', type=int, default=config.PIPELINE_DEPTH,
+                        help="Maximum configurations built but not yet finished running with --pipeline.")
+    parser.add_argument('--no-dedup', action='store_true', help="Run every configuration, even if its binary is identical to another configuration's.")
+    parser.add_argument('--batch-runs', type=int, default=0, help="Pack this many runs into each task of one Slurm job array (0 = one job per run).")
+    parser.add_argument('--action', choices=['full-run', 'build', 'run', 'analyze', 'report', 'flag-search', 'profile'], default='full-run', help="Action to perform ('profile': per-function perf profiles of existing builds, compared between configurations).")
     parser.add_argument('--skip-build', action='store_true', help="Skip build stage.")
     parser.add_argument('--skip-run', action='store_true', help="Skip run stage (Slurm generation/submission).")
     parser.add_argument('--skip-analyze', action='store_true', help="Skip analysis stage.")
     parser.add_argument('--skip-report', action='store_true', help="Skip report stage.")
     parser.add_argument('--results-csv', type=Path, help="Path to existing raw results CSV for report/analyze stage.")
+    parser.add_argument('--search-strategy', choices=config.FLAG_SEARCH_STRATEGIES, default='elimination', help="Flag search strategy (--action flag-search).")
+    parser.add_argument('--search-budget', type=int, default=config.FLAG_SEARCH_DEFAULT_BUDGET, help="Benchmark runs per program for the flag search.")
+    parser.add_argument('--search-backend', choices=['slurm', 'local'], default='slurm', help="Where flag search runs execute (Slurm jobs are waited for).")
+    parser.add_argument('--search-seed', type=int, default=0, help="Random seed for the genetic and halving strategies.")
 
 
     args = parser.parse_args()
@@ -229,7 +266,7 @@ def main():
     print(f"INFO: Flags mode: {args.flags_mode}")
     print(f"INFO: Action: {args.action}")
 
-    if not utils.load_modules(verbose=args.verbose): sys.exit(1)
+    if not utils.load_modules(verbose=args.verbose, optional=args.backend == 'local'): sys.exit(1)
     args.output_dir.mkdir(parents=True, exist_ok=True)
     if not utils.ensure_output_dirs(args.output_dir): sys.exit(1)
 
@@ -271,21 +308,65 @@ def main():
         flag_configs = utils.get_o2_to_o3_cumulative_configs()
         print(f"INFO: Generated {len(flag_configs)} cumulative configurations.")
     # --- END ADDED ELIF ---
+    elif args.flags_mode == 'pgo_lto':
+        print("INFO: Generating PGO and LTO build configurations.")
+        flag_configs = utils.get_pgo_lto_configs()
+        print(f"INFO: Generated {len(flag_configs)} PGO/LTO configurations.")
     else: # Should be caught by argparse choices, but defensive check
         parser.error(f"Invalid flags-mode: {args.flags_mode}")
     print(f"INFO: Total flag configurations to test per program instance: {len(flag_configs)}")
 
+    # --- Flag Search (replaces the fixed flag configurations) ---
+    if args.action == 'flag-search':
+        flag_search.run_flag_search(
+            programs_to_run, args.output_dir, args.search_strategy, args.search_budget,
+            args.search_backend, seed=args.search_seed, max_jobs=args.build_jobs
+        )
+        return
+
+    # --- Differential Profiles (of the existing builds) ---
+    if args.action == 'profile':
+        build_results = build.find_existing_builds(programs_to_run, flag_configs, args.output_dir)
+        if not any(build_results.values()):
+            print("ERROR: No existing executables found. Run --action build first.")
+            sys.exit(1)
+        profile_diff.run_profile_diff(
+            programs_to_run, flag_configs, build_results, args.output_dir,
+            backend=args.backend, submit=getattr(args, 'submit', False),
+            force=getattr(args, 'force_rebuild', False)
+        )
+        return
+
     # --- Execute Actions ---
     build_results = {}
     jobs_info = {}
     analysis_df = None
     plot_paths = {}
 
+    # Pipelined Build + Run Stage (replaces the separate build and run stages)
+    pipelined = args.pipeline and args.action == 'full-run'
+    if args.pipeline and not pipelined:
+        print("WARNING: --pipeline only applies to --action full-run. Ignoring it.")
+    if pipelined and args.backend == 'slurm' and not getattr(args, 'submit', False):
+        print("ERROR: --pipeline with the Slurm backend needs --submit (builds are collected once their jobs finish).")
+        sys.exit(1)
+    if pipelined:
+        build_results = pipeline.run_pipeline(
+            programs_to_run, flag_configs, args.num_runs, args.output_dir,
+            backend=args.backend, max_jobs=args.build_jobs, depth=args.pipeline_depth,
+            force_rebuild=getattr(args, 'force_rebuild', False), local_workers=args.local_workers,
+            dedup=config.DEDUP_IDENTICAL_BINARIES and not args.no_dedup
+        )
+        if build_results and not any(build_results.values()):
+             print("ERROR: All builds failed. Check logs. Aborting further steps.")
+             sys.exit(1)
+
     # Build Stage
-    if args.action in ['full-run', 'build'] and not getattr(args, 'skip_build', False):
+    if args.action in ['full-run', 'build'] and not getattr(args, 'skip_build', False) and not pipelined:
         build_results = build.build_configurations(
             programs_to_run, flag_configs, args.output_dir,
-            getattr(args, 'force_rebuild', False)
+            getattr(args, 'force_rebuild', False),
+            max_jobs=args.build_jobs
         )
         # Check build results...
         successful_builds = sum(1 for path in build_results.values() if path is not None)
@@ -297,7 +378,7 @@ def main():
 
 
     # Run Stage
-    if args.action in ['full-run', 'run'] and not getattr(args, 'skip_run', False):
+    if args.action in ['full-run', 'run'] and not getattr(args, 'skip_run', False) and not pipelined:
         # Populate build_results if build was skipped...
         if not build_results and (args.action == 'run' or getattr(args, 'skip_build', False)):
              print("INFO: Build stage skipped, attempting to find existing executables for run stage.")
@@ -308,10 +389,24 @@ def main():
                   print("ERROR: No existing executables found and build was skipped. Cannot run.")
                   sys.exit(1)
 
-        jobs_info = slurm.run_slurm_benchmarks(
-            programs_to_run, flag_configs, build_results, args.num_runs,
-            args.output_dir, getattr(args, 'submit', False)
-        )
+        # Identical executables are run once; analysis fans their results out
+        if config.DEDUP_IDENTICAL_BINARIES and not args.no_dedup:
+            aliases = binary_dedup.group_identical_binaries(programs_to_run, flag_configs, args.output_dir)
+        else:
+            binary_dedup.clear_aliases(args.output_dir)
+            aliases = {}
+
+        if args.backend == 'local':
+            jobs_info = local_runner.run_local_benchmarks(
+                programs_to_run, flag_configs, build_results, args.num_runs,
+                args.output_dir, max_workers=args.local_workers, aliases=aliases
+            )
+        else:
+            jobs_info = slurm.run_slurm_benchmarks(
+                programs_to_run, flag_configs, build_results, args.num_runs,
+                args.output_dir, getattr(args, 'submit', False),
+                runs_per_job=args.batch_runs, aliases=aliases
+            )
 
     # Analyze Stage
     if args.action in ['full-run', 'analyze'] and not getattr(args, 'skip_analyze', False):
@@ -349,13 +444,15 @@ def main():
 
 
         if analysis_df is not None:
-            plot_paths = report.create_plots(analysis_df, args.output_dir)
+            comparison_df = report.compare_to_baseline(analysis_df, args.output_dir)
+            plot_paths = report.create_plots(analysis_df, args.output_dir, comparison_df)
             # Get the list of program instance names that were actually analyzed
             analyzed_program_names = sorted(analysis_df['Program'].unique())
             report.generate_markdown_report(
                 analysis_df, plot_paths,
                 analyzed_program_names, # Pass names from analysis df
-                flag_configs, args.output_dir
+                flag_configs, args.output_dir,
+                comparison_df=comparison_df
             )
         else:
              print("INFO: No analysis data available. Skipping report generation.")
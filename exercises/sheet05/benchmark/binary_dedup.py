@@ -0,0 +1,149 @@
+# binary_dedup.py
+"""
+Detects flag configurations that produce the same executable for a program.
+
+Many O2_plus_* configurations leave the machine code of a program unchanged.
+After the build, the loaded sections of every executable are hashed (code and
+data, but not the build ID note, which changes with the non-loaded .comment
+and debug sections); per program, configurations with the same digest form a
+group. Only the group's representative (the first configuration in
+flag_configs order) is run. analyze.py fans the representative's run logs out
+to the aliases. The alias map is saved next to the results so a later
+'analyze' or 'report' action uses the same grouping.
+"""
+import hashlib
+import json
+import struct
+from pathlib import Path
+
+import config
+from utils import sanitize_flags
+
+ELF_MAGIC = b"\x7fELF"
+SHF_ALLOC = 0x2
+SHT_NOBITS = 8
+# Loaded, but differs between otherwise identical binaries
+IGNORED_SECTIONS = {".note.gnu.build-id"}
+ALIASES_FILE = "binary_aliases.json"
+
+
+def read_elf_sections(data):
+    """[(name, type, flags, addr, offset, size)] of an ELF image, or None if it is not ELF."""
+    if data[:4] != ELF_MAGIC or len(data) < 64:
+        return None
+    is_64 = data[4] == 2
+    endian = "<" if data[5] == 1 else ">"
+    if is_64:
+        shoff, = struct.unpack_from(endian + "Q", data, 0x28)
+        shentsize, shnum, shstrndx = struct.unpack_from(endian + "HHH", data, 0x3A)
+        header_format = endian + "IIQQQQIIQQ"
+    else:
+        shoff, = struct.unpack_from(endian + "I", data, 0x20)
+        shentsize, shnum, shstrndx = struct.unpack_from(endian + "HHH", data, 0x2E)
+        header_format = endian + "IIIIIIIIII"
+    if shoff == 0 or shnum == 0 or shoff + shnum * shentsize > len(data):
+        return None
+    headers = [struct.unpack_from(header_format, data, shoff + i * shentsize) for i in range(shnum)]
+    names_offset = headers[shstrndx][4] if shstrndx < shnum else 0
+
+    def section_name(offset):
+        start = names_offset + offset
+        return data[start:data.index(b"\0", start)].decode(errors="replace")
+
+    # Fields: name, type, flags, addr, offset, size, link, info, addralign, entsize
+    return [(section_name(h[0]), h[1], h[2], h[3], h[4], h[5]) for h in headers[1:]]
+
+
+def binary_digest(exe_path):
+    """
+    SHA-256 over the loaded sections (name, address, contents) of an executable.
+    Falls back to hashing the whole file for non-ELF files.
+    """
+    data = Path(exe_path).read_bytes()
+    sections = read_elf_sections(data)
+    hasher = hashlib.sha256()
+    if sections is None:
+        hasher.update(data)
+        return hasher.hexdigest()
+    for name, sh_type, flags, addr, offset, size in sections:
+        if not flags & SHF_ALLOC or name in IGNORED_SECTIONS:
+            continue
+        hasher.update(f"{name}:{addr:x}:{size:x}\0".encode())
+        if sh_type != SHT_NOBITS:
+            hasher.update(data[offset:offset + size])
+    return hasher.hexdigest()
+
+
+def expected_exe_path(prog, flags_list, base_output_dir):
+    """Executable path of a (program, flags) build (same layout as build.build_program)."""
+    sanitized_flags_id = sanitize_flags(" ".join(sorted(flags_list)))
+    return base_output_dir / config.BUILD_SUBDIR / prog['name'] / sanitized_flags_id / prog['exe_subdir'] / prog['exe_name']
+
+
+def group_identical_binaries(programs_to_run, flag_configs, base_output_dir):
+    """
+    Groups each program's executables by binary_digest.
+    Returns {(prog_name, flags_id): representative flags_id} for the aliases only
+    (configurations whose binary equals that of an earlier configuration) and
+    saves it via save_aliases.
+    """
+    print("\n--- Detecting Identical Binaries ---")
+    aliases = {}
+    for prog in programs_to_run:
+        representatives = {} # {digest: first flags_id with that binary}
+        for flags_id, flags_list in flag_configs.items():
+            exe_path = expected_exe_path(prog, flags_list, base_output_dir)
+            try:
+                digest = binary_digest(exe_path)
+            except OSError:
+                continue # Build failed or missing; handled by the run stage
+            representative = representatives.setdefault(digest, flags_id)
+            if representative != flags_id:
+                aliases[(prog['name'], flags_id)] = representative
+
+    total = sum(1 for prog in programs_to_run for _ in flag_configs)
+    print(f"INFO: {len(aliases)} of {total} configurations produce a binary identical to another one "
+          f"and will not be run separately.")
+    for (prog_name, flags_id), representative in sorted(aliases.items()):
+        print(f"  {prog_name}: {flags_id} == {representative}")
+    save_aliases(aliases, base_output_dir)
+    return aliases
+
+
+def aliases_path(base_output_dir):
+    return base_output_dir / config.RESULTS_SUBDIR / ALIASES_FILE
+
+
+def save_aliases(aliases, base_output_dir):
+    """Writes the alias map as {prog_name: {flags_id: representative}}."""
+    nested = {}
+    for (prog_name, flags_id), representative in aliases.items():
+        nested.setdefault(prog_name, {})[flags_id] = representative
+    path = aliases_path(base_output_dir)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(nested, indent=2, sort_keys=True))
+    except OSError as e:
+        print(f"WARNING: Could not save binary aliases to {path}: {e}")
+
+
+def load_aliases(base_output_dir):
+    """Alias map saved by group_identical_binaries ({} if there is none)."""
+    path = aliases_path(base_output_dir)
+    if not path.is_file():
+        return {}
+    try:
+        nested = json.loads(path.read_text())
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"WARNING: Could not read binary aliases {path}: {e}")
+        return {}
+    return {(prog_name, flags_id): representative
+            for prog_name, group in nested.items() for flags_id, representative in group.items()}
+
+
+def clear_aliases(base_output_dir):
+    """Removes a saved alias map (every configuration is run on its own)."""
+    try:
+        aliases_path(base_output_dir).unlink()
+    except OSError:
+        pass
@@ -1,62 +1,154 @@
 # build.py
+import hashlib
 import os
+import re
 import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
 import stat
+import sys
 
 import config
+import compile_cache
 from utils import run_command, sanitize_flags
 
-def build_program(prog_config, flags_list, base_output_dir, force_rebuild=False):
+class Jobserver:
+    """
+    GNU make compatible jobserver: a named FIFO holding one byte per free job
+    slot. Children get it through MAKEFLAGS and take a byte before starting an
+    extra job, so nested ninja/make/gcc -flto=jobserver processes share one
+    CPU budget with the outer build executor. make and gcc get the inherited
+    fd pair (--jobserver-auth=R,W); ninja's client only accepts the FIFO path
+    (--jobserver-auth=fifo:PATH).
     """
-    Builds a single program with a specific list of optimization flags.
 
-    Args:
-        prog_config (dict): Configuration dictionary for the program instance.
-        flags_list (list): List of flag strings (e.g., ["-O2", "-fflag"]).
-        base_output_dir (Path): Base directory for all outputs.
-        force_rebuild (bool): If True, delete existing build dir first.
+    def __init__(self, slots):
+        self.slots = max(1, slots)
+        self._dir = tempfile.mkdtemp(prefix="jobserver.")
+        self.fifo_path = os.path.join(self._dir, "fifo")
+        os.mkfifo(self.fifo_path, 0o600)
+        # Opening the read end non-blocking first keeps the write end's open from blocking
+        self.read_fd = os.open(self.fifo_path, os.O_RDONLY | os.O_NONBLOCK)
+        os.set_blocking(self.read_fd, True)
+        self.write_fd = os.open(self.fifo_path, os.O_WRONLY)
+        # Separate non-blocking read end: try_acquire must not wait for a token
+        # another thread's blocking acquire() took between a check and the read
+        self._poll_fd = os.open(self.fifo_path, os.O_RDONLY | os.O_NONBLOCK)
+        os.write(self.write_fd, b"+" * self.slots)
+
+    def acquire(self):
+        """Blocks until a job slot is free and returns its token."""
+        return os.read(self.read_fd, 1)
+
+    def try_acquire(self, max_tokens):
+        """Takes up to max_tokens currently free slots without blocking."""
+        tokens = []
+        while len(tokens) < max_tokens:
+            try:
+                token = os.read(self._poll_fd, 1)
+            except BlockingIOError:
+                break
+            if not token:
+                break
+            tokens.append(token)
+        return tokens
+
+    def release(self, tokens):
+        """Returns tokens (a token or a list of them) to the pipe."""
+        if isinstance(tokens, bytes):
+            tokens = [tokens]
+        for token in tokens:
+            os.write(self.write_fd, token)
+
+    def child_env(self, env, fifo=False):
+        """
+        Environment for a child that should join this jobserver: through the
+        inherited fds (make, gcc; needs pass_fds=self.fds) or the FIFO path (ninja).
+        """
+        env = env.copy()
+        auth = f"fifo:{self.fifo_path}" if fifo else f"{self.read_fd},{self.write_fd}"
+        env["MAKEFLAGS"] = f"-j{self.slots} --jobserver-auth={auth}"
+        return env
+
+    @property
+    def fds(self):
+        return (self.read_fd, self.write_fd)
+
+    def close(self):
+        for fd in (self.read_fd, self.write_fd, self._poll_fd):
+            os.close(fd)
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+def compile_cache_dir(base_output_dir):
+    """Directory of the shared object cache, or None if it is disabled."""
+    if not config.COMPILE_CACHE_ENABLED:
+        return None
+    return (base_output_dir / config.COMPILE_CACHE_SUBDIR).resolve()
 
-    Returns:
-        Path or None: Path to the built executable if successful, None otherwise.
+
+@lru_cache(maxsize=None)
+def ninja_supports_jobserver():
+    """True if the ninja in PATH is a jobserver client (see config.NINJA_JOBSERVER_MIN_VERSION)."""
+    try:
+        version = subprocess.run(["ninja", "--version"], capture_output=True, text=True).stdout
+    except OSError:
+        return False
+    match = re.match(r"(\d+)\.(\d+)", version.strip())
+    return bool(match) and tuple(map(int, match.groups())) >= config.NINJA_JOBSERVER_MIN_VERSION
+
+
+def source_digest(src_dir):
+    """SHA-256 over the relative paths and contents of all files under a source directory."""
+    hasher = hashlib.sha256()
+    for path in sorted(p for p in Path(src_dir).rglob("*") if p.is_file()):
+        rel = path.relative_to(src_dir)
+        if any(part.startswith(".") for part in rel.parts):
+            continue # .git and editor files
+        hasher.update(str(rel).encode() + b"\0")
+        hasher.update(path.read_bytes())
+    return hasher.hexdigest()
+
+
+def pgo_profile_dir(prog_config, base_flags, build_dir, base_output_dir):
     """
-    prog_name = prog_config['name'] # Use the specific instance name
-    # Create a unique identifier for the flags combination
-    flags_string = " ".join(sorted(flags_list)) # Sort for consistency
-    flags_id = sanitize_flags(flags_string) # Use helper from utils
+    Cache directory for the profile of a PGO build. The key covers the source
+    digest, the flags, compile_defs, the training input, the compiler and the
+    build directory (GCC names .gcda files after the absolute object paths).
+    """
+    hasher = hashlib.sha256()
+    hasher.update(source_digest(prog_config['src_dir'].resolve()).encode())
+    compiler = config.CXX if prog_config.get('lang', 'c') == 'c++' else config.CC
+    for part in ([compile_cache.compiler_identity(compiler), str(build_dir.resolve())] + base_flags
+                 + ["--defs"] + prog_config.get('compile_defs', [])
+                 + ["--train"] + pgo_train_args(prog_config)):
+        hasher.update(part.encode() + b"\0")
+    return (base_output_dir / config.PGO_PROFILE_SUBDIR / hasher.hexdigest()[:16]).resolve()
 
-    build_dir = base_output_dir / config.BUILD_SUBDIR / prog_name / flags_id
-    # Use the absolute src_dir from the prog_config instance
-    src_dir = prog_config['src_dir'].resolve()
-    build_type = prog_config['build_type']
-    exe_path = build_dir / prog_config['exe_subdir'] / prog_config['exe_name']
 
-    print(f"\n--- Building {prog_name} with flags '{flags_string}' (ID: {flags_id}) ---")
-    print(f"DEBUG Source dir: {src_dir}")
-    print(f"DEBUG Build dir: {build_dir}")
+def pgo_train_args(prog_config):
+    """Arguments of the PGO training run: "pgo_train_args" if given, else the benchmark's run_args."""
+    return [str(arg) for arg in prog_config.get('pgo_train_args', prog_config.get('run_args', []))]
 
-    if build_dir.exists():
-        if force_rebuild:
-            print(f"INFO: Force rebuild requested. Removing existing build directory: {build_dir}")
-            shutil.rmtree(build_dir)
-        elif exe_path.is_file():
-             print(f"INFO: Executable {exe_path.name} already exists. Skipping build (use --force-rebuild to override).")
-             return exe_path
-        else:
-             print(f"WARNING: Build dir exists but executable {exe_path.name} is missing. Rebuilding.")
-             shutil.rmtree(build_dir)
-
-    build_dir.mkdir(parents=True, exist_ok=True)
 
-    try:
-        env = os.environ.copy()
-        # Combine all flags into a single string for CMake/GCC
-        full_flags_string = flags_string # Already joined and sorted
+def run_build_steps(prog_config, flags_list, build_dir, env, pass_fds, jobserver, cache_dir):
+    """Configures and builds a program in build_dir with the given flags. Raises on failure."""
+    src_dir = prog_config['src_dir'].resolve()
+    build_type = prog_config['build_type']
+    # Combine all flags into a single string for CMake/GCC
+    full_flags_string = " ".join(flags_list)
+    uses_lto = any(flag.startswith("-flto") for flag in flags_list)
 
-        # --- Get compile_defs from the config ---
-        # Needed for both CMake and GCC builds potentially
-        compile_defs = prog_config.get('compile_defs', [])
+    # --- Get compile_defs from the config ---
+    # Needed for both CMake and GCC builds potentially
+    compile_defs = prog_config.get('compile_defs', [])
 
+    extra_tokens = [] # Job slots claimed for a ninja without jobserver support
+    try:
         if build_type == 'cmake':
             print("DEBUG Using CMake build type...")
             # Get base flags from config and append the optimization/specific flags
@@ -76,17 +168,34 @@ def build_program(prog_config, flags_list, base_output_dir, force_rebuild=False)
                 f"-DCMAKE_C_FLAGS='{final_c_flags}'",
                 f"-DCMAKE_CXX_FLAGS='{final_cxx_flags}'",
             ]
+            if cache_dir is not None:
+                # Every compile goes through the object cache (compile_cache.py as launcher)
+                launcher = f"{sys.executable};{Path(compile_cache.__file__).resolve()}"
+                cmake_args += [f"-DCMAKE_C_COMPILER_LAUNCHER={launcher}",
+                               f"-DCMAKE_CXX_COMPILER_LAUNCHER={launcher}"]
+            if uses_lto:
+                # Static libraries of LTO objects need the plugin-aware archiver
+                for tool, var in (("gcc-ar", "CMAKE_AR"), ("gcc-ranlib", "CMAKE_RANLIB")):
+                    tool_path = shutil.which(tool, path=env.get("PATH"))
+                    if tool_path: cmake_args.append(f"-D{var}={tool_path}")
             print(f"DEBUG Running CMake: {' '.join(cmake_args)}")
             # Use shell=True if flags contain spaces/quotes that need shell parsing
             # Be cautious with shell=True and ensure flags are properly escaped if needed
             run_command(cmake_args, cwd=build_dir, env=env, check=True, verbose=False) # Less verbose
 
             ninja_cmd = ["ninja"]
+            ninja_env = env
+            if jobserver is not None and ninja_supports_jobserver():
+                ninja_env = jobserver.child_env(env, fifo=True)
+            elif jobserver is not None:
+                # Old ninja ignores MAKEFLAGS: size -j by the slots free right now
+                extra_tokens = jobserver.try_acquire(config.MAX_JOBS_PER_BUILD - 1)
+                ninja_cmd += ["-j", str(1 + len(extra_tokens))]
             # Use the potentially updated cmake_target from the prog_config instance
             cmake_target = prog_config.get('cmake_target')
             if cmake_target: ninja_cmd.append(cmake_target)
             print(f"DEBUG Running Ninja: {' '.join(ninja_cmd)}")
-            run_command(ninja_cmd, cwd=build_dir, env=env, check=True, verbose=False) # Less verbose
+            run_command(ninja_cmd, cwd=build_dir, env=ninja_env, check=True, verbose=False, pass_fds=pass_fds) # Less verbose
 
         elif build_type == 'gcc':
             print("DEBUG Using direct GCC build type...")
@@ -112,17 +221,151 @@ def build_program(prog_config, flags_list, base_output_dir, force_rebuild=False)
             # Ensure the parent directory for the relative path exists within build_dir
             (build_dir / relative_exe_path.parent).mkdir(parents=True, exist_ok=True)
 
-            # --- Construct the compile command including compile_defs ---
-            compile_cmd = ([compiler] + flags_for_cmd + compile_defs +
-                           ["-o", str(relative_exe_path)] +
-                           include_flags +
-                           source_files_abs + link_libs)
-            print(f"DEBUG Compiler command: {' '.join(compile_cmd)}")
-            # Run the command with cwd=build_dir
-            run_command(compile_cmd, cwd=build_dir, check=True, verbose=False) # Less verbose
+            if cache_dir is None:
+                # --- Construct the compile command including compile_defs ---
+                compile_cmd = ([compiler] + flags_for_cmd + compile_defs +
+                               ["-o", str(relative_exe_path)] +
+                               include_flags +
+                               source_files_abs + link_libs)
+                print(f"DEBUG Compiler command: {' '.join(compile_cmd)}")
+                # Run the command with cwd=build_dir
+                run_command(compile_cmd, cwd=build_dir, env=env, check=True, verbose=False, pass_fds=pass_fds) # Less verbose
+            else:
+                # Compile each source through the object cache, then link
+                object_files = []
+                for sf_rel, sf_abs in zip(source_files_rel, source_files_abs):
+                    object_file = Path("obj") / (str(sf_rel).replace("/", "_") + ".o")
+                    (build_dir / object_file.parent).mkdir(parents=True, exist_ok=True)
+                    compile_cmd = ([compiler] + flags_for_cmd + compile_defs + include_flags +
+                                   ["-c", sf_abs, "-o", str(object_file)])
+                    print(f"DEBUG Compiler command (cached): {' '.join(compile_cmd)}")
+                    result = compile_cache.cached_compile(compile_cmd, cache_dir, cwd=build_dir, env=env)
+                    if result.returncode != 0:
+                        if result.stderr: print(f"ERROR STDERR:\n{result.stderr.strip()}")
+                        raise RuntimeError(f"Compilation of {sf_rel} failed with exit code {result.returncode}")
+                    object_files.append(str(object_file))
+                link_cmd = ([compiler] + flags_for_cmd + ["-o", str(relative_exe_path)] +
+                            object_files + link_libs)
+                print(f"DEBUG Link command: {' '.join(link_cmd)}")
+                run_command(link_cmd, cwd=build_dir, env=env, check=True, verbose=False, pass_fds=pass_fds) # Less verbose
         else:
-            print(f"ERROR: Unknown build type '{build_type}' for {prog_name}")
-            return None
+            raise ValueError(f"Unknown build type '{build_type}'")
+    finally:
+        if extra_tokens:
+            jobserver.release(extra_tokens)
+
+
+def clear_directory(directory):
+    """Removes the contents of a directory, keeping the directory itself."""
+    for entry in directory.iterdir():
+        if entry.is_dir() and not entry.is_symlink():
+            shutil.rmtree(entry)
+        else:
+            entry.unlink()
+
+
+def run_pgo_build(prog_config, base_flags, build_dir, base_output_dir, env, pass_fds, jobserver, cache_dir):
+    """
+    Profile-guided build in build_dir: reuses a cached profile or records one
+    (instrumented build + training run), then rebuilds with -fprofile-use.
+    Instrumented and final build share build_dir so the object paths, after
+    which GCC names the profile files, are the same.
+    """
+    prog_name = prog_config['name']
+    profile_dir = pgo_profile_dir(prog_config, base_flags, build_dir, base_output_dir)
+    if profile_dir.is_dir():
+        print(f"INFO: Reusing cached PGO profile for {prog_name}: {profile_dir}")
+    else:
+        staging_dir = profile_dir.with_name(f"{profile_dir.name}.tmp{os.getpid()}_{threading.get_ident()}")
+        if staging_dir.exists(): shutil.rmtree(staging_dir)
+        staging_dir.mkdir(parents=True)
+        try:
+            print(f"INFO: PGO stage 1/3: instrumented build of {prog_name}")
+            run_build_steps(prog_config, base_flags + [f"-fprofile-generate={staging_dir}"],
+                            build_dir, env, pass_fds, jobserver, cache_dir)
+            train_cmd = [f"./{Path(prog_config['exe_subdir']) / prog_config['exe_name']}"] + pgo_train_args(prog_config)
+            print(f"INFO: PGO stage 2/3: training run: {' '.join(train_cmd)}")
+            result = subprocess.run(train_cmd, cwd=build_dir, capture_output=True, text=True,
+                                    timeout=config.PGO_TRAIN_TIMEOUT)
+            if result.returncode != 0:
+                if result.stderr: print(f"ERROR STDERR:\n{result.stderr.strip()}")
+                raise RuntimeError(f"PGO training run failed with exit code {result.returncode}")
+            if not any(staging_dir.rglob("*.gcda")):
+                raise RuntimeError("PGO training run wrote no profile data")
+            try:
+                staging_dir.rename(profile_dir)
+            except OSError:
+                if not profile_dir.is_dir(): raise # Else: a concurrent build stored the same profile first
+        finally:
+            if staging_dir.exists(): shutil.rmtree(staging_dir, ignore_errors=True)
+        clear_directory(build_dir)
+
+    print(f"INFO: PGO stage 3/3: optimized build of {prog_name} with -fprofile-use")
+    run_build_steps(prog_config, base_flags + [f"-fprofile-use={profile_dir}"] + config.PGO_USE_EXTRA_FLAGS,
+                    build_dir, env, pass_fds, jobserver, cache_dir)
+
+
+def build_program(prog_config, flags_list, base_output_dir, force_rebuild=False, jobserver=None):
+    """
+    Builds a single program with a specific list of optimization flags.
+    A bare config.PGO_FLAG in flags_list selects a profile-guided build
+    (see run_pgo_build); -flto flags work like any other flag.
+
+    Args:
+        prog_config (dict): Configuration dictionary for the program instance.
+        flags_list (list): List of flag strings (e.g., ["-O2", "-fflag"]).
+        base_output_dir (Path): Base directory for all outputs.
+        force_rebuild (bool): If True, delete existing build dir first.
+        jobserver (Jobserver): Shared job slots. The caller holds one slot for
+            this build; ninja and gcc may take more from the jobserver.
+
+    Returns:
+        Path or None: Path to the built executable if successful, None otherwise.
+    """
+    prog_name = prog_config['name'] # Use the specific instance name
+    # Create a unique identifier for the flags combination
+    flags_string = " ".join(sorted(flags_list)) # Sort for consistency
+    flags_id = sanitize_flags(flags_string) # Use helper from utils
+
+    build_dir = base_output_dir / config.BUILD_SUBDIR / prog_name / flags_id
+    # Use the absolute src_dir from the prog_config instance
+    src_dir = prog_config['src_dir'].resolve()
+    exe_path = build_dir / prog_config['exe_subdir'] / prog_config['exe_name']
+
+    print(f"\n--- Building {prog_name} with flags '{flags_string}' (ID: {flags_id}) ---")
+    print(f"DEBUG Source dir: {src_dir}")
+    print(f"DEBUG Build dir: {build_dir}")
+
+    if build_dir.exists():
+        if force_rebuild:
+            print(f"INFO: Force rebuild requested. Removing existing build directory: {build_dir}")
+            shutil.rmtree(build_dir)
+        elif exe_path.is_file():
+             print(f"INFO: Executable {exe_path.name} already exists. Skipping build (use --force-rebuild to override).")
+             return exe_path
+        else:
+             print(f"WARNING: Build dir exists but executable {exe_path.name} is missing. Rebuilding.")
+             shutil.rmtree(build_dir)
+
+    build_dir.mkdir(parents=True, exist_ok=True)
+
+    try:
+        env = os.environ.copy()
+        pass_fds = ()
+        if jobserver is not None:
+            env = jobserver.child_env(env)
+            pass_fds = jobserver.fds
+        cache_dir = compile_cache_dir(base_output_dir)
+        if cache_dir is not None:
+            env[compile_cache.CACHE_DIR_ENV] = str(cache_dir)
+
+        sorted_flags = flags_string.split()
+        if config.PGO_FLAG in sorted_flags:
+            base_flags = [flag for flag in sorted_flags if flag != config.PGO_FLAG]
+            run_pgo_build(prog_config, base_flags, build_dir, base_output_dir,
+                          env, pass_fds, jobserver, cache_dir)
+        else:
+            run_build_steps(prog_config, sorted_flags, build_dir, env, pass_fds, jobserver, cache_dir)
 
         # Check the original full exe_path for existence after build
         if exe_path.is_file():
@@ -143,16 +386,28 @@ def build_program(prog_config, flags_list, base_output_dir, force_rebuild=False)
              except OSError as rm_err: print(f"WARNING: Could not remove failed build directory {build_dir}: {rm_err}")
         return None
 
-# --- build_configurations and find_existing_builds remain the same ---
-# (Make sure they are using the code from the previous correct version)
-def build_configurations(programs_to_run, flag_configs, base_output_dir, force_rebuild=False):
-    """Builds all selected programs for all specified flag configurations."""
+def run_build_job(jobserver, prog, flags_list, base_output_dir, force_rebuild):
+    """Runs one build while holding a job slot."""
+    token = jobserver.acquire()
+    try:
+        return build_program(prog, flags_list, base_output_dir, force_rebuild, jobserver=jobserver)
+    finally:
+        jobserver.release(token)
+
+
+def build_configurations(programs_to_run, flag_configs, base_output_dir, force_rebuild=False, max_jobs=None):
+    """
+    Builds all selected programs for all specified flag configurations.
+    Independent builds run concurrently; max_jobs (default config.DEFAULT_BUILD_JOBS)
+    is the CPU budget shared through a jobserver by the builds and the ninja/gcc
+    jobs inside them. A failed build is reported and the others continue.
+    """
     print("\n--- Starting Batch Build Process ---")
     build_results = {} # Store { (prog_name, flags_id): exe_path or None }
     total_builds = 0
     success_count = 0
     fail_count = 0
-    skip_count = 0 # Track skipped builds (already exists)
+    failed_builds = [] # (prog_name, flags_id) of failed builds
 
     if not programs_to_run:
         print("INFO: No programs selected for building.")
@@ -160,26 +415,50 @@ def build_configurations(programs_to_run, flag_configs, base_output_dir, force_r
 
     # Calculate total expected builds accurately
     total_builds = len(programs_to_run) * len(flag_configs)
+    max_jobs = max(1, max_jobs or config.DEFAULT_BUILD_JOBS)
     print(f"INFO: Planning to build {len(programs_to_run)} program instances with {len(flag_configs)} flag configurations each (Total: {total_builds} builds).")
+    print(f"INFO: Building with up to {max_jobs} parallel jobs "
+          f"(ninja jobserver support: {'yes' if ninja_supports_jobserver() else 'no, using -j per build'}).")
 
+    # One build per (program, sanitized flags ID); configs with identical flags share a build dir
+    build_jobs = {}
     for prog in programs_to_run:
         prog_name = prog['name'] # Use the instance name
         for flags_id, flags_list in flag_configs.items():
-            # Pass the specific prog instance config to build_program
-            exe_path = build_program(prog, flags_list, base_output_dir, force_rebuild)
             # Use the sanitized flags_id generated within build_program for the key
             # Re-generate it here for consistency in the results dictionary key
             flags_string = " ".join(sorted(flags_list))
             sanitized_flags_id = sanitize_flags(flags_string)
-            build_results[(prog_name, sanitized_flags_id)] = exe_path # Use sanitized ID as key
+            build_jobs.setdefault((prog_name, sanitized_flags_id), (prog, flags_list))
 
-            if exe_path:
-                # This count includes successful builds and skipped existing builds
-                 success_count += 1
-            else:
-                fail_count += 1
-                # Decide if failure for one config should stop others for this program
-                # break # Uncomment to stop building this program after first failure
+    cache_dir = compile_cache_dir(base_output_dir)
+    if cache_dir is not None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        compile_cache.reset_stats(cache_dir)
+
+    jobserver = Jobserver(max_jobs)
+    try:
+        with ThreadPoolExecutor(max_workers=min(max_jobs, len(build_jobs))) as executor:
+            futures = {
+                executor.submit(run_build_job, jobserver, prog, flags_list, base_output_dir, force_rebuild): key
+                for key, (prog, flags_list) in build_jobs.items()
+            }
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    exe_path = future.result()
+                except Exception as e: # build_program handles build errors; this is a safety net
+                    print(f"ERROR: Build of {key[0]} with flags ID {key[1]} raised: {e}")
+                    exe_path = None
+                build_results[key] = exe_path # Use sanitized ID as key
+                if exe_path:
+                    # This count includes successful builds and skipped existing builds
+                    success_count += 1
+                else:
+                    fail_count += 1
+                    failed_builds.append(key)
+    finally:
+        jobserver.close()
 
     print("\n--- Batch Build Summary ---")
     print(f"Total build attempts planned: {total_builds}")
@@ -188,7 +467,17 @@ def build_configurations(programs_to_run, flag_configs, base_output_dir, force_r
     print(f"Failed builds: {fail_count}")
 
     if fail_count > 0:
-        print("WARNING: One or more builds failed. Check logs above.")
+        print("WARNING: One or more builds failed. Check logs above. Failed configurations:")
+        for prog_name, flags_id in sorted(failed_builds):
+            print(f"  - {prog_name}: {flags_id}")
+
+    if cache_dir is not None:
+        hits, misses = compile_cache.read_stats(cache_dir)
+        print(f"Object cache: {hits} hits, {misses} compiled ({cache_dir})")
+        removed, freed = compile_cache.evict(cache_dir, config.COMPILE_CACHE_MAX_BYTES)
+        if removed:
+            print(f"INFO: Evicted {removed} cached objects ({freed / 1024**2:.1f} MiB) to stay below "
+                  f"{config.COMPILE_CACHE_MAX_BYTES / 1024**2:.0f} MiB.")
 
     return build_results # Return map of build attempts to results
 
@@ -0,0 +1,247 @@
+# compile_cache.py
+"""
+Content-addressed object file cache shared by all flag configurations.
+
+An object is keyed by the preprocessed translation unit, the compiler binary
+and the flags that reach the compiler proper, so a file whose effective input
+is the same in two build directories (e.g. compile_defs that it never uses)
+is compiled only once. build.py calls cached_compile() for direct gcc builds;
+CMake builds run this file as CMAKE_<LANG>_COMPILER_LAUNCHER:
+
+    python3 compile_cache.py gcc <flags> -o file.o -c file.c
+
+The cache directory is taken from the COMPILE_CACHE_DIR environment variable;
+without it (or for commands that are not a single-source compile) the
+command is run unchanged.
+"""
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+CACHE_DIR_ENV = "COMPILE_CACHE_DIR"
+STATS_FILE = "stats" # One byte appended per lookup: b"h" hit, b"m" miss
+OBJECT_SUFFIX = ".o"
+STDERR_SUFFIX = ".stderr"
+SOURCE_SUFFIXES = {".c", ".cc", ".cpp", ".cxx", ".C", ".i", ".ii"}
+# Preprocessor options (with a separate value); their effect is in the preprocessed source
+PREPROCESSOR_OPTIONS_WITH_VALUE = {"-I", "-D", "-U", "-include", "-imacros", "-isystem", "-iquote", "-idirafter"}
+PREPROCESSOR_OPTION_PREFIXES = ("-I", "-D", "-U", "-isystem", "-iquote", "-idirafter")
+DEPENDENCY_OPTIONS_WITH_VALUE = {"-MF", "-MT", "-MQ"}
+DEPENDENCY_OPTIONS = {"-MD", "-MMD", "-MP"}
+# Fraction of the size limit eviction shrinks the cache to, so it does not run on every build
+EVICTION_TARGET_FRACTION = 0.9
+# Code generated with -fprofile-use=DIR depends on the .gcda files in DIR
+PROFILE_USE_FLAG = "-fprofile-use"
+
+
+def parse_compile_command(args):
+    """
+    Splits a compile command into its parts, or returns None if it is not a
+    cacheable single-source compile (-c with one source and an -o output).
+    Returns dict(compiler, source, output, flags, cpp_flags, dep_flags) where
+    flags are the options that affect code generation, in their original order.
+    """
+    if len(args) < 2 or "-c" not in args[1:]:
+        return None
+    compiler, rest = args[0], args[1:]
+    output, sources, flags, cpp_flags, dep_flags = None, [], [], [], []
+    i = 0
+    while i < len(rest):
+        arg = rest[i]
+        has_value = i + 1 < len(rest)
+        if arg == "-o" and has_value:
+            output = rest[i + 1]; i += 2; continue
+        if arg in DEPENDENCY_OPTIONS_WITH_VALUE and has_value:
+            dep_flags += [arg, rest[i + 1]]; i += 2; continue
+        if arg in PREPROCESSOR_OPTIONS_WITH_VALUE and has_value:
+            cpp_flags += [arg, rest[i + 1]]; i += 2; continue
+        if arg in DEPENDENCY_OPTIONS:
+            dep_flags.append(arg)
+        elif arg.startswith(PREPROCESSOR_OPTION_PREFIXES):
+            cpp_flags.append(arg)
+        elif arg == "-c":
+            pass
+        elif not arg.startswith("-") and Path(arg).suffix in SOURCE_SUFFIXES:
+            sources.append(arg)
+        else:
+            flags.append(arg)
+        i += 1
+    if len(sources) != 1 or output is None or output == "-":
+        return None
+    # Profile data next to the object is not part of the key; instrumented objects
+    # (one-off profile paths, see build.run_pgo_build) are never reused
+    if PROFILE_USE_FLAG in flags or any(flag.startswith(("-fprofile-dir", "-fprofile-generate")) for flag in flags):
+        return None
+    # gcc names the depfile after the object with -MD and no -MF; -E has no object, so say it explicitly
+    if ({"-MD", "-MMD"} & set(dep_flags)) and "-MF" not in dep_flags:
+        dep_flags += ["-MF", str(Path(output).with_suffix(".d"))]
+        if "-MT" not in dep_flags and "-MQ" not in dep_flags:
+            dep_flags += ["-MT", output]
+    return {"compiler": compiler, "source": sources[0], "output": output,
+            "flags": flags, "cpp_flags": cpp_flags, "dep_flags": dep_flags}
+
+
+def compiler_identity(compiler, env=None):
+    """Resolved path, size and mtime of the compiler binary (changes on a compiler update)."""
+    path = shutil.which(compiler, path=(env or os.environ).get("PATH"))
+    if path is None:
+        return compiler
+    st = os.stat(path)
+    return f"{os.path.realpath(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def compute_key(command, preprocessed, cwd, env=None):
+    """Cache key of a parsed compile command and its preprocessed source."""
+    hasher = hashlib.sha256()
+    hasher.update(compiler_identity(command["compiler"], env).encode())
+    hasher.update(b"\0" + "\0".join(command["flags"]).encode() + b"\0")
+    # Debug info records the working directory
+    if any(flag.startswith("-g") and flag != "-g0" for flag in command["flags"]):
+        hasher.update(str(Path(cwd or os.getcwd()).resolve()).encode() + b"\0")
+    for flag in command["flags"]:
+        if flag.startswith(PROFILE_USE_FLAG + "="):
+            profile_dir = Path(cwd or ".") / flag.split("=", 1)[1]
+            for profile in sorted(profile_dir.rglob("*.gcda")):
+                hasher.update(profile.name.encode() + b"\0" + profile.read_bytes())
+    hasher.update(preprocessed)
+    return hasher.hexdigest()
+
+
+def cache_paths(cache_dir, key):
+    """(object, stderr) paths of a cache entry."""
+    entry_dir = Path(cache_dir) / key[:2]
+    return entry_dir / f"{key}{OBJECT_SUFFIX}", entry_dir / f"{key}{STDERR_SUFFIX}"
+
+
+def store_file(source, destination):
+    """Copies a file into the cache atomically (concurrent builds may store the same key)."""
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=destination.parent, prefix=".tmp")
+    os.close(fd)
+    try:
+        shutil.copyfile(source, tmp_name)
+        os.replace(tmp_name, destination)
+    finally:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+
+
+def record_lookup(cache_dir, hit):
+    """Appends one byte to the stats file (O_APPEND writes are atomic)."""
+    try:
+        fd = os.open(Path(cache_dir) / STATS_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, b"h" if hit else b"m")
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def cached_compile(args, cache_dir, cwd=None, env=None):
+    """
+    Runs a compile command through the cache.
+    Returns subprocess.CompletedProcess (stdout/stderr as text).
+    """
+    command = parse_compile_command(args)
+    if command is None or cache_dir is None:
+        return subprocess.run(args, cwd=cwd, env=env, capture_output=True, text=True)
+
+    # Preprocess with the dependency options so the depfile is written on hits too
+    preprocess_cmd = ([command["compiler"]] + command["flags"] + command["cpp_flags"]
+                      + command["dep_flags"] + ["-E", command["source"]])
+    preprocessed = subprocess.run(preprocess_cmd, cwd=cwd, env=env, capture_output=True)
+    if preprocessed.returncode != 0:
+        # Let the real compiler report the error
+        return subprocess.run(args, cwd=cwd, env=env, capture_output=True, text=True)
+
+    key = compute_key(command, preprocessed.stdout, cwd, env)
+    cached_object, cached_stderr = cache_paths(cache_dir, key)
+    output_path = Path(cwd or ".") / command["output"]
+    if cached_object.is_file():
+        try:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(cached_object, output_path) # Fresh mtime, so ninja sees it as up to date
+            os.utime(cached_object) # Mark as recently used for eviction
+            stderr = cached_stderr.read_text() if cached_stderr.is_file() else ""
+            record_lookup(cache_dir, hit=True)
+            return subprocess.CompletedProcess(args, 0, "", stderr)
+        except OSError:
+            pass # Evicted concurrently: compile instead
+
+    result = subprocess.run(args, cwd=cwd, env=env, capture_output=True, text=True)
+    record_lookup(cache_dir, hit=False)
+    if result.returncode == 0 and output_path.is_file():
+        try:
+            store_file(output_path, cached_object)
+            if result.stderr:
+                cached_stderr.write_text(result.stderr)
+        except OSError as e:
+            print(f"WARNING: Could not store {output_path.name} in compile cache: {e}", file=sys.stderr)
+    return result
+
+
+def read_stats(cache_dir):
+    """(hits, misses) recorded since the last reset_stats()."""
+    try:
+        data = (Path(cache_dir) / STATS_FILE).read_bytes()
+    except OSError:
+        return 0, 0
+    return data.count(b"h"), data.count(b"m")
+
+
+def reset_stats(cache_dir):
+    try:
+        (Path(cache_dir) / STATS_FILE).unlink()
+    except OSError:
+        pass
+
+
+def evict(cache_dir, max_bytes):
+    """
+    Removes least recently used entries until the cache is below max_bytes
+    (down to EVICTION_TARGET_FRACTION of it). Returns (files removed, bytes freed).
+    """
+    entries = []
+    total = 0
+    for path in Path(cache_dir).glob("*/*"):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+        total += st.st_size
+    if total <= max_bytes:
+        return 0, 0
+    target = max_bytes * EVICTION_TARGET_FRACTION
+    removed, freed = 0, 0
+    for _, size, path in sorted(entries):
+        if total - freed <= target:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        removed += 1
+        freed += size
+    return removed, freed
+
+
+def cache_size(cache_dir):
+    """Total size of the cache entries in bytes."""
+    return sum(p.stat().st_size for p in Path(cache_dir).glob("*/*") if p.is_file())
+
+
+if __name__ == "__main__":
+    # Compiler launcher mode (CMAKE_C_COMPILER_LAUNCHER / CMAKE_CXX_COMPILER_LAUNCHER)
+    if len(sys.argv) < 2:
+        print(f"Usage: {sys.argv[0]} <compiler> <args...>", file=sys.stderr)
+        sys.exit(2)
+    result = cached_compile(sys.argv[1:], os.environ.get(CACHE_DIR_ENV))
+    sys.stdout.write(result.stdout)
+    sys.stderr.write(result.stderr)
+    sys.exit(result.returncode)
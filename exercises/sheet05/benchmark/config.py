@@ -1,4 +1,5 @@
 # config.py
+import os
 from pathlib import Path
 
 # --- Default Source Code Locations (REMOVED) ---
@@ -21,6 +22,20 @@ SLURM_NTASKS = 1
 SLURM_NODES = 1
 SLURM_CPUS_PER_TASK = 1
 SLURM_TIME = "00:30:00"
+# Batched runs (--batch-runs N): N runs per job array task, one module load per task
+SLURM_BATCH_TIME = "04:00:00"
+SLURM_ARRAY_MAX_PARALLEL = None # Optional %N throttle on concurrently running array tasks
+SLURM_BATCH_SEED = None # Seed for the run order shuffle (None = different every time)
+
+# --- Local Execution Backend (local_runner.py) ---
+LOCAL_RESERVED_CORES = 1 # Physical cores kept free for the OS and this script (if more are available)
+LOCAL_RUN_TIMEOUT = 30 * 60 # Seconds per run, like SLURM_TIME
+
+# --- Pipelined Build and Run (pipeline.py, --pipeline) ---
+PIPELINE_DEPTH = 8 # Configurations built but not yet finished running (caps disk usage)
+PIPELINE_RUN_CORE_FRACTION = 0.5 # Local backend: share of isolated cores used for runs, the rest builds
+PIPELINE_POLL_SECONDS = 30 # Slurm backend: squeue polling interval
+PIPELINE_KEEP_EXECUTABLES = False # Keep build directories after their runs finished
 
 # --- GCC, CMake, Ninja Modules ---
 # (MODULES_TO_LOAD, CC, CXX remain the same)
@@ -32,11 +47,57 @@ MODULES_TO_LOAD = [
 CC = "gcc"
 CXX = "g++"
 
+# --- Parallel Builds ---
+# CPU budget shared by all concurrent builds and the ninja/gcc jobs inside them
+DEFAULT_BUILD_JOBS = os.cpu_count() or 1
+# Ninja joins a GNU make jobserver (its client only accepts the
+# --jobserver-auth=fifo:PATH form) from this version on; older versions get an
+# explicit -j sized by the job slots their build could claim
+NINJA_JOBSERVER_MIN_VERSION = (1, 13)
+# Upper limit for the -j of a single ninja build without jobserver support
+MAX_JOBS_PER_BUILD = 8
+
+# --- Object File Cache (compile_cache.py) ---
+# Objects are shared between flag configurations whose preprocessed source,
+# compiler and code generation flags are identical
+COMPILE_CACHE_ENABLED = True
+COMPILE_CACHE_SUBDIR = "compile_cache" # Relative to the base output dir
+COMPILE_CACHE_MAX_BYTES = 2 * 1024**3 # Least recently used objects are evicted above this
+
+# --- Multi-Stage Builds (PGO / LTO) ---
+# A bare PGO_FLAG in a flag configuration makes build_program build with
+# -fprofile-generate, run a training input (the program's "pgo_train_args" or
+# its run_args) and rebuild with -fprofile-use. Profiles are cached per source
+# digest, flags and training input.
+PGO_FLAG = "-fprofile-use"
+PGO_PROFILE_SUBDIR = "pgo_profiles" # Relative to the base output dir
+PGO_USE_EXTRA_FLAGS = ["-fprofile-correction", "-Wno-missing-profile"]
+PGO_TRAIN_TIMEOUT = 600 # Seconds
+# -flto=auto takes its LTRANS jobs from the build jobserver (GCC >= 11)
+LTO_FLAG = "-flto=auto"
+
+# --- Log Analysis ---
+LOG_PARSE_WORKERS = os.cpu_count() or 1 # Processes parsing Slurm logs
+LOG_PARSE_CHUNK_SIZE = 256 # Logs per worker task
+
 # --- Default Benchmarking Parameters ---
 # (DEFAULT_OPTIMIZATION_LEVELS, DEFAULT_NUM_RUNS remain the same)
 DEFAULT_OPTIMIZATION_LEVELS = ["O0", "O1", "O2", "O3", "Os", "Ofast"]
 DEFAULT_NUM_RUNS = 5
 
+# --- Identical Binary Detection (binary_dedup.py) ---
+DEDUP_IDENTICAL_BINARIES = True # Run only one configuration per group of identical executables
+
+# --- Statistical Comparison (report.py) ---
+# Baseline per program: the first of these FlagsIDs present, else the first configuration
+STATS_BASELINE_IDS = ["O2_baseline", "O2"]
+STATS_TEST = "mannwhitney" # Test whose Holm-adjusted p-value decides significance ("mannwhitney" or "welch")
+STATS_ALPHA = 0.05
+BOOTSTRAP_RESAMPLES = 2000 # Resamples for the speedup confidence intervals
+BOOTSTRAP_SEED = 0
+# Plot/report markers by Holm-adjusted p-value
+SIGNIFICANCE_MARKERS = [(0.001, "***"), (0.01, "**"), (0.05, "*")]
+
 # --- Flags for Exercise B ---
 # (O2_O3_DIFF_FLAGS dictionary remains the same)
 O2_O3_DIFF_FLAGS = {
@@ -56,3 +117,22 @@ O2_O3_DIFF_FLAGS = {
     "ftree-slp-vectorize": (0, 1),
     "funswitch-loops": (0, 1),
 }
+
+# --- Flag Search (flag_search.py, --action flag-search) ---
+FLAG_SEARCH_STRATEGIES = ["elimination", "genetic", "halving"]
+FLAG_SEARCH_DEFAULT_BUDGET = 200 # Benchmark runs per program
+FLAG_SEARCH_MIN_RUNS = 3 # Runs every candidate gets before racing
+FLAG_SEARCH_MAX_RUNS = 10 # Runs after which a candidate counts as decided
+FLAG_SEARCH_POPULATION = 8 # Genetic algorithm population size
+FLAG_SEARCH_ELITES = 2 # Best flag sets carried over to the next generation unchanged
+FLAG_SEARCH_MAX_STALLED_GENERATIONS = 3 # Generations without new runs before the genetic search stops
+FLAG_SEARCH_HALVING_CANDIDATES = 16 # Random flag sets in the first successive halving rung
+FLAG_SEARCH_POLL_SECONDS = 30 # squeue polling interval while waiting for search runs
+
+# --- Differential Profiles (profile_diff.py, --action profile) ---
+PROFILE_SUBDIR = "profiles" # Below RESULTS_SUBDIR: perf.data and perf script dumps
+PROFILE_EVENTS = ["cycles", "instructions"] # Time is split by the first, IPC = second / first
+PROFILE_FREQUENCY = 999 # perf record sampling frequency (Hz), as in sheet04
+PROFILE_TOP_FUNCTIONS = 15 # Functions per program in the time table of the report
+PROFILE_MIN_DELTA_SHARE = 0.02 # Significant: |delta| >= this share of the parent's run time ...
+PROFILE_MIN_RELATIVE_DELTA = 0.10 # ... and >= this share of the function's time
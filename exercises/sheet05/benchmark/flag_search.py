@@ -0,0 +1,355 @@
+# flag_search.py
+"""
+Per-program search for the best set of O2->O3 flags (config.O2_O3_DIFF_FLAGS)
+on top of -O2, within a fixed budget of benchmark runs.
+
+Strategies:
+  elimination - iterative elimination: start with all flags on, repeatedly
+                drop the flag whose removal helps most
+  genetic     - genetic algorithm over flag bit vectors
+  halving     - successive halving over random flag sets
+
+Candidates are compared by racing: every candidate gets a few runs, and only
+candidates whose confidence interval still overlaps the current best one get
+more, so clearly slower flag sets stop early. Builds go through
+build.build_configurations (existing executables and the object cache are
+reused); runs go to Slurm (one job per run, waited for) or run locally.
+"""
+import functools
+import json
+import math
+import random
+import subprocess
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import config
+import build
+import slurm
+import analyze
+import report
+from utils import sanitize_flags
+
+
+@functools.lru_cache(maxsize=None)
+def t_quantile(dof):
+    """Two-sided 95% t quantile (report.t_quantile, cached: racing asks for few distinct dof)."""
+    return float(report.t_quantile(dof))
+
+
+def search_flag_names():
+    """Flags that are off in O2 and on in O3, in a fixed order."""
+    return sorted(flag for flag, (o2_val, o3_val) in config.O2_O3_DIFF_FLAGS.items()
+                  if o2_val == 0 and o3_val == 1)
+
+
+class FlagSetEvaluator:
+    """
+    Builds and measures flag sets (frozensets of flag names) for one program,
+    keeping every run time so repeated evaluations only add runs.
+    """
+
+    def __init__(self, prog, base_output_dir, backend, budget_runs, max_jobs=None):
+        self.prog = prog
+        self.base_output_dir = base_output_dir
+        self.backend = backend
+        self.budget_runs = budget_runs
+        self.max_jobs = max_jobs
+        self.runs_used = 0
+        self.times = {} # flag set -> list of successful run times
+        self.failed = set() # flag sets whose build or runs failed
+        self.exe_paths = {}
+
+    @staticmethod
+    def flags_list(flag_set):
+        return ["-O2"] + [f"-{flag}" for flag in sorted(flag_set)]
+
+    def flags_id(self, flag_set):
+        return sanitize_flags(" ".join(sorted(self.flags_list(flag_set))))
+
+    @property
+    def budget_left(self):
+        return self.budget_runs - self.runs_used
+
+    def stats(self, flag_set):
+        """(mean, 95% CI half width, runs) of a flag set; mean is inf without runs."""
+        times = self.times.get(flag_set, [])
+        if not times:
+            return math.inf, math.inf, 0
+        n = len(times)
+        half_width = t_quantile(n - 1) * np.std(times, ddof=1) / math.sqrt(n) if n > 1 else math.inf
+        return float(np.mean(times)), half_width, n
+
+    def ensure_built(self, flag_sets):
+        """Builds the flag sets that have no executable yet (in parallel)."""
+        missing = [fs for fs in flag_sets if fs not in self.exe_paths and fs not in self.failed]
+        if not missing:
+            return
+        flag_configs = {self.flags_id(fs): self.flags_list(fs) for fs in missing}
+        results = build.build_configurations([self.prog], flag_configs, self.base_output_dir,
+                                             max_jobs=self.max_jobs)
+        for fs in missing:
+            exe_path = results.get((self.prog['name'], self.flags_id(fs)))
+            if exe_path:
+                self.exe_paths[fs] = exe_path
+            else:
+                self.failed.add(fs)
+
+    def log_file(self, flag_set, run_index):
+        """Slurm log of one run of a flag set."""
+        return (self.base_output_dir / config.SLURM_LOGS_SUBDIR
+                / f"{self.prog['name']}_{self.flags_id(flag_set)}_run{run_index + 1}.log")
+
+    def is_reusable(self, flag_set, run_index):
+        """True if the run's Slurm log already holds a successful time (earlier search)."""
+        return self.backend != "local" and analyze.parse_slurm_log(self.log_file(flag_set, run_index))[1] == "success"
+
+    def measure(self, flag_sets, runs):
+        """
+        Adds runs to flag sets within the remaining budget. runs is either a
+        count for all flag sets or a dict {flag set: count}. Runs reused from
+        existing Slurm logs do not count against the budget.
+        """
+        flag_sets = [fs for fs in dict.fromkeys(flag_sets) if fs not in self.failed]
+        self.ensure_built(flag_sets)
+        planned = []
+        charged = 0
+        for fs in flag_sets:
+            if fs in self.failed:
+                continue
+            start = len(self.times.get(fs, []))
+            count = runs[fs] if isinstance(runs, dict) else runs
+            for run_index in range(start, start + count):
+                reused = self.is_reusable(fs, run_index)
+                if not reused and charged >= self.budget_left:
+                    break
+                planned.append((fs, run_index))
+                charged += not reused
+        if not planned:
+            return
+        self.runs_used += charged
+        if self.backend == "local":
+            results = [(fs, self.run_local(fs)) for fs, _ in planned]
+        else:
+            results = self.run_slurm(planned)
+        for fs, seconds in results:
+            if seconds is None:
+                print(f"WARNING: Run of {self.prog['name']} with {self.flags_id(fs)} failed; dropping the flag set.")
+                self.failed.add(fs)
+                self.times.pop(fs, None)
+            elif fs not in self.failed:
+                self.times.setdefault(fs, []).append(seconds)
+
+    def run_local(self, flag_set):
+        """Runs the executable once on this node and returns its wall time."""
+        exe_path = self.exe_paths[flag_set]
+        start = time.perf_counter()
+        result = subprocess.run([str(exe_path)] + self.prog['run_args'], cwd=exe_path.parent,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        seconds = time.perf_counter() - start
+        return seconds if result.returncode == 0 else None
+
+    def run_slurm(self, planned):
+        """
+        Submits one Slurm job per planned run and waits for all of them. Runs
+        whose log already holds a successful time (earlier search) are reused.
+        """
+        exe_rel_path = Path(self.prog['exe_subdir']) / self.prog['exe_name']
+        job_ids, log_files = [], []
+        for fs, run_index in planned:
+            log_file = self.log_file(fs, run_index)
+            log_files.append((fs, log_file))
+            if analyze.parse_slurm_log(log_file)[1] == "success":
+                continue
+            script_path = slurm.generate_slurm_script(
+                self.prog['name'], self.flags_id(fs), run_index, run_index + 1,
+                self.exe_paths[fs].parent, exe_rel_path, self.prog['run_args'],
+                self.base_output_dir
+            )
+            job_id = slurm.submit_slurm_job(script_path) if script_path else None
+            if job_id and job_id != "UNKNOWN":
+                job_ids.append(job_id)
+            time.sleep(0.05)
+        wait_for_slurm_jobs(job_ids)
+        return [(fs, analyze.parse_slurm_log(log_file)[0]) for fs, log_file in log_files]
+
+    def race(self, flag_sets, min_runs=None, max_runs=None):
+        """
+        Measures every flag set min_runs times, then keeps adding single runs
+        to the best one and to those whose CI still overlaps it, until each is
+        decided, reaches max_runs or the budget is gone. Returns the flag sets
+        sorted by mean time (failed ones left out).
+        """
+        min_runs = min_runs or config.FLAG_SEARCH_MIN_RUNS
+        max_runs = max_runs or config.FLAG_SEARCH_MAX_RUNS
+        flag_sets = list(dict.fromkeys(flag_sets))
+        need = {fs: min_runs - self.stats(fs)[2] for fs in flag_sets if self.stats(fs)[2] < min_runs}
+        if need:
+            self.measure(list(need), need)
+        while self.budget_left > 0:
+            alive = [fs for fs in flag_sets if fs not in self.failed]
+            if not alive:
+                break
+            best = min(alive, key=lambda fs: self.stats(fs)[0])
+            best_mean, best_hw, _ = self.stats(best)
+            undecided = [fs for fs in alive if fs != best
+                         and self.stats(fs)[0] - self.stats(fs)[1] <= best_mean + best_hw
+                         and self.stats(fs)[2] < max_runs]
+            if not undecided:
+                break
+            if self.stats(best)[2] < max_runs:
+                undecided.append(best)
+            self.measure(undecided, 1)
+        ranked = [fs for fs in flag_sets if fs not in self.failed and self.stats(fs)[2] > 0]
+        return sorted(ranked, key=lambda fs: self.stats(fs)[0])
+
+    def results_frame(self):
+        """All measured flag sets with their statistics, fastest first."""
+        rows = []
+        for fs in self.times:
+            mean, half_width, n = self.stats(fs)
+            rows.append({"Program": self.prog['name'], "FlagsID": self.flags_id(fs),
+                         "FlagsStr": " ".join(self.flags_list(fs)), "NumFlags": len(fs),
+                         "MeanTime": mean, "CI95": half_width, "Runs": n})
+        return pd.DataFrame(rows).sort_values("MeanTime") if rows else pd.DataFrame()
+
+
+def wait_for_slurm_jobs(job_ids):
+    """Polls squeue until none of the jobs is queued or running."""
+    if not job_ids:
+        return
+    print(f"INFO: Waiting for {len(job_ids)} Slurm jobs...")
+    while slurm.queued_job_ids(job_ids):
+        time.sleep(config.FLAG_SEARCH_POLL_SECONDS)
+
+
+# --- Strategies ---
+
+def iterative_elimination(evaluator, flag_names, rng):
+    """Starts with all flags and drops the most harmful flag until none helps."""
+    current = frozenset(flag_names)
+    evaluator.race([current])
+    while current and evaluator.budget_left > 0:
+        candidates = [current - {flag} for flag in sorted(current)]
+        ranked = evaluator.race([current] + candidates)
+        if not ranked or ranked[0] == current:
+            break
+        best_mean, best_hw, _ = evaluator.stats(ranked[0])
+        current_mean, current_hw, _ = evaluator.stats(current)
+        if best_mean + best_hw >= current_mean - current_hw and evaluator.stats(current)[2] > 1:
+            break # Removal is not significantly faster
+        dropped = sorted(current - ranked[0])
+        print(f"INFO: [{evaluator.prog['name']}] Dropping {', '.join(dropped)} "
+              f"({current_mean:.4f}s -> {best_mean:.4f}s)")
+        current = ranked[0]
+    return current
+
+
+def genetic_search(evaluator, flag_names, rng):
+    """Genetic algorithm with tournament selection, uniform crossover and elitism."""
+    population_size = config.FLAG_SEARCH_POPULATION
+    mutation_rate = 1.0 / max(1, len(flag_names))
+    population = [frozenset(), frozenset(flag_names)] # O2 and all flags
+    while len(population) < population_size:
+        population.append(frozenset(f for f in flag_names if rng.random() < 0.5))
+    best = None
+    generation = 0
+    stalled = 0
+    while evaluator.budget_left > 0:
+        runs_before = len(evaluator.times), sum(map(len, evaluator.times.values()))
+        ranked = evaluator.race(population)
+        if not ranked:
+            break
+        best = ranked[0]
+        generation += 1
+        print(f"INFO: [{evaluator.prog['name']}] Generation {generation}: best {evaluator.stats(best)[0]:.4f}s "
+              f"with {len(best)} flags")
+        # A generation of already decided flag sets adds no runs and would repeat forever
+        no_progress = (len(evaluator.times), sum(map(len, evaluator.times.values()))) == runs_before
+        stalled = stalled + 1 if no_progress else 0
+        if stalled >= config.FLAG_SEARCH_MAX_STALLED_GENERATIONS:
+            print(f"INFO: [{evaluator.prog['name']}] No new measurements for {stalled} generations; stopping.")
+            break
+
+        def tournament():
+            a, b = rng.sample(ranked, 2) if len(ranked) > 1 else (ranked[0], ranked[0])
+            return a if evaluator.stats(a)[0] <= evaluator.stats(b)[0] else b
+
+        next_population = ranked[:config.FLAG_SEARCH_ELITES]
+        while len(next_population) < population_size:
+            parent_a, parent_b = tournament(), tournament()
+            child = {f for f in flag_names if (f in parent_a if rng.random() < 0.5 else f in parent_b)}
+            child ^= {f for f in flag_names if rng.random() < mutation_rate}
+            next_population.append(frozenset(child))
+        population = list(dict.fromkeys(next_population))
+    return best
+
+
+def successive_halving(evaluator, flag_names, rng):
+    """Random flag sets, halved per rung while the runs per survivor double."""
+    num_candidates = config.FLAG_SEARCH_HALVING_CANDIDATES
+    candidates = [frozenset(), frozenset(flag_names)]
+    while len(candidates) < num_candidates:
+        candidates.append(frozenset(f for f in flag_names if rng.random() < 0.5))
+    candidates = list(dict.fromkeys(candidates))
+    runs = config.FLAG_SEARCH_MIN_RUNS
+    while len(candidates) > 1 and evaluator.budget_left > 0:
+        ranked = evaluator.race(candidates, min_runs=runs, max_runs=runs)
+        if ranked:
+            print(f"INFO: [{evaluator.prog['name']}] Rung with {len(candidates)} candidates x {runs} runs: "
+                  f"best {evaluator.stats(ranked[0])[0]:.4f}s")
+        candidates = ranked[:max(1, len(ranked) // 2)]
+        runs *= 2
+    return candidates[0] if candidates else None
+
+
+STRATEGIES = {
+    "elimination": iterative_elimination,
+    "genetic": genetic_search,
+    "halving": successive_halving,
+}
+
+
+def run_flag_search(programs_to_run, base_output_dir, strategy, budget_runs, backend, seed=0, max_jobs=None):
+    """
+    Runs the search for every program and saves all measured flag sets and
+    the best set per program in the results directory.
+    Returns {program name: best flags list}.
+    """
+    print(f"\n--- Flag Search (strategy: {strategy}, budget: {budget_runs} runs per program, backend: {backend}) ---")
+    flag_names = search_flag_names()
+    results_dir = base_output_dir / config.RESULTS_SUBDIR
+    results_dir.mkdir(parents=True, exist_ok=True)
+    best_flags = {}
+    frames = []
+    for prog in programs_to_run:
+        evaluator = FlagSetEvaluator(prog, base_output_dir, backend, budget_runs, max_jobs)
+        rng = random.Random(f"{seed}:{prog['name']}")
+        best = STRATEGIES[strategy](evaluator, flag_names, rng)
+        if best is None or not evaluator.times:
+            print(f"WARNING: No successful measurement for {prog['name']}.")
+            continue
+        # The strategy's choice, not the fastest mean over all sets: sets dropped
+        # after their first lucky runs would win by noise (winner's curse)
+        if best not in evaluator.times:
+            best = min(evaluator.times, key=lambda fs: evaluator.stats(fs)[0])
+        mean, half_width, n = evaluator.stats(best)
+        o2_mean = evaluator.stats(frozenset())[0]
+        best_flags[prog['name']] = evaluator.flags_list(best)
+        speedup = f", {o2_mean / mean:.3f}x vs -O2" if math.isfinite(o2_mean) else ""
+        print(f"INFO: [{prog['name']}] Best: {' '.join(best_flags[prog['name']])} "
+              f"({mean:.4f}s +- {half_width:.4f}, {n} runs{speedup}); used {evaluator.runs_used} runs, "
+              f"{len(evaluator.exe_paths)} builds")
+        frames.append(evaluator.results_frame())
+
+    if frames:
+        search_csv = results_dir / f"flag_search_{strategy}.csv"
+        pd.concat(frames).to_csv(search_csv, index=False, float_format='%.6f')
+        print(f"INFO: Flag search results saved to: {search_csv}")
+    best_json = results_dir / f"flag_search_{strategy}_best.json"
+    best_json.write_text(json.dumps(best_flags, indent=2))
+    print(f"INFO: Best flag sets saved to: {best_json}")
+    return best_flags
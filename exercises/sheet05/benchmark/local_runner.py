@@ -0,0 +1,180 @@
+# local_runner.py
+"""
+Local execution backend: runs the (program, flags, repetition) matrix on this
+machine instead of submitting Slurm jobs.
+
+Concurrent runs are pinned to disjoint physical cores, one CPU per core as
+read from /sys/devices/system/cpu/cpu*/topology, so no two runs share a core
+through its SMT siblings. Each run executes `time -p` in bash like the Slurm
+scripts and writes its log in the same format (<job_name>.log in the Slurm
+logs directory), so analyze.py reads local and Slurm runs alike.
+"""
+import os
+import queue
+import random
+import shlex
+import shutil
+import signal
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import config
+from slurm import collect_run_tuples
+
+SYSFS_CPU_DIR = Path("/sys/devices/system/cpu")
+TIMEOUT_EXIT_CODE = 124 # As reported by coreutils timeout
+
+
+def parse_cpu_list(text):
+    """CPU ids of a sysfs list such as '0-3,8,10-11'."""
+    cpus = set()
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+def isolated_cpus(reserved_cores=None):
+    """
+    One CPU per physical core, for the cores this process may run on. The
+    first reserved_cores cores (default config.LOCAL_RESERVED_CORES) are left
+    for the OS and this script. Without sysfs topology every CPU counts as a core.
+    """
+    reserved_cores = config.LOCAL_RESERVED_CORES if reserved_cores is None else reserved_cores
+    allowed = os.sched_getaffinity(0)
+    cores = {} # {(package, core_id): sorted CPU ids}
+    for cpu in sorted(allowed):
+        topology = SYSFS_CPU_DIR / f"cpu{cpu}" / "topology"
+        try:
+            package = int((topology / "physical_package_id").read_text())
+            core_id = int((topology / "core_id").read_text())
+        except (OSError, ValueError):
+            package, core_id = None, cpu
+        cores.setdefault((package, core_id), []).append(cpu)
+    # A core is usable only if all its siblings are ours (nothing else runs next to it)
+    usable = []
+    for siblings in cores.values():
+        try:
+            sibling_file = SYSFS_CPU_DIR / f"cpu{siblings[0]}" / "topology" / "thread_siblings_list"
+            all_siblings = parse_cpu_list(sibling_file.read_text())
+        except (OSError, ValueError):
+            all_siblings = set(siblings)
+        if all_siblings <= allowed:
+            usable.append(siblings[0])
+    usable.sort()
+    if len(usable) > reserved_cores:
+        usable = usable[reserved_cores:]
+    return usable
+
+
+def pinned_command(cpu, command):
+    """Command running `time -p command` in bash, pinned to one CPU."""
+    timed = ["bash", "-c", 'time -p "$@"', "bash"] + command
+    if shutil.which("taskset"):
+        return ["taskset", "--cpu-list", str(cpu)] + timed, None
+    return timed, lambda: os.sched_setaffinity(0, {cpu})
+
+
+def run_one(run, cpu, logs_dir):
+    """Runs one tuple pinned to cpu and writes its log. Returns the exit code."""
+    log_file = logs_dir / f"{run['job_name']}.log"
+    build_dir = run['build_dir'].resolve()
+    command, preexec = pinned_command(cpu, run['command'])
+    with open(log_file, "w") as log:
+        log.write("--- Job Info ---\n"
+                  f"Job ID: local\n"
+                  f"Job Name: {run['job_name']}\n"
+                  f"Run Index: {run['run_label']}\n"
+                  f"Program: {run['prog_name']}\n"
+                  f"Flags ID: {run['flags_id']}\n"
+                  f"Build Dir: {build_dir}\n"
+                  f"Log File: {log_file}\n"
+                  f"CPU: {cpu}\n"
+                  f"Job started at: {time.ctime()}\n"
+                  "--- Execution ---\n"
+                  f"Changing directory to: {build_dir}\n"
+                  f"Running command: time -p {shlex.join(run['command'])}\n"
+                  "-------------------- Program Output Start --------------------\n")
+        log.flush()
+        # Own session, so a timeout kills the program and not just bash
+        proc = subprocess.Popen(command, cwd=build_dir, stdout=log, stderr=subprocess.STDOUT,
+                                stdin=subprocess.DEVNULL, preexec_fn=preexec, start_new_session=True)
+        try:
+            exit_code = proc.wait(timeout=config.LOCAL_RUN_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
+            log.write(f"\nERROR: Run timed out after {config.LOCAL_RUN_TIMEOUT} seconds\n")
+            exit_code = TIMEOUT_EXIT_CODE
+        log.flush()
+        log.write("-------------------- Program Output End ----------------------\n"
+                  "--- Completion ---\n"
+                  f"Command finished with exit code: {exit_code}\n"
+                  f"Job finished at: {time.ctime()}\n")
+    return exit_code
+
+
+def run_local_benchmarks(programs_to_run, flag_configs, build_results, num_runs, base_output_dir,
+                         max_workers=None, aliases=None):
+    """
+    Runs all configurations on this machine, at most one run per isolated
+    physical core at a time (max_workers limits that further). The runs are
+    shuffled (config.SLURM_BATCH_SEED) so the repetitions of a configuration
+    spread over time and cores. Returns {job_name: exit code}.
+    """
+    print("\n--- Running Benchmarks Locally (Pinned to Isolated Cores) ---")
+    run_tuples = collect_run_tuples(programs_to_run, flag_configs, build_results, num_runs, aliases)
+    if not run_tuples:
+        print("ERROR: No runs to execute (all builds missing).")
+        return {}
+    random.Random(config.SLURM_BATCH_SEED).shuffle(run_tuples)
+
+    cpus = isolated_cpus()
+    if not cpus:
+        print("ERROR: No CPU available for isolated runs.")
+        return {}
+    if max_workers:
+        cpus = cpus[:max_workers]
+    print(f"INFO: {len(run_tuples)} runs on {len(cpus)} isolated cores (CPUs {', '.join(map(str, cpus))}).")
+
+    logs_dir = (base_output_dir / config.SLURM_LOGS_SUBDIR).resolve()
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    free_cpus = queue.Queue()
+    for cpu in cpus:
+        free_cpus.put(cpu)
+
+    def run_on_free_cpu(run):
+        cpu = free_cpus.get()
+        try:
+            return run_one(run, cpu, logs_dir)
+        finally:
+            free_cpus.put(cpu)
+
+    exit_codes = {}
+    failures = 0
+    with ThreadPoolExecutor(max_workers=len(cpus)) as executor:
+        futures = {executor.submit(run_on_free_cpu, run): run['job_name'] for run in run_tuples}
+        for done, future in enumerate(as_completed(futures), 1):
+            job_name = futures[future]
+            try:
+                exit_codes[job_name] = future.result()
+            except Exception as e:
+                print(f"ERROR: Run {job_name} could not be executed: {e}")
+                exit_codes[job_name] = None
+            if exit_codes[job_name] != 0:
+                failures += 1
+                print(f"WARNING: Run {job_name} failed (exit code {exit_codes[job_name]}).")
+            if done % max(1, len(futures) // 10) == 0 or done == len(futures):
+                print(f"INFO: {done}/{len(futures)} runs finished.")
+
+    print("\n--- Local Run Summary ---")
+    print(f"Runs executed: {len(exit_codes)}, failed: {failures}")
+    print(f"Logs written to: {logs_dir}")
+    return exit_codes
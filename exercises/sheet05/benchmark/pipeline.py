@@ -0,0 +1,257 @@
+# pipeline.py
+"""
+Pipelined build and run for large configuration matrices such as compile
+parameter sweeps (programs.json compile parameters with "options").
+
+Instead of building the whole matrix before running anything, a bounded
+producer pool builds configurations while the runs of the configurations
+already built execute (locally on isolated cores, or as Slurm jobs). Builds
+are ordered cheapest program instance first, all flag configurations of an
+instance together, so complete comparisons for the small instances are
+available early. At most config.PIPELINE_DEPTH configurations are built but
+not yet finished; once all runs of a configuration are done, its build
+directory is removed, which caps the disk usage of a sweep.
+"""
+import os
+import queue
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+
+import config
+import build
+import slurm
+import local_runner
+import binary_dedup
+from utils import sanitize_flags
+
+
+def estimated_cost(prog):
+    """Product of the numeric compile parameter values (a larger problem runs longer)."""
+    cost = 1.0
+    for value in prog.get('compile_params', {}).values():
+        try:
+            cost *= abs(float(value)) or 1.0
+        except (TypeError, ValueError):
+            pass
+    return cost
+
+
+def plan_build_jobs(programs_to_run, flag_configs):
+    """
+    Build jobs in pipeline order: cheapest program instances first and, per
+    instance, the flag configurations in their order. Configurations with the
+    same sanitized flags share one build. Returns [(prog, flags_list, [flags_ids])].
+    """
+    jobs = {}
+    ordered = sorted(enumerate(programs_to_run), key=lambda item: (estimated_cost(item[1]), item[0]))
+    for _, prog in ordered:
+        for flags_id, flags_list in flag_configs.items():
+            key = (prog['name'], sanitize_flags(" ".join(sorted(flags_list))))
+            jobs.setdefault(key, (prog, flags_list, []))[2].append(flags_id)
+    return list(jobs.values())
+
+
+def split_cpus(run_workers=None):
+    """
+    (run CPUs, build CPUs) for local pipelining: runs get isolated physical
+    cores (config.PIPELINE_RUN_CORE_FRACTION of them unless run_workers is
+    given), builds get every allowed CPU not on those cores.
+    """
+    isolated = local_runner.isolated_cpus()
+    count = run_workers or max(1, int(len(isolated) * config.PIPELINE_RUN_CORE_FRACTION))
+    run_cpus = isolated[-count:] # Keep the low cores (and the reserved one) for builds
+    busy = set()
+    for cpu in run_cpus:
+        sibling_file = local_runner.SYSFS_CPU_DIR / f"cpu{cpu}" / "topology" / "thread_siblings_list"
+        try:
+            busy |= local_runner.parse_cpu_list(sibling_file.read_text())
+        except (OSError, ValueError):
+            busy.add(cpu)
+    build_cpus = sorted(os.sched_getaffinity(0) - busy)
+    return run_cpus, build_cpus
+
+
+def run_pipeline(programs_to_run, flag_configs, num_runs, base_output_dir, backend='local',
+                 max_jobs=None, depth=None, force_rebuild=False, local_workers=None, dedup=True):
+    """
+    Builds and runs all configurations with build/run overlap.
+    Returns {(prog_name, flags_id): exe path or None} like build_configurations
+    (paths of collected builds no longer exist).
+    """
+    print("\n--- Pipelined Build and Run ---")
+    depth = depth or config.PIPELINE_DEPTH
+    planned = plan_build_jobs(programs_to_run, flag_configs)
+    if not planned:
+        print("INFO: Nothing to build.")
+        return {}
+
+    if backend == 'local':
+        run_cpus, build_cpus = split_cpus(local_workers)
+        if not run_cpus:
+            print("ERROR: No CPU available for isolated runs.")
+            return {}
+        if not build_cpus: # Single core machine: share it
+            print("WARNING: No CPU left for builds; builds share the run CPUs and may disturb the timings.")
+            build_cpus = run_cpus
+        max_jobs = len(build_cpus)
+        print(f"INFO: Runs on isolated CPUs {', '.join(map(str, run_cpus))}; builds on CPUs {', '.join(map(str, build_cpus))}.")
+        set_build_affinity = (os.sched_setaffinity, (0, set(build_cpus))) # Per thread on Linux
+    else:
+        max_jobs = max(1, max_jobs or config.DEFAULT_BUILD_JOBS)
+        run_cpus = []
+        set_build_affinity = (None, ())
+    print(f"INFO: {len(planned)} builds, up to {depth} built configurations in flight, {max_jobs} build jobs.")
+
+    logs_dir = (base_output_dir / config.SLURM_LOGS_SUBDIR).resolve()
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    free_cpus = queue.Queue()
+    for cpu in run_cpus:
+        free_cpus.put(cpu)
+
+    def run_on_free_cpu(run):
+        cpu = free_cpus.get()
+        try:
+            return local_runner.run_one(run, cpu, logs_dir)
+        finally:
+            free_cpus.put(cpu)
+
+    build_results = {}
+    aliases = {}
+    representatives = {} # {(prog_name, digest): flags_id}
+    build_futures = {} # {future: planned job}
+    run_futures = {} # {future: job key} (local)
+    pending_runs = {} # {job key: number of runs (local) or set of job ids (Slurm)}
+    build_dirs = {} # {job key: build dir to collect}
+    next_job = 0
+    in_flight = 0
+    finished = 0
+    start_time = time.time()
+
+    def finalize(key, reason):
+        nonlocal in_flight, finished
+        in_flight -= 1
+        finished += 1
+        build_dir = build_dirs.pop(key, None)
+        if build_dir is not None and not config.PIPELINE_KEEP_EXECUTABLES:
+            shutil.rmtree(build_dir, ignore_errors=True)
+        print(f"INFO: [pipeline {finished}/{len(planned)}, {time.time() - start_time:.0f}s] "
+              f"{key[0]} / {key[1]}: {reason}")
+
+    def start_runs(key, prog, flags_list, run_ids, exe_path):
+        runs = slurm.collect_run_tuples([prog], {fid: flags_list for fid in run_ids},
+                                        {(prog['name'], fid): exe_path for fid in run_ids}, num_runs)
+        if not runs: # Nothing would ever complete the key
+            finalize(key, "no runs")
+            return
+        if backend == 'local':
+            pending_runs[key] = len(runs)
+            for run in runs:
+                run_futures[run_executor.submit(run_on_free_cpu, run)] = key
+        else:
+            job_ids = set()
+            exe_rel_path = Path(prog['exe_subdir']) / prog['exe_name']
+            for run in runs:
+                run_index = int(run['run_label'].split("/")[0]) - 1
+                script_path = slurm.generate_slurm_script(
+                    prog['name'], run['flags_id'], run_index, num_runs,
+                    run['build_dir'], exe_rel_path, prog['run_args'], base_output_dir
+                )
+                job_id = slurm.submit_slurm_job(script_path) if script_path else None
+                if job_id and job_id != "UNKNOWN":
+                    job_ids.add(job_id)
+            if not job_ids:
+                finalize(key, "no Slurm jobs submitted")
+                return
+            pending_runs[key] = job_ids
+
+    def on_built(job, exe_path):
+        prog, flags_list, flags_ids = job
+        key = (prog['name'], sanitize_flags(" ".join(sorted(flags_list))))
+        for flags_id in flags_ids:
+            build_results[(prog['name'], flags_id)] = exe_path
+        if not exe_path:
+            finalize(key, "build failed")
+            return
+        build_dirs[key] = base_output_dir / config.BUILD_SUBDIR / key[0] / key[1]
+        run_ids = list(flags_ids)
+        if dedup:
+            digest = binary_dedup.binary_digest(exe_path)
+            representative = representatives.setdefault((prog['name'], digest), flags_ids[0])
+            run_ids = [] if representative != flags_ids[0] else flags_ids[:1]
+            for flags_id in flags_ids:
+                if flags_id != representative:
+                    aliases[(prog['name'], flags_id)] = representative
+            if not run_ids:
+                finalize(key, f"identical to {representative}, not run")
+                return
+        start_runs(key, prog, flags_list, run_ids, exe_path)
+
+    jobserver = build.Jobserver(max_jobs)
+    initializer, initargs = set_build_affinity
+    build_executor = ThreadPoolExecutor(max_workers=min(max_jobs, len(planned)),
+                                        initializer=initializer, initargs=initargs)
+    run_executor = ThreadPoolExecutor(max_workers=max(1, len(run_cpus)))
+    try:
+        while next_job < len(planned) or build_futures or pending_runs:
+            # Producer: keep the pipeline filled up to its depth
+            while next_job < len(planned) and in_flight < depth:
+                prog, flags_list, _ = planned[next_job]
+                future = build_executor.submit(build.run_build_job, jobserver, prog, flags_list,
+                                               base_output_dir, force_rebuild)
+                build_futures[future] = planned[next_job]
+                next_job += 1
+                in_flight += 1
+
+            futures = list(build_futures) + list(run_futures)
+            if futures:
+                timeout = config.PIPELINE_POLL_SECONDS if backend != 'local' and pending_runs else None
+                done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            else: # Only Slurm jobs left
+                time.sleep(config.PIPELINE_POLL_SECONDS)
+                done = set()
+
+            for future in done:
+                if future in build_futures:
+                    job = build_futures.pop(future)
+                    try:
+                        exe_path = future.result()
+                    except Exception as e: # build_program handles build errors; this is a safety net
+                        print(f"ERROR: Build of {job[0]['name']} with {' '.join(job[1])} raised: {e}")
+                        exe_path = None
+                    on_built(job, exe_path)
+                else:
+                    key = run_futures.pop(future)
+                    if future.exception() is not None:
+                        print(f"ERROR: A run of {key[0]} / {key[1]} could not be executed: {future.exception()}")
+                    pending_runs[key] -= 1
+                    if pending_runs[key] == 0:
+                        del pending_runs[key]
+                        finalize(key, "runs finished")
+
+            # Consumer (Slurm): configurations whose jobs have all left the queue
+            if backend != 'local' and pending_runs:
+                all_ids = set().union(*pending_runs.values())
+                queued = slurm.queued_job_ids(sorted(all_ids))
+                for key in [k for k, ids in pending_runs.items() if not ids & queued]:
+                    del pending_runs[key]
+                    finalize(key, "Slurm jobs finished")
+    finally:
+        build_executor.shutdown(wait=True)
+        run_executor.shutdown(wait=True)
+        jobserver.close()
+
+    if dedup:
+        binary_dedup.save_aliases(aliases, base_output_dir)
+        if aliases:
+            print(f"INFO: {len(aliases)} configurations had a binary identical to another one and were not run.")
+    else:
+        binary_dedup.clear_aliases(base_output_dir)
+
+    failed = sorted(key for key, path in build_results.items() if not path)
+    print("\n--- Pipeline Summary ---")
+    print(f"Builds: {len(planned)}, failed configurations: {len(failed)}, time: {time.time() - start_time:.0f}s")
+    for prog_name, flags_id in failed:
+        print(f"  - {prog_name}: {flags_id}")
+    return build_results
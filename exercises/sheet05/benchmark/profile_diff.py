@@ -0,0 +1,330 @@
+# profile_diff.py
+"""
+Per-function differential profiles between flag configurations.
+
+For every built configuration, one lightweight `perf record` run samples
+cycles and instructions; `perf script` dumps the samples next to it. The
+samples are joined by symbol (GCC clone suffixes such as .constprop.0 are
+folded into their function) and every configuration is compared with its
+parent: the configuration whose flags are the largest subset of its own (the
+previous step of the o2_to_o3_cumulative sequence, the O2 baseline for
+o2_vs_o3_diff), else the first configuration. Each function's time delta,
+with the instruction count and IPC changes, is attributed to the flags the
+configuration adds to its parent.
+"""
+import re
+import stat
+import subprocess
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import config
+import slurm
+import analyze
+import local_runner
+
+# `perf script -F event,period,ip,sym` sample line, e.g.
+#   "     10007 cycles:u:            4015a4 compute_rhs+0x24"
+PERF_SCRIPT_SAMPLE_REGEX = re.compile(
+    r"^\s*(?:(\d+)\s+)?([A-Za-z][\w.-]*(?::[A-Za-z]+)*):\s+([0-9a-fA-F]+)\s+(\S+)"
+)
+SYMBOL_OFFSET_REGEX = re.compile(r"\+0x[0-9a-fA-F]+$")
+# GCC clones (IPA-CP, SRA, partial inlining, hot/cold splitting) of a function
+CLONE_SUFFIX_REGEX = re.compile(r"(\.(constprop|isra|part|cold|lto_priv|localalias)(\.\d+)?)+$")
+PERF_SCRIPT_FIELDS = "event,period,ip,sym"
+
+
+def profile_paths(prog_name, flags_id, base_output_dir):
+    """(perf.data, perf script dump, job log) of a configuration's profile."""
+    profile_dir = base_output_dir / config.RESULTS_SUBDIR / config.PROFILE_SUBDIR
+    stem = f"{prog_name}_{flags_id}"
+    logs_dir = base_output_dir / config.SLURM_LOGS_SUBDIR
+    return profile_dir / f"{stem}.perf.data", profile_dir / f"{stem}.perf.script", logs_dir / f"profile_{stem}.log"
+
+
+def generate_profile_script(prog, flags_id, exe_path, base_output_dir):
+    """
+    Script recording one profile: a Slurm job (sbatch) that also runs as a
+    plain bash script on a local machine.
+    """
+    data_path, dump_path, log_path = profile_paths(prog['name'], flags_id, base_output_dir)
+    scripts_dir = base_output_dir / config.SLURM_SCRIPTS_SUBDIR
+    for directory in (data_path.parent, log_path.parent, scripts_dir):
+        directory.mkdir(parents=True, exist_ok=True)
+    script_path = scripts_dir / f"profile_{prog['name']}_{flags_id}.sh"
+    exe_rel_path = Path(prog['exe_subdir']) / prog['exe_name']
+    build_dir = exe_path.parent
+    for _ in Path(prog['exe_subdir']).parts:
+        build_dir = build_dir.parent
+    perf_cmd = (["perf", "record", "-e", ",".join(config.PROFILE_EVENTS), "-F", str(config.PROFILE_FREQUENCY),
+                 "-o", str(data_path.resolve()), "--", f"./{exe_rel_path}"] + prog['run_args'])
+    script_content = f"""#!/bin/bash
+#SBATCH --partition={config.SLURM_PARTITION}
+#SBATCH --job-name=profile_{prog['name']}_{flags_id}
+#SBATCH --output={log_path.resolve()}
+#SBATCH --error={log_path.resolve()}
+#SBATCH --ntasks={config.SLURM_NTASKS}
+#SBATCH --nodes={config.SLURM_NODES}
+#SBATCH --cpus-per-task={config.SLURM_CPUS_PER_TASK}
+#SBATCH --time={config.SLURM_TIME}
+#SBATCH --exclusive
+
+echo "--- Profile Job Info ---"
+echo "Program: {prog['name']}"
+echo "Flags ID: {flags_id}"
+echo "Job started at: $(date)"
+
+if command -v module > /dev/null; then
+    module purge
+{chr(10).join([f"    module load {mod}" for mod in config.MODULES_TO_LOAD])}
+fi
+
+cd "{build_dir.resolve()}" || exit 1
+echo "Running command: time -p {' '.join(perf_cmd)}"
+echo "-------------------- Program Output Start --------------------"
+time -p {' '.join(perf_cmd)}
+exit_code=$?
+echo "-------------------- Program Output End ----------------------"
+
+perf script -i "{data_path.resolve()}" -F {PERF_SCRIPT_FIELDS} > "{dump_path.resolve()}"
+echo "perf script dump written to: {dump_path.resolve()}"
+echo "--- Completion ---"
+echo "Command finished with exit code: $exit_code"
+echo "Job finished at: $(date)"
+exit $exit_code
+"""
+    try:
+        script_path.write_text(script_content)
+        script_path.chmod(script_path.stat().st_mode | stat.S_IEXEC)
+        return script_path
+    except OSError as e:
+        print(f"ERROR: Failed to write profile script {script_path}: {e}")
+        return None
+
+
+def collect_profiles(programs_to_run, flag_configs, build_results, base_output_dir,
+                     backend='slurm', submit=False, force=False):
+    """
+    Records the missing profiles (all with force): locally one at a time on
+    an isolated core, or as Slurm jobs (waited for when submitted).
+    """
+    print("\n--- Collecting perf Profiles ---")
+    job_ids, generated, local_cpu = [], 0, None
+    if backend == 'local':
+        cpus = local_runner.isolated_cpus()
+        local_cpu = cpus[0] if cpus else None
+    for prog in programs_to_run:
+        for flags_id in flag_configs:
+            exe_path = build_results.get((prog['name'], flags_id))
+            if not exe_path or not exe_path.is_file():
+                print(f"WARNING: Executable for {prog['name']} / {flags_id} not found. Skipping its profile.")
+                continue
+            _, dump_path, log_path = profile_paths(prog['name'], flags_id, base_output_dir)
+            if dump_path.is_file() and not force:
+                continue
+            script_path = generate_profile_script(prog, flags_id, exe_path, base_output_dir)
+            if not script_path:
+                continue
+            generated += 1
+            if backend == 'local':
+                command = ["bash", str(script_path)]
+                if local_cpu is not None:
+                    command = ["taskset", "--cpu-list", str(local_cpu)] + command
+                print(f"INFO: Profiling {prog['name']} / {flags_id}")
+                with open(log_path, "w") as log:
+                    subprocess.run(command, stdout=log, stderr=subprocess.STDOUT)
+            elif submit:
+                job_id = slurm.submit_slurm_job(script_path)
+                if job_id and job_id != "UNKNOWN":
+                    job_ids.append(job_id)
+    if backend != 'local':
+        if submit and job_ids:
+            print(f"INFO: Waiting for {len(job_ids)} profile jobs...")
+            while slurm.queued_job_ids(job_ids):
+                time.sleep(config.PIPELINE_POLL_SECONDS)
+        elif generated:
+            print(f"INFO: {generated} profile scripts generated in {base_output_dir / config.SLURM_SCRIPTS_SUBDIR} "
+                  f"(not submitted). Submit them and run this action again to build the report.")
+
+
+def parse_perf_script(dump_path):
+    """{function: {event: estimated count (sum of sample periods)}} of a perf script dump."""
+    counts = {}
+    with open(dump_path, errors="ignore") as f:
+        for line in f:
+            match = PERF_SCRIPT_SAMPLE_REGEX.match(line)
+            if not match:
+                continue
+            period = int(match.group(1)) if match.group(1) else 1
+            event = match.group(2).split(":")[0]
+            symbol = CLONE_SUFFIX_REGEX.sub("", SYMBOL_OFFSET_REGEX.sub("", match.group(4)))
+            per_symbol = counts.setdefault(symbol, {})
+            per_symbol[event] = per_symbol.get(event, 0) + period
+    return counts
+
+
+def load_profiles(programs_to_run, flag_configs, base_output_dir):
+    """
+    Long DataFrame (Program, FlagsID, Function, Cycles, Instructions, Seconds)
+    from the profile dumps. Seconds splits the run's wall time by cycle share.
+    """
+    rows = []
+    cycles_event, instructions_event = config.PROFILE_EVENTS[:2]
+    for prog in programs_to_run:
+        for flags_id in flag_configs:
+            _, dump_path, log_path = profile_paths(prog['name'], flags_id, base_output_dir)
+            if not dump_path.is_file():
+                continue
+            wall_time, status = analyze.parse_slurm_log(log_path)
+            if status != "success":
+                print(f"WARNING: Profile run of {prog['name']} / {flags_id} did not succeed ({status}). Skipping.")
+                continue
+            counts = parse_perf_script(dump_path)
+            total_cycles = sum(c.get(cycles_event, 0) for c in counts.values())
+            if total_cycles <= 0:
+                print(f"WARNING: No {cycles_event} samples in {dump_path.name}. Skipping.")
+                continue
+            for function, events in counts.items():
+                cycles = events.get(cycles_event, 0)
+                rows.append((prog['name'], flags_id, function, cycles, events.get(instructions_event, 0),
+                             wall_time * cycles / total_cycles))
+    return pd.DataFrame(rows, columns=['Program', 'FlagsID', 'Function', 'Cycles', 'Instructions', 'Seconds'])
+
+
+def parent_configs(flag_configs):
+    """
+    {flags_id: parent flags_id or None}: the configuration (listed earlier)
+    whose flags are the largest proper subset of its own, else the first one.
+    """
+    ids = list(flag_configs)
+    parents = {ids[0]: None} if ids else {}
+    for i, flags_id in enumerate(ids[1:], 1):
+        flags = set(flag_configs[flags_id])
+        subsets = [pid for pid in ids[:i] if set(flag_configs[pid]) < flags]
+        parents[flags_id] = max(subsets, key=lambda pid: len(flag_configs[pid])) if subsets else ids[0]
+    return parents
+
+
+def flag_changes(flag_configs, flags_id, parent_id):
+    """
+    Flags added and removed from parent to configuration, as
+    "added: -O3; removed: -O2" (flags start with '-', so +/- prefixes would be
+    ambiguous).
+    """
+    flags, parent_flags = set(flag_configs[flags_id]), set(flag_configs[parent_id])
+    parts = [f"{label}: {' '.join(sorted(changed))}"
+             for label, changed in (("added", flags - parent_flags), ("removed", parent_flags - flags)) if changed]
+    return "; ".join(parts)
+
+
+def differential_profiles(profiles_df, flag_configs):
+    """
+    Per (program, configuration, function): time, instruction and IPC changes
+    vs. the parent configuration, the flags responsible and whether the delta
+    is significant (config.PROFILE_MIN_DELTA_SHARE of the parent's total time
+    and config.PROFILE_MIN_RELATIVE_DELTA of the function's time).
+    """
+    if profiles_df.empty:
+        return pd.DataFrame()
+    parents = parent_configs(flag_configs)
+    indexed = profiles_df.set_index(['Program', 'FlagsID', 'Function'])[['Seconds', 'Instructions', 'Cycles']]
+    totals = profiles_df.groupby(['Program', 'FlagsID'])['Seconds'].sum()
+    frames = []
+    for (prog_name, flags_id), child in indexed.groupby(level=['Program', 'FlagsID']):
+        parent_id = parents.get(flags_id)
+        if parent_id is None or (prog_name, parent_id) not in totals.index:
+            continue
+        parent = indexed.xs((prog_name, parent_id), level=['Program', 'FlagsID'])
+        joined = parent.join(child.droplevel(['Program', 'FlagsID']), how='outer',
+                             lsuffix='Parent', rsuffix='Config').fillna(0)
+        joined['Program'] = prog_name
+        joined['FlagsID'] = flags_id
+        joined['Parent'] = parent_id
+        joined['FlagChanges'] = flag_changes(flag_configs, flags_id, parent_id)
+        joined['ParentTotalSeconds'] = totals[(prog_name, parent_id)]
+        frames.append(joined.reset_index())
+    if not frames:
+        return pd.DataFrame()
+
+    diff = pd.concat(frames, ignore_index=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        diff['DeltaSeconds'] = diff['SecondsConfig'] - diff['SecondsParent']
+        diff['DeltaPercent'] = 100 * diff['DeltaSeconds'] / diff['SecondsParent'].replace(0, np.nan)
+        diff['InstructionsChangePercent'] = (100 * (diff['InstructionsConfig'] - diff['InstructionsParent'])
+                                             / diff['InstructionsParent'].replace(0, np.nan))
+        diff['IPCParent'] = diff['InstructionsParent'] / diff['CyclesParent'].replace(0, np.nan)
+        diff['IPCConfig'] = diff['InstructionsConfig'] / diff['CyclesConfig'].replace(0, np.nan)
+    relative = (diff['DeltaSeconds'].abs() / diff[['SecondsParent', 'SecondsConfig']].max(axis=1).replace(0, np.nan))
+    diff['Significant'] = ((diff['DeltaSeconds'].abs() >= config.PROFILE_MIN_DELTA_SHARE * diff['ParentTotalSeconds'])
+                           & (relative >= config.PROFILE_MIN_RELATIVE_DELTA))
+    order = diff['DeltaSeconds'].abs().sort_values(ascending=False).index
+    return diff.loc[order].reset_index(drop=True)
+
+
+def write_profile_report(profiles_df, diff_df, flag_configs, base_output_dir):
+    """Writes profile_diff.md and the CSV tables to the results directory."""
+    results_dir = base_output_dir / config.RESULTS_SUBDIR
+    results_dir.mkdir(parents=True, exist_ok=True)
+    report_path = results_dir / "profile_diff.md"
+    profiles_df.to_csv(results_dir / "profile_functions.csv", index=False, float_format='%.6g')
+    diff_df.to_csv(results_dir / "profile_diff.csv", index=False, float_format='%.6g')
+
+    def fmt(spec):
+        return lambda v: "n/a" if pd.isna(v) else format(v, spec)
+
+    with open(report_path, "w") as f:
+        f.write("# Per-Function Differential Profiles\n\n")
+        f.write(f"Date Generated: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        f.write(f"One `perf record -e {','.join(config.PROFILE_EVENTS)} -F {config.PROFILE_FREQUENCY}` run per "
+                f"configuration. Function time = wall time x share of cycle samples. Each configuration is "
+                f"compared with its parent (largest subset of its flags, else the first configuration); "
+                f"a delta is significant if it is at least {config.PROFILE_MIN_DELTA_SHARE:.0%} of the parent's "
+                f"run time and {config.PROFILE_MIN_RELATIVE_DELTA:.0%} of the function's time.\n\n")
+        for prog_name, prog_profiles in profiles_df.groupby('Program', sort=True):
+            f.write(f"## {prog_name}\n\n")
+            times = prog_profiles.pivot_table(index='Function', columns='FlagsID', values='Seconds', aggfunc='sum')
+            times = times[[fid for fid in flag_configs if fid in times.columns]]
+            top = times.max(axis=1).sort_values(ascending=False).index[:config.PROFILE_TOP_FUNCTIONS]
+            f.write(f"### Time per Function (seconds, top {len(top)})\n\n")
+            f.write(times.loc[top].fillna(0).to_markdown(floatfmt=".4f"))
+            f.write("\n\n")
+
+            prog_diff = diff_df[(diff_df['Program'] == prog_name) & diff_df['Significant']] if not diff_df.empty else diff_df
+            f.write("### Significant Changes\n\n")
+            if prog_diff.empty:
+                f.write("*No significant per-function changes between configurations.*\n\n")
+                continue
+            table = pd.DataFrame({
+                'Configuration': prog_diff['FlagsID'],
+                'vs.': prog_diff['Parent'],
+                'Flag change': prog_diff['FlagChanges'].map(lambda s: f"`{s}`" if s else ""),
+                'Function': prog_diff['Function'].map(lambda s: f"`{s}`"),
+                'Time (s)': [f"{a:.4f} -> {b:.4f}" for a, b in zip(prog_diff['SecondsParent'], prog_diff['SecondsConfig'])],
+                'Delta (s)': prog_diff['DeltaSeconds'].map(fmt("+.4f")),
+                'Delta (%)': prog_diff['DeltaPercent'].map(fmt("+.1f")),
+                'Instr. (%)': prog_diff['InstructionsChangePercent'].map(fmt("+.1f")),
+                'IPC': [f"{fmt('.2f')(a)} -> {fmt('.2f')(b)}" for a, b in zip(prog_diff['IPCParent'], prog_diff['IPCConfig'])],
+            })
+            f.write(table.to_markdown(index=False))
+            f.write("\n\n*A function present in only one configuration was usually inlined into (or split out of) "
+                    "its caller; compare with the caller's change.*\n\n")
+    print(f"INFO: Differential profile report written to: {report_path}")
+    return report_path
+
+
+def run_profile_diff(programs_to_run, flag_configs, build_results, base_output_dir,
+                     backend='slurm', submit=False, force=False):
+    """Collects the profiles and writes the differential report."""
+    collect_profiles(programs_to_run, flag_configs, build_results, base_output_dir, backend, submit, force)
+    profiles_df = load_profiles(programs_to_run, flag_configs, base_output_dir)
+    if profiles_df.empty:
+        print("INFO: No profiles available yet. Skipping the differential report.")
+        return None
+    diff_df = differential_profiles(profiles_df, flag_configs)
+    num_significant = int(diff_df['Significant'].sum()) if not diff_df.empty else 0
+    print(f"INFO: {profiles_df.groupby(['Program', 'FlagsID']).ngroups} profiles, "
+          f"{num_significant} significant per-function changes.")
+    return write_profile_report(profiles_df, diff_df, flag_configs, base_output_dir)
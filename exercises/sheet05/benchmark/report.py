@@ -1,12 +1,242 @@
 # report.py
+import math
+import warnings
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from pathlib import Path
 
 import config # For subdirs
 
-def create_plots(results_df: pd.DataFrame, base_output_dir):
-    """Generates bar plots for each program comparing flag configurations."""
+# --- Statistical Comparison vs. Baseline ---
+# All tests work on (rows x runs) time matrices padded with NaN, one row per
+# (program, configuration), so every comparison is computed at once. No scipy
+# dependency: the t and normal tails are evaluated with numpy below.
+
+_lgamma = np.vectorize(math.lgamma, otypes=[float])
+_erfc = np.vectorize(math.erfc, otypes=[float])
+_TINY = 1e-300
+
+
+def times_matrix(raw_times):
+    """(rows x max runs) float array from a sequence of time lists, padded with NaN."""
+    rows = [np.asarray(t if isinstance(t, (list, tuple, np.ndarray)) else [], dtype=float) for t in raw_times]
+    matrix = np.full((len(rows), max((len(r) for r in rows), default=0)), np.nan)
+    for i, r in enumerate(rows):
+        matrix[i, :len(r)] = r
+    return matrix
+
+
+def regularized_incomplete_beta(a, b, x, iterations=200):
+    """I_x(a, b), elementwise (continued fraction, modified Lentz)."""
+    a, b, x = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (a, b, x)))
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        # The continued fraction converges fast for x < (a+1)/(a+b+2); use symmetry otherwise
+        swap = x > (a + 1) / (a + b + 2)
+        aa, bb, xx = np.where(swap, b, a), np.where(swap, a, b), np.where(swap, 1 - x, x)
+        front = np.exp(aa * np.log(xx) + bb * np.log1p(-xx)
+                       + _lgamma(aa + bb) - _lgamma(aa) - _lgamma(bb)) / aa
+
+        def clamp(v):
+            return np.where(np.abs(v) < _TINY, _TINY, v)
+
+        c = np.ones_like(xx)
+        d = 1 / clamp(1 - (aa + bb) * xx / (aa + 1))
+        h = d.copy()
+        for m in range(1, iterations + 1):
+            for coeff in (m * (bb - m) * xx / ((aa + 2 * m - 1) * (aa + 2 * m)),
+                          -(aa + m) * (aa + bb + m) * xx / ((aa + 2 * m) * (aa + 2 * m + 1))):
+                d = 1 / clamp(1 + coeff * d)
+                c = clamp(1 + coeff / c)
+                h *= d * c
+        value = front * h
+    return np.clip(np.where(swap, 1 - value, value), 0, 1)
+
+
+def welch_test(x, y):
+    """Two-sided Welch t-test per row of x vs. y (NaN = missing run). Returns (t, p)."""
+    n1, n2 = np.sum(~np.isnan(x), axis=1), np.sum(~np.isnan(y), axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning) # Rows without (enough) valid runs
+        v1, v2 = np.nanvar(x, axis=1, ddof=1) / n1, np.nanvar(y, axis=1, ddof=1) / n2
+        t = (np.nanmean(x, axis=1) - np.nanmean(y, axis=1)) / np.sqrt(v1 + v2)
+        dof = (v1 + v2) ** 2 / (v1 ** 2 / (n1 - 1) + v2 ** 2 / (n2 - 1))
+        p = regularized_incomplete_beta(dof / 2, 0.5, dof / (dof + t ** 2))
+    valid = (n1 >= 2) & (n2 >= 2) & np.isfinite(t) & np.isfinite(dof)
+    return np.where(valid, t, np.nan), np.where(valid, p, np.nan)
+
+
+def t_quantile(dof, alpha=0.05, iterations=60):
+    """
+    Two-sided (1 - alpha) quantile of Student's t distribution, elementwise:
+    the q with I_{dof/(dof+q^2)}(dof/2, 1/2) = alpha, found by bisection.
+    dof < 1 gives inf.
+    """
+    dof = np.asarray(dof, dtype=float)
+    valid = dof >= 1
+    dof = np.where(valid, dof, 1)
+    low, high = np.zeros_like(dof), np.full_like(dof, 1e3)
+    for _ in range(iterations):
+        mid = (low + high) / 2
+        too_small = regularized_incomplete_beta(dof / 2, 0.5, dof / (dof + mid ** 2)) > alpha
+        low, high = np.where(too_small, mid, low), np.where(too_small, high, mid)
+    return np.where(valid, (low + high) / 2, np.inf)
+
+
+def mann_whitney_test(x, y):
+    """
+    Two-sided Mann-Whitney U test per row of x vs. y (normal approximation with
+    tie and continuity correction). Returns (U of x, p, Cliff's delta), where
+    Cliff's delta = P(x < y) - P(x > y), i.e. positive if x tends to be faster.
+    """
+    vx, vy = ~np.isnan(x), ~np.isnan(y)
+    n1, n2 = vx.sum(axis=1), vy.sum(axis=1)
+    pairs = vx[:, :, None] & vy[:, None, :]
+    diff = x[:, :, None] - y[:, None, :]
+    u = np.sum(np.where(pairs, (diff > 0) + 0.5 * (diff == 0), 0), axis=(1, 2))
+
+    # Tie correction: sum over tie groups of (t^3 - t) = sum over values of (count^2 - 1)
+    pooled = np.concatenate([x, y], axis=1)
+    valid = ~np.isnan(pooled)
+    equal = (pooled[:, :, None] == pooled[:, None, :]) & valid[:, :, None] & valid[:, None, :]
+    ties = np.sum(np.where(valid, equal.sum(axis=2) ** 2 - 1, 0), axis=1)
+
+    n = n1 + n2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma = np.sqrt(n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1))))
+        z = np.maximum(np.abs(u - n1 * n2 / 2) - 0.5, 0) / sigma
+        p = np.minimum(_erfc(z / math.sqrt(2)), 1) # 2 * normal tail
+        delta = 1 - 2 * u / (n1 * n2)
+    valid_rows = (n1 > 0) & (n2 > 0) & (sigma > 0)
+    return u, np.where(valid_rows, p, np.nan), np.where(valid_rows, delta, np.nan)
+
+
+def bootstrap_means(times, resamples, rng):
+    """(rows x resamples) means of bootstrap resamples of each row's valid runs."""
+    ordered = np.sort(times, axis=1) # NaN last, so the valid runs are a prefix
+    counts = np.sum(~np.isnan(ordered), axis=1)[:, None, None]
+    rows, runs = ordered.shape
+    idx = (rng.random((rows, resamples, runs)) * counts).astype(int)
+    samples = ordered[np.arange(rows)[:, None, None], idx]
+    with np.errstate(invalid='ignore'):
+        return np.sum(np.where(np.arange(runs) < counts, samples, 0), axis=2) / counts[:, :, 0]
+
+
+def holm_adjust(p_values, groups):
+    """Holm-Bonferroni adjusted p-values, one family per group. NaN stays NaN."""
+    p_values = np.asarray(p_values, dtype=float)
+    adjusted = np.full(p_values.shape, np.nan)
+    for idx in pd.Series(np.arange(len(p_values))).groupby(np.asarray(groups)).indices.values():
+        idx = idx[~np.isnan(p_values[idx])]
+        order = idx[np.argsort(p_values[idx])]
+        m = len(order)
+        adjusted[order] = np.minimum(np.maximum.accumulate((m - np.arange(m)) * p_values[order]), 1)
+    return adjusted
+
+
+def significance_marker(p):
+    """Marker for a (Holm-adjusted) p-value, '' if not significant."""
+    if pd.isna(p):
+        return ""
+    for threshold, marker in config.SIGNIFICANCE_MARKERS:
+        if p < threshold:
+            return marker
+    return ""
+
+
+def select_baselines(results_df: pd.DataFrame):
+    """{program: baseline FlagsID}: first of config.STATS_BASELINE_IDS present, else the first configuration."""
+    baselines = {}
+    for prog_name, prog_df in results_df.groupby('Program', sort=False, observed=True):
+        flags_ids = [str(fid) for fid in prog_df.sort_values('FlagsID')['FlagsID']]
+        baselines[prog_name] = next((fid for fid in config.STATS_BASELINE_IDS if fid in flags_ids), flags_ids[0])
+    return baselines
+
+
+def compare_to_baseline(results_df: pd.DataFrame, base_output_dir=None):
+    """
+    Compares every configuration with its program's baseline: speedup with a
+    bootstrap confidence interval, Welch and Mann-Whitney p-values, Holm
+    correction per program and Cliff's delta as effect size. Configurations
+    are ranked per program by effect size (ties: speedup). Saves the table as
+    results/benchmark_significance.csv if base_output_dir is given.
+    """
+    print("\n--- Comparing Configurations vs. Baseline ---")
+    if results_df is None or results_df.empty or 'RawTimes' not in results_df.columns:
+        print("WARNING: No raw run times available for statistical comparison.")
+        return None
+
+    df = results_df.reset_index(drop=True)
+    baselines = select_baselines(df)
+    flags_ids = df['FlagsID'].astype(str)
+    is_baseline = flags_ids.to_numpy() == df['Program'].map(baselines).to_numpy()
+    baseline_row = pd.Series(np.flatnonzero(is_baseline), index=df['Program'][is_baseline])
+    compared = ~is_baseline
+    if not compared.any():
+        print("WARNING: Only baseline configurations present, nothing to compare.")
+        return None
+
+    times = times_matrix(df['RawTimes'])
+    x = times[compared]
+    y = times[baseline_row.loc[df['Program'][compared]].to_numpy()]
+
+    _, p_welch = welch_test(x, y)
+    _, p_mw, cliffs_delta = mann_whitney_test(x, y)
+    rng = np.random.default_rng(config.BOOTSTRAP_SEED)
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning) # Rows without valid runs
+        mean_times = np.nanmean(x, axis=1)
+        speedup = np.nanmean(y, axis=1) / mean_times
+        boot = bootstrap_means(y, config.BOOTSTRAP_RESAMPLES, rng) / bootstrap_means(x, config.BOOTSTRAP_RESAMPLES, rng)
+    ci_low, ci_high = np.full(len(x), np.nan), np.full(len(x), np.nan)
+    finite = np.isfinite(boot).all(axis=1)
+    if finite.any():
+        ci_low[finite], ci_high[finite] = np.percentile(boot[finite], [2.5, 97.5], axis=1)
+
+    programs = df['Program'][compared].to_numpy()
+    p_test = p_welch if config.STATS_TEST == "welch" else p_mw
+    p_holm = holm_adjust(p_test, programs)
+
+    comparison_df = pd.DataFrame({
+        'Program': programs,
+        'FlagsID': flags_ids[compared].to_numpy(),
+        'Baseline': [baselines[p] for p in programs],
+        'MeanTime': mean_times,
+        'Speedup': speedup,
+        'SpeedupCILow': ci_low,
+        'SpeedupCIHigh': ci_high,
+        'CliffsDelta': cliffs_delta,
+        'PWelch': p_welch,
+        'PMannWhitney': p_mw,
+        'PHolm': p_holm,
+    })
+    comparison_df['Significant'] = comparison_df['PHolm'] < config.STATS_ALPHA
+    comparison_df['Marker'] = comparison_df['PHolm'].apply(significance_marker)
+    comparison_df = comparison_df.sort_values(['Program', 'CliffsDelta', 'Speedup'],
+                                              ascending=[True, False, False], na_position='last')
+    comparison_df['Rank'] = comparison_df.groupby('Program').cumcount() + 1
+    comparison_df = comparison_df.reset_index(drop=True)
+
+    num_significant = int(comparison_df['Significant'].sum())
+    print(f"INFO: {len(comparison_df)} comparisons, {num_significant} significant "
+          f"(Holm-adjusted {config.STATS_TEST}, alpha={config.STATS_ALPHA}).")
+    if base_output_dir is not None:
+        csv_path = base_output_dir / config.RESULTS_SUBDIR / "benchmark_significance.csv"
+        try:
+            csv_path.parent.mkdir(parents=True, exist_ok=True)
+            comparison_df.to_csv(csv_path, index=False, float_format='%.6g')
+            print(f"INFO: Statistical comparison saved to: {csv_path}")
+        except Exception as e:
+            print(f"ERROR: Failed to save statistical comparison {csv_path}: {e}")
+    return comparison_df
+
+
+def create_plots(results_df: pd.DataFrame, base_output_dir, comparison_df: pd.DataFrame = None):
+    """
+    Generates bar plots for each program comparing flag configurations.
+    With comparison_df (see compare_to_baseline), bars are marked with their
+    significance vs. the baseline, which is labelled 'ref'.
+    """
     print("\n--- Generating Plots ---")
     if results_df is None or results_df.empty:
         print("WARNING: No analysis data available to generate plots.")
@@ -36,8 +266,10 @@ def create_plots(results_df: pd.DataFrame, base_output_dir):
 
         plt.xlabel("Flag Configuration ID")
         plt.ylabel("Mean Execution Time (seconds)")
-        plt.title(f"Mean Execution Time vs. Flags for {prog_name}\n"
-                  f"(Error bars = stdev of successful runs)")
+        subtitle = "Error bars = stdev of successful runs"
+        if comparison_df is not None:
+            subtitle += "; * p<0.05, ** p<0.01, *** p<0.001 vs. ref (Holm)"
+        plt.title(f"Mean Execution Time vs. Flags for {prog_name}\n({subtitle})")
         plt.grid(axis='y', linestyle='--', alpha=0.6)
 
         if use_rotation:
@@ -53,6 +285,25 @@ def create_plots(results_df: pd.DataFrame, base_output_dir):
                      plt.text(bar.get_x() + bar.get_width()/2.0, yval,
                               f'{yval:.3f}', va='bottom', ha='center', fontsize=8)
 
+        # Significance markers above the error bars
+        if comparison_df is not None:
+            prog_cmp = comparison_df[comparison_df['Program'] == prog_name]
+            markers = dict(zip(prog_cmp['FlagsID'], prog_cmp['Marker']))
+            baseline_id = prog_cmp['Baseline'].iloc[0] if not prog_cmp.empty else None
+            for bar, flags_id, std in zip(bars, prog_df['FlagsID'].astype(str), prog_df['StdDev']):
+                label = "ref" if flags_id == baseline_id else markers.get(flags_id, "")
+                top = bar.get_height() + (std if pd.notna(std) else 0)
+                if label and pd.notna(top):
+                    plt.annotate(label, (bar.get_x() + bar.get_width()/2.0, top), xytext=(0, 8),
+                                 textcoords='offset points', ha='center', va='bottom', fontsize=9,
+                                 color='darkred' if label != "ref" else 'dimgray')
+
+        # Hatch configurations whose binary (and thus runs) is shared with another one
+        if 'SameBinaryAs' in prog_df.columns:
+            for bar, same_as in zip(bars, prog_df['SameBinaryAs']):
+                if isinstance(same_as, str) and same_as:
+                    bar.set_hatch('//')
+
         # Adjust y-limit
         min_val = (prog_df['MeanTime'] - prog_df['StdDev']).min()
         max_val = (prog_df['MeanTime'] + prog_df['StdDev']).max()
@@ -77,8 +328,8 @@ def create_plots(results_df: pd.DataFrame, base_output_dir):
 
 def generate_markdown_report(results_df: pd.DataFrame, plot_relative_paths: dict,
                              programs_run_names: list, flag_configs: dict,
-                             base_output_dir):
-    """Generates the final Markdown report."""
+                             base_output_dir, comparison_df: pd.DataFrame = None):
+    """Generates the final Markdown report (with comparison_df: ranked statistical comparison)."""
     print("\n--- Generating Markdown Report ---")
     report_path = base_output_dir / "benchmark_report.md"
     results_dir = base_output_dir / config.RESULTS_SUBDIR
@@ -126,6 +377,48 @@ def generate_markdown_report(results_df: pd.DataFrame, plot_relative_paths: dict
              f.write("\n\n")
         f.write("*Note: Table shows mean time of successful runs. NaN indicates no successful runs were recorded/analyzed.*\n\n")
 
+        if comparison_df is not None and not comparison_df.empty:
+            test_name = "Welch t-test" if config.STATS_TEST == "welch" else "Mann-Whitney U test"
+            f.write("## Statistical Comparison vs. Baseline\n\n")
+            f.write(f"Configurations ranked per program by effect size (Cliff's delta, positive = faster than the baseline). "
+                    f"Significance: two-sided {test_name}, Holm-corrected per program, alpha = {config.STATS_ALPHA} "
+                    f"(`*` p<0.05, `**` p<0.01, `***` p<0.001). "
+                    f"Speedup = baseline mean / configuration mean with a 95% bootstrap interval "
+                    f"({config.BOOTSTRAP_RESAMPLES} resamples).\n\n")
+            for prog_name, prog_cmp in comparison_df.groupby('Program', sort=True):
+                f.write(f"### {prog_name} (baseline `{prog_cmp['Baseline'].iloc[0]}`)\n\n")
+                def fmt(spec):
+                    return lambda v: "n/a" if pd.isna(v) else format(v, spec)
+                table = pd.DataFrame({
+                    'Rank': prog_cmp['Rank'],
+                    'FlagsID': prog_cmp['FlagsID'],
+                    'Speedup': prog_cmp['Speedup'].map(fmt(".3f")),
+                    '95% CI': [f"[{lo:.3f}, {hi:.3f}]" if pd.notna(lo) else "n/a"
+                               for lo, hi in zip(prog_cmp['SpeedupCILow'], prog_cmp['SpeedupCIHigh'])],
+                    "Cliff's delta": prog_cmp['CliffsDelta'].map(fmt("+.2f")),
+                    'p (Welch)': prog_cmp['PWelch'].map(fmt(".2g")),
+                    'p (Mann-Whitney)': prog_cmp['PMannWhitney'].map(fmt(".2g")),
+                    'p (Holm)': prog_cmp['PHolm'].map(fmt(".2g")),
+                    'Sig.': prog_cmp['Marker'],
+                })
+                f.write(table.to_markdown(index=False))
+                f.write("\n\n")
+            f.write("*Note: with few runs per configuration the smallest attainable p-value is limited; "
+                    "increase the number of runs if no configuration reaches significance.*\n\n")
+
+        if 'SameBinaryAs' in results_df.columns:
+            aliases_df = results_df[results_df['SameBinaryAs'].apply(lambda v: isinstance(v, str) and v != "")]
+            if not aliases_df.empty:
+                f.write("## Identical Binaries\n\n")
+                f.write("These configurations produced the same executable (identical loaded sections) as another "
+                        "configuration of the program. They were not run separately; their results are those of the "
+                        "listed configuration (hatched bars in the plots).\n\n")
+                for prog_name, prog_aliases in aliases_df.groupby('Program', sort=True, observed=True):
+                    groups = prog_aliases.groupby('SameBinaryAs', sort=True)['FlagsID'].apply(lambda ids: sorted(map(str, ids)))
+                    for representative, alias_ids in groups.items():
+                        f.write(f"*   **{prog_name}:** `{representative}` = {', '.join(f'`{fid}`' for fid in alias_ids)}\n")
+                f.write("\n")
+
         f.write("## Performance Plots\n\n")
         f.write("Plots show mean execution time (successful runs) vs. flag configuration ID. Error bars = standard deviation.\n\n")
 
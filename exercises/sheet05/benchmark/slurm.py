@@ -3,6 +3,8 @@ import os
 import stat
 import re
 import time
+import random
+import shlex
 from pathlib import Path
 
 import config
@@ -104,8 +106,183 @@ def submit_slurm_job(script_path: Path):
         print(f"ERROR: Failed to submit job from {script_path.name}: {e}")
         return None
 
-def run_slurm_benchmarks(programs_to_run, flag_configs, build_results, num_runs, base_output_dir, submit=True):
-    """Generates and optionally submits Slurm jobs for all configurations."""
+def queued_job_ids(job_ids):
+    """The subset of job_ids still queued or running (empty if squeue fails)."""
+    if not job_ids:
+        return set()
+    result = run_command(["squeue", "-h", "-o", "%i", "-j", ",".join(job_ids)], check=False, verbose=False)
+    if result.returncode != 0:
+        return set()
+    # Array tasks are listed as <id>_<task>
+    listed = {line.split("_")[0] for line in result.stdout.split()}
+    return {job_id for job_id in job_ids if job_id in listed}
+
+def generate_batch_script(batch_name, task_runs, base_output_dir):
+    """
+    Generates one Slurm job array script. Task i runs the tuples in task_runs[i]
+    (dicts with job_name, run_label, prog_name, flags_id, build_dir, command)
+    one after another after loading the modules once. Every run writes its own
+    log in the per-run script's format (<job_name>.log), so analyze.py reads
+    batched and single runs alike.
+    """
+    scripts_dir = base_output_dir / config.SLURM_SCRIPTS_SUBDIR
+    logs_dir = (base_output_dir / config.SLURM_LOGS_SUBDIR).resolve()
+    scripts_dir.mkdir(parents=True, exist_ok=True)
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    slurm_script_path = scripts_dir / f"{batch_name}.sh"
+    batch_log_path = logs_dir / f"{batch_name}_%A_%a.batch.log" # Not matched by analyze.py
+
+    array_spec = f"0-{len(task_runs) - 1}"
+    if config.SLURM_ARRAY_MAX_PARALLEL:
+        array_spec += f"%{config.SLURM_ARRAY_MAX_PARALLEL}"
+
+    task_cases = []
+    for task_id, runs in enumerate(task_runs):
+        lines = [f"    {task_id})"]
+        for run in runs:
+            args = [run['job_name'], run['run_label'], run['prog_name'], run['flags_id'],
+                    str(run['build_dir'].resolve())] + run['command']
+            lines.append("        run_one " + " ".join(shlex.quote(a) for a in args))
+        lines.append("        ;;")
+        task_cases.append("\n".join(lines))
+
+    script_content = f"""#!/bin/bash
+#SBATCH --partition={config.SLURM_PARTITION}
+#SBATCH --job-name={batch_name}
+#SBATCH --output={batch_log_path}
+#SBATCH --error={batch_log_path}
+#SBATCH --array={array_spec}
+#SBATCH --ntasks={config.SLURM_NTASKS}
+#SBATCH --nodes={config.SLURM_NODES}
+#SBATCH --cpus-per-task={config.SLURM_CPUS_PER_TASK}
+#SBATCH --time={config.SLURM_BATCH_TIME}
+#SBATCH --exclusive
+
+echo "--- Batch Info ---"
+echo "Array Job ID: $SLURM_ARRAY_JOB_ID, Task: $SLURM_ARRAY_TASK_ID"
+echo "Job started at: $(date)"
+
+echo "--- Loading Modules ---"
+module purge
+{chr(10).join([f"module load {mod}" for mod in config.MODULES_TO_LOAD])}
+module list
+
+# Runs one (program, flags, repetition) tuple and writes its per-run log
+run_one() {{
+    local job_name="$1" run_label="$2" prog_name="$3" flags_id="$4" build_dir="$5"
+    shift 5
+    local log_file="{logs_dir}/$job_name.log"
+    (
+        echo "--- Job Info ---"
+        echo "Job ID: ${{SLURM_ARRAY_JOB_ID}}_${{SLURM_ARRAY_TASK_ID}}"
+        echo "Job Name: $job_name"
+        echo "Run Index: $run_label"
+        echo "Program: $prog_name"
+        echo "Flags ID: $flags_id"
+        echo "Build Dir: $build_dir"
+        echo "Log File: $log_file"
+        echo "Job started at: $(date)"
+        echo "--- Execution ---"
+        echo "Changing directory to: $build_dir"
+        cd "$build_dir" || exit 1
+        echo "Running command: time -p $*"
+        echo "-------------------- Program Output Start --------------------"
+        time -p "$@"
+        exit_code=$?
+        echo "-------------------- Program Output End ----------------------"
+        echo "--- Completion ---"
+        echo "Command finished with exit code: $exit_code"
+        echo "Job finished at: $(date)"
+    ) > "$log_file" 2>&1
+    echo "$(date +%T) $job_name done"
+}}
+
+echo "--- Execution ---"
+case "$SLURM_ARRAY_TASK_ID" in
+{chr(10).join(task_cases)}
+    *)
+        echo "Unknown array task $SLURM_ARRAY_TASK_ID"
+        exit 1
+        ;;
+esac
+
+echo "--- Completion ---"
+echo "Job finished at: $(date)"
+"""
+    try:
+        with open(slurm_script_path, "w") as f:
+            f.write(script_content)
+        slurm_script_path.chmod(slurm_script_path.stat().st_mode | stat.S_IEXEC)
+        return slurm_script_path
+    except Exception as e:
+        print(f"ERROR: Failed to write/chmod Slurm script {slurm_script_path}: {e}")
+        return None
+
+def collect_run_tuples(programs_to_run, flag_configs, build_results, num_runs, aliases=None):
+    """
+    All (program, flags, repetition) runs as dicts with job_name, run_label,
+    prog_name, flags_id, build_dir and command. Configurations without an
+    executable and aliases of identical binaries are left out.
+    """
+    aliases = aliases or {}
+    run_tuples = []
+    for prog in programs_to_run:
+        for flags_id in flag_configs:
+            if (prog['name'], flags_id) in aliases:
+                continue
+            exe_path = build_results.get((prog['name'], flags_id))
+            if not exe_path or not exe_path.is_file():
+                print(f"WARNING: Executable for {prog['name']} / {flags_id} not found or build failed. Skipping runs.")
+                continue
+            exe_rel_path = Path(prog['exe_subdir']) / prog['exe_name']
+            for i in range(num_runs):
+                run_tuples.append({
+                    "job_name": f"{prog['name']}_{flags_id}_run{i + 1}",
+                    "run_label": f"{i + 1}/{num_runs}",
+                    "prog_name": prog['name'],
+                    "flags_id": flags_id,
+                    "build_dir": exe_path.parent,
+                    "command": [f"./{exe_rel_path}"] + prog['run_args'],
+                })
+    return run_tuples
+
+def run_batched_benchmarks(run_tuples, base_output_dir, submit, runs_per_job):
+    """
+    Packs all runs into one job array with runs_per_job runs per array task.
+    The runs are shuffled before packing (and thus within each task), so the
+    repetitions of a configuration spread over tasks, nodes and time.
+    Returns {batch name: array job id}.
+    """
+    rng = random.Random(config.SLURM_BATCH_SEED)
+    run_tuples = list(run_tuples)
+    rng.shuffle(run_tuples)
+    task_runs = [run_tuples[i:i + runs_per_job] for i in range(0, len(run_tuples), runs_per_job)]
+    batch_name = f"benchmark_batch_{time.strftime('%Y%m%d_%H%M%S')}"
+    script_path = generate_batch_script(batch_name, task_runs, base_output_dir)
+    if not script_path:
+        return {}
+    print(f"INFO: Packed {len(run_tuples)} runs into {len(task_runs)} array tasks "
+          f"({runs_per_job} runs per task): {script_path}")
+    if not submit:
+        print(f"INFO: Jobs were not submitted. Submit manually via: sbatch {script_path}")
+        return {}
+    job_id = submit_slurm_job(script_path)
+    if not job_id:
+        return {}
+    print(f"Submitted job array {job_id} ({len(task_runs)} tasks).")
+    print(f"\nMonitor job status using: squeue -u $USER")
+    print(f"Logs will appear in: {base_output_dir / config.SLURM_LOGS_SUBDIR}")
+    print("INFO: Wait for all jobs to complete before running analysis.")
+    return {batch_name: job_id}
+
+def run_slurm_benchmarks(programs_to_run, flag_configs, build_results, num_runs, base_output_dir, submit=True,
+                         runs_per_job=0, aliases=None):
+    """
+    Generates and optionally submits Slurm jobs for all configurations.
+    With runs_per_job > 0 the runs are packed into a job array instead of one job per run.
+    Configurations in aliases ({(prog_name, flags_id): representative}, see
+    binary_dedup) have the same binary as their representative and are not run.
+    """
     print("\n--- Running Benchmarks (Generating/Submitting Slurm Jobs) ---")
     submitted_jobs = {} # { job_name: job_id }
     total_scripts_generated = 0
@@ -117,9 +294,22 @@ def run_slurm_benchmarks(programs_to_run, flag_configs, build_results, num_runs,
         print("INFO: No programs selected for running.")
         return {}
 
+    aliases = aliases or {}
+    if aliases:
+        print(f"INFO: Skipping {len(aliases)} configurations with a binary identical to another configuration.")
+
+    if runs_per_job > 0:
+        run_tuples = collect_run_tuples(programs_to_run, flag_configs, build_results, num_runs, aliases)
+        if not run_tuples:
+            print("ERROR: No runs to batch (all builds missing).")
+            return {}
+        return run_batched_benchmarks(run_tuples, base_output_dir, submit, runs_per_job)
+
     for prog in programs_to_run:
         prog_name = prog['name']
         for flags_id, flags_list in flag_configs.items():
+            if (prog_name, flags_id) in aliases:
+                continue # Results come from the representative's runs
             # Find the corresponding build result
             build_key = (prog_name, flags_id)
             exe_path = build_results.get(build_key)
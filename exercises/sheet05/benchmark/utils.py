@@ -8,15 +8,15 @@ import re
 
 import config # Import static config
 
-def run_command(cmd, cwd=None, env=None, check=True, shell=False, capture=True, verbose=True):
-    """Runs a command, prints output, and checks return code."""
+def run_command(cmd, cwd=None, env=None, check=True, shell=False, capture=True, verbose=True, pass_fds=()):
+    """Runs a command, prints output, and checks return code. pass_fds are inherited (jobserver pipe)."""
     cmd_str = " ".join(cmd) if isinstance(cmd, list) else cmd
     if verbose:
         print(f"INFO: Running: {cmd_str} in {cwd or os.getcwd()}")
     try:
         result = subprocess.run(
             cmd, capture_output=capture, text=True, cwd=cwd, env=env,
-            check=check, shell=shell,
+            check=check, shell=shell, pass_fds=pass_fds,
         )
         # Less verbose debug logging
         # if capture and verbose:
@@ -36,10 +36,20 @@ def run_command(cmd, cwd=None, env=None, check=True, shell=False, capture=True,
         print(f"ERROR: An unexpected error occurred running command: {e}")
         raise
 
-def load_modules(verbose=True):
-    """Loads the required environment modules."""
+def modules_available():
+    """True if an environment module system (Environment Modules or Lmod) is set up."""
+    return bool(os.environ.get("MODULESHOME") or os.environ.get("LMOD_CMD"))
+
+def load_modules(verbose=True, optional=False):
+    """
+    Loads the required environment modules. With optional=True (local runs on a
+    workstation) a missing module system is skipped and only the tools are checked.
+    """
     if verbose: print("\n--- Loading Environment Modules ---")
     try:
+        if optional and not modules_available():
+            print("INFO: No environment module system found, using the tools in PATH.")
+            return verify_tools(verbose)
         if verbose: print("INFO: Running 'module purge'")
         run_command("module purge", shell=True, check=True, capture=False, verbose=verbose)
         for mod in config.MODULES_TO_LOAD:
@@ -49,21 +59,25 @@ def load_modules(verbose=True):
             print("INFO: Running 'module list' to verify:")
             run_command("module list", shell=True, check=False, capture=False, verbose=verbose)
             print("INFO: Modules loaded successfully.")
-            print("INFO: Verifying essential tools (gcc, g++, cmake, ninja)...")
-        tools_ok = True
-        for tool in [config.CC, config.CXX, "cmake", "ninja"]:
-            if not shutil.which(tool):
-                print(f"  ERROR: Command '{tool}' not found in PATH after loading modules.")
-                tools_ok = False
-        if not tools_ok:
-             print("ERROR: Not all required tools found. Check module names and availability.")
-             return False
-        if verbose: print("INFO: Essential tools verified.")
-        return True
+        return verify_tools(verbose)
     except Exception as e:
         print(f"ERROR: Failed to load modules: {e}")
         return False
 
+def verify_tools(verbose=True):
+    """Checks that the compilers and build tools are in PATH."""
+    if verbose: print("INFO: Verifying essential tools (gcc, g++, cmake, ninja)...")
+    tools_ok = True
+    for tool in [config.CC, config.CXX, "cmake", "ninja"]:
+        if not shutil.which(tool):
+            print(f"  ERROR: Command '{tool}' not found in PATH after loading modules.")
+            tools_ok = False
+    if not tools_ok:
+         print("ERROR: Not all required tools found. Check module names and availability.")
+         return False
+    if verbose: print("INFO: Essential tools verified.")
+    return True
+
 def ensure_output_dirs(base_output_dir):
     """Creates necessary output directories."""
     print("INFO: Ensuring output directories exist...")
@@ -153,4 +167,16 @@ def get_o2_to_o3_cumulative_configs():
     configs["O3_baseline"] = ["-O3"]
     print(f"DEBUG: Added O3 baseline config: {' '.join(configs['O3_baseline'])}")
 
-    return configs
\ No newline at end of file
+    return configs
+
+def get_pgo_lto_configs():
+    """
+    Generates flag configurations for the multi-stage builds: LTO, PGO and
+    both on top of -O2 and -O3 (see config.PGO_FLAG / config.LTO_FLAG).
+    """
+    configs = {"O2_baseline": ["-O2"], "O3_baseline": ["-O3"]}
+    for level in ("O2", "O3"):
+        configs[f"{level}_lto"] = [f"-{level}", config.LTO_FLAG]
+        configs[f"{level}_pgo"] = [f"-{level}", config.PGO_FLAG]
+        configs[f"{level}_pgo_lto"] = [f"-{level}", config.PGO_FLAG, config.LTO_FLAG]
+    return configs
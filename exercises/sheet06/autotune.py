@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Cache-model-driven tile-size autotuner for mmul_tiled.c.
+
+Instead of running every entry of benchmark.py's TILE_SIZES_TO_TEST
+NUM_RUNS times, the autotuner
+  1. reads the data cache hierarchy from sysfs and proposes (tile_i, tile_j,
+     tile_k) candidates whose working set (one tile each of A, B and C, in
+     whole cache lines) fills L1 or L2 to between CACHE_FILL_MIN and
+     CACHE_FILL_MAX,
+  2. races the candidates with successive halving (one run each, the best
+     1/HALVING_ETA get more runs, ...),
+  3. refines the winner one loop dimension at a time with a golden-section
+     search over the integer tile size.
+Runs execute locally pinned to one core (--backend local) or as Slurm jobs
+(--backend slurm, one batch of jobs per halving rung / search step).
+
+Usage: python autotune.py [--backend local|slurm]
+"""
+import argparse
+import math
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import benchmark as bench
+
+# --- Configuration ---
+
+MATRIX_SIZE = bench.MATRIX_SIZE
+ELEMENT_BYTES = 8 # TYPE double in mmul_tiled.c
+BASE_OUTPUT_DIR = Path("./mmul_autotune") # Separate from the brute-force sweep's logs
+BUILD_DIR = BASE_OUTPUT_DIR / "build"
+RESULTS_DIR = BASE_OUTPUT_DIR / "results"
+EXECUTABLE_NAME = "mmul_tiled_autotune_exec"
+
+# Cache model
+SYSFS_CACHE_DIR = Path("/sys/devices/system/cpu/cpu0/cache")
+# Cache sizes in bytes by level, e.g. {1: 32 * 1024, 2: 1024 * 1024}; set this
+# when the Slurm compute nodes differ from the machine the tuner runs on
+CACHE_SIZES_OVERRIDE = {}
+DEFAULT_LINE_SIZE = 64
+CACHE_LEVELS_TO_TARGET = [1, 2]
+CACHE_FILL_MIN = 0.25 # Share of a cache level a candidate's working set must fill ...
+CACHE_FILL_MAX = 0.75 # ... leaving room for conflict misses and other data
+CANDIDATES_PER_LEVEL = 6 # Spread over the fill range, plus the cubic tiles that fit
+TILE_GRID_MIN = 4 # Smallest tile size of the candidate grid (powers of two and 1.5x those)
+
+# Search
+HALVING_ETA = 3 # Keep the best 1/HALVING_ETA candidates per rung
+HALVING_MIN_RUNS = 1 # Runs per candidate in the first rung, doubled every rung
+HALVING_MAX_RUNS = 4
+REFINE_RUNS = 2 # Runs per tile size evaluated by the golden-section search
+REFINE_RANGE = 1.5 # Search each dimension in [best / REFINE_RANGE, best * REFINE_RANGE] ...
+REFINE_STEP = 4 # ... in steps of this (tile_j: in steps of one cache line)
+# Total runs of a tuning session; by default the brute-force sweep's run count
+RUN_BUDGET = len(bench.TILE_SIZES_TO_TEST) * bench.NUM_RUNS
+LOCAL_RUN_TIMEOUT = 1800 # Seconds
+LOCAL_CPU = None # CPU for local runs (None: the last CPU this process may use)
+
+GOLDEN_RATIO = (math.sqrt(5) - 1) / 2
+
+# --- Cache Model ---
+
+def parse_cache_size(text):
+    """Bytes of a sysfs cache size such as '48K' or '32M'."""
+    text = text.strip().upper()
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    if text and text[-1] in units:
+        return int(text[:-1]) * units[text[-1]]
+    return int(text)
+
+
+def read_cache_hierarchy():
+    """{level: (size bytes, line bytes)} of the data/unified caches of cpu0."""
+    caches = {}
+    for index_dir in sorted(SYSFS_CACHE_DIR.glob("index*")):
+        try:
+            if (index_dir / "type").read_text().strip() not in ("Data", "Unified"):
+                continue
+            level = int((index_dir / "level").read_text())
+            size = parse_cache_size((index_dir / "size").read_text())
+            line_file = index_dir / "coherency_line_size"
+            line = int(line_file.read_text()) if line_file.is_file() else DEFAULT_LINE_SIZE
+        except (OSError, ValueError):
+            continue
+        caches[level] = (size, line)
+    for level, size in CACHE_SIZES_OVERRIDE.items():
+        caches[level] = (size, caches.get(level, (0, DEFAULT_LINE_SIZE))[1])
+    return caches
+
+
+def tile_footprint(tiles, line_size):
+    """
+    Bytes of cache lines touched by one tile step: A[ti x tk], B[tk x tj] and
+    C[ti x tj], each row rounded up to whole cache lines (rows of the
+    matrices are MATRIX_SIZE elements apart, so tile rows never share lines).
+    """
+    ti, tj, tk = tiles
+    row_bytes = lambda cols: math.ceil(cols * ELEMENT_BYTES / line_size) * line_size
+    return ti * row_bytes(tk) + tk * row_bytes(tj) + ti * row_bytes(tj)
+
+
+def tile_grid():
+    """Powers of two and 1.5x powers of two from TILE_GRID_MIN to MATRIX_SIZE."""
+    sizes = set()
+    size = TILE_GRID_MIN
+    while size <= MATRIX_SIZE:
+        sizes.add(size)
+        if size * 3 // 2 <= MATRIX_SIZE:
+            sizes.add(size * 3 // 2)
+        size *= 2
+    return sorted(sizes)
+
+
+def propose_candidates(caches):
+    """
+    {(ti, tj, tk): cache level targeted} of tiles whose footprint fills a
+    targeted cache level to CACHE_FILL_MIN..CACHE_FILL_MAX. Per level, the
+    cubic tiles plus CANDIDATES_PER_LEVEL tiles spread over the fill range.
+    """
+    grid = tile_grid()
+    candidates = {}
+    for level in CACHE_LEVELS_TO_TARGET:
+        if level not in caches:
+            print(f"Warning: No L{level} cache found in sysfs. Skipping it.")
+            continue
+        size, line = caches[level]
+        fitting = []
+        for ti in grid:
+            for tj in grid:
+                if tj * ELEMENT_BYTES < line: # j runs along rows of B and C: use whole lines
+                    continue
+                for tk in grid:
+                    footprint = tile_footprint((ti, tj, tk), line)
+                    if CACHE_FILL_MIN * size <= footprint <= CACHE_FILL_MAX * size:
+                        fitting.append((footprint, (ti, tj, tk)))
+        if not fitting:
+            print(f"Warning: No tile of the grid fits L{level} ({size // 1024} KiB).")
+            continue
+        fitting.sort()
+        picks = np.unique(np.linspace(0, len(fitting) - 1, CANDIDATES_PER_LEVEL).round().astype(int))
+        chosen = [fitting[i][1] for i in picks] + [t for _, t in fitting if t[0] == t[1] == t[2]]
+        for tiles in chosen:
+            candidates.setdefault(tiles, level)
+        print(f"INFO: L{level} ({size // 1024} KiB, {line} B lines): {len(fitting)} grid tiles fit, "
+              f"{len(set(chosen))} proposed.")
+    return candidates
+
+# --- Evaluation ---
+
+class Evaluator:
+    """Runs tile configurations and keeps every measured time."""
+
+    def __init__(self, exe_path, backend):
+        self.exe_path = exe_path
+        self.backend = backend
+        self.times = {} # {tiles: [seconds]}
+        self.submitted = {} # {tiles: runs started} (Slurm run indices)
+        self.phase = {} # {tiles: phase that first evaluated it}
+        self.total_runs = 0
+        cpus = sorted(os.sched_getaffinity(0))
+        self.cpu = LOCAL_CPU if LOCAL_CPU is not None else cpus[-1]
+
+    def mean(self, tiles):
+        times = self.times.get(tiles)
+        return float(np.mean(times)) if times else math.inf
+
+    def run(self, batch, phase):
+        """Runs every (tiles, number of runs) of batch."""
+        for tiles in batch:
+            self.phase.setdefault(tiles, phase)
+        if self.backend == 'slurm':
+            self._run_slurm(batch)
+        else:
+            self._run_local(batch)
+
+    def _run_local(self, batch):
+        taskset = ["taskset", "--cpu-list", str(self.cpu)] if shutil.which("taskset") else []
+        for tiles, runs in batch.items():
+            for _ in range(runs):
+                command = taskset + [str(self.exe_path.resolve())] + [str(t) for t in tiles]
+                start = time.perf_counter()
+                self.total_runs += 1 # Timed-out runs cost budget too
+                try:
+                    result = subprocess.run(command, capture_output=True, text=True, timeout=LOCAL_RUN_TIMEOUT)
+                except subprocess.TimeoutExpired:
+                    print(f"Warning: Tiles {tiles} timed out after {LOCAL_RUN_TIMEOUT}s.")
+                    continue
+                elapsed = time.perf_counter() - start
+                if result.returncode != 0 or "Verification: OK" not in result.stdout:
+                    print(f"Warning: Tiles {tiles} failed (exit code {result.returncode}).")
+                    continue
+                self.times.setdefault(tiles, []).append(elapsed)
+
+    def _run_slurm(self, batch):
+        job_ids, logs = [], []
+        for tiles, runs in batch.items():
+            for _ in range(runs):
+                run_idx = self.submitted.get(tiles, 0)
+                self.submitted[tiles] = run_idx + 1
+                job_id = bench.generate_and_submit_slurm('tiled', tiles, run_idx, self.exe_path, BASE_OUTPUT_DIR)
+                if job_id:
+                    if job_id != "UNKNOWN":
+                        job_ids.append(job_id)
+                    label = "x".join(map(str, tiles))
+                    logs.append((tiles, BASE_OUTPUT_DIR / "slurm_logs" / f"mmul_tiled_tile{label}_run{run_idx + 1}.log"))
+                time.sleep(bench.SLURM_SUBMIT_DELAY)
+        bench.wait_for_slurm_jobs(job_ids)
+        for tiles, log_path in logs:
+            real_time, verified, exit_code = bench.parse_log(log_path)
+            self.total_runs += 1
+            if real_time is None or exit_code != 0 or verified is False:
+                print(f"Warning: Run {log_path.name} failed or has no time.")
+                continue
+            self.times.setdefault(tiles, []).append(real_time)
+
+# --- Search ---
+
+def successive_halving(evaluator, candidates):
+    """
+    Races the candidates; returns the winner. A rung that would exceed
+    RUN_BUDGET is not run: the first rung is cut to the candidates that fit,
+    later ones end the race with the current leader.
+    """
+    survivors = list(candidates)
+    runs = HALVING_MIN_RUNS
+    rung = 0
+    while True:
+        batch = {t: runs - len(evaluator.times.get(t, [])) for t in survivors}
+        if evaluator.total_runs + sum(n for n in batch.values() if n > 0) > RUN_BUDGET:
+            if rung > 0:
+                print(f"INFO: Run budget ({RUN_BUDGET}) reached; ending the race after rung {rung - 1}.")
+                return survivors[0]
+            survivors = survivors[:max(1, (RUN_BUDGET - evaluator.total_runs) // runs)]
+            batch = {t: batch[t] for t in survivors}
+            print(f"Warning: Run budget ({RUN_BUDGET}) only covers the first {len(survivors)} candidates.")
+        print(f"\n--- Successive Halving: Rung {rung}, {len(survivors)} candidates, {runs} runs each ---")
+        evaluator.run({t: n for t, n in batch.items() if n > 0}, f"halving rung {rung}")
+        survivors.sort(key=evaluator.mean)
+        for tiles in survivors[:5]:
+            print(f"  {tiles}: {evaluator.mean(tiles):.3f}s")
+        if len(survivors) == 1 or runs >= HALVING_MAX_RUNS:
+            return survivors[0]
+        survivors = survivors[:max(1, math.ceil(len(survivors) / HALVING_ETA))]
+        runs = min(HALVING_MAX_RUNS, runs * 2)
+        rung += 1
+
+
+def refine_values(best_size, step):
+    """Tile sizes searched around best_size: multiples of step within REFINE_RANGE."""
+    lo = max(step, min(int(best_size / REFINE_RANGE), best_size - 2 * step))
+    hi = min(MATRIX_SIZE, max(int(best_size * REFINE_RANGE), best_size + 2 * step))
+    values = set(range(lo - lo % step, hi + 1, step)) | {best_size}
+    return sorted(v for v in values if 1 <= v <= MATRIX_SIZE)
+
+
+def golden_section_refine(evaluator, best, line_size):
+    """
+    Golden-section search over each tile dimension in turn, starting from
+    best. Stops early when the next evaluation would exceed RUN_BUDGET.
+    """
+    best = tuple(best)
+    for dim, name in enumerate("ijk"):
+        step = line_size // ELEMENT_BYTES if name == "j" else REFINE_STEP
+        values = refine_values(best[dim], step)
+        print(f"\n--- Golden-Section Search: tile_{name} in {values[0]}..{values[-1]} (step {step}) ---")
+
+        def cost(index):
+            tiles = best[:dim] + (values[index],) + best[dim + 1:]
+            missing = REFINE_RUNS - len(evaluator.times.get(tiles, []))
+            if missing > 0:
+                if evaluator.total_runs + missing > RUN_BUDGET:
+                    raise StopIteration
+                evaluator.run({tiles: missing}, f"refine tile_{name}")
+                print(f"  {tiles}: {evaluator.mean(tiles):.3f}s")
+            return evaluator.mean(tiles)
+
+        a, b = 0, len(values) - 1
+        try:
+            while b - a > 2:
+                c = b - int(round(GOLDEN_RATIO * (b - a)))
+                d = a + int(round(GOLDEN_RATIO * (b - a)))
+                if cost(c) <= cost(d):
+                    b = d
+                else:
+                    a = c
+            for index in range(a, b + 1):
+                cost(index)
+        except StopIteration:
+            print(f"INFO: Run budget ({RUN_BUDGET}) reached; stopping the refinement.")
+            return min(evaluator.times, key=evaluator.mean)
+        best = min(evaluator.times, key=lambda t: evaluator.mean(t) if t[:dim] + t[dim + 1:] == best[:dim] + best[dim + 1:] else math.inf)
+    return best
+
+
+def write_results(evaluator, candidates, caches):
+    """Saves every evaluated configuration to autotune_results.csv; returns the DataFrame."""
+    line = caches.get(1, (0, DEFAULT_LINE_SIZE))[1]
+    rows = []
+    for tiles, times in evaluator.times.items():
+        rows.append({
+            "TileI": tiles[0], "TileJ": tiles[1], "TileK": tiles[2],
+            "Phase": evaluator.phase.get(tiles, ""),
+            "TargetLevel": f"L{candidates[tiles]}" if tiles in candidates else "",
+            "FootprintKiB": tile_footprint(tiles, line) / 1024,
+            "Runs": len(times), "MeanTime": np.mean(times), "StdDev": np.std(times, ddof=1) if len(times) > 1 else 0.0,
+        })
+    df = pd.DataFrame(rows).sort_values("MeanTime")
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    results_path = RESULTS_DIR / "autotune_results.csv"
+    df.to_csv(results_path, index=False, float_format="%.4f")
+    print(f"\nResults saved to: {results_path}")
+    return df
+
+# --- Main Execution ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Tile-size autotuner for mmul_tiled.c")
+    parser.add_argument("--backend", choices=["local", "slurm"], default="local",
+                        help="Run locally pinned to one CPU, or as Slurm jobs.")
+    args = parser.parse_args()
+
+    caches = read_cache_hierarchy()
+    if not caches:
+        print("ERROR: Could not read the cache hierarchy from sysfs (set CACHE_SIZES_OVERRIDE).")
+        sys.exit(1)
+    print("--- Cache Hierarchy ---")
+    for level, (size, line) in sorted(caches.items()):
+        print(f"  L{level}: {size // 1024} KiB, {line} B lines")
+
+    candidates = propose_candidates(caches)
+    if not candidates:
+        print("ERROR: No tile candidates fit the targeted cache levels.")
+        sys.exit(1)
+
+    BUILD_DIR.mkdir(parents=True, exist_ok=True)
+    exe_path = bench.compile_c_code(bench.C_SOURCE_TILED, BUILD_DIR / EXECUTABLE_NAME)
+    if not exe_path:
+        print("ERROR: Compilation failed. Exiting.")
+        sys.exit(1)
+
+    evaluator = Evaluator(exe_path, args.backend)
+    winner = successive_halving(evaluator, candidates)
+    if evaluator.mean(winner) == math.inf:
+        print("ERROR: No candidate ran successfully.")
+        sys.exit(1)
+    best = golden_section_refine(evaluator, winner, caches.get(1, (0, DEFAULT_LINE_SIZE))[1])
+    df = write_results(evaluator, candidates, caches)
+
+    brute_force_runs = len(bench.TILE_SIZES_TO_TEST) * bench.NUM_RUNS
+    print("\n--- Autotuning Summary ---")
+    print(df.head(10).to_string(index=False, float_format="%.3f"))
+    print(f"\nBest tiles (i, j, k): {best}, {evaluator.mean(best):.3f}s "
+          f"(halving winner {winner}: {evaluator.mean(winner):.3f}s)")
+    print(f"Total runs: {evaluator.total_runs} of a budget of {RUN_BUDGET} "
+          f"(brute-force sweep in benchmark.py: {brute_force_runs} runs of cubic tiles only)")
+
+
+if __name__ == "__main__":
+    main()
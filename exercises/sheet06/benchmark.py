@@ -45,6 +45,13 @@ COMPILE_DEFINES = [f"-DS={MATRIX_SIZE}"]  # Pass matrix size define
 EXECUTABLE_BASELINE_NAME = "mmul_baseline_exec"
 EXECUTABLE_TILED_NAME = "mmul_tiled_exec"
 
+# Reference Configuration (NumPy/BLAS runs as Slurm jobs next to the variants)
+BLAS_REFERENCE_SCRIPT = "blas_reference.py"
+BLAS_THREAD_COUNTS = [1, 12]  # Single-threaded, and the cores of a node (adjust to the partition)
+BLAS_THREAD_ENV_VARS = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"]
+PYTHON_EXECUTABLE = "python3"  # Python with NumPy on the compute nodes
+ELEMENT_BYTES = 8  # TYPE double
+
 # --- Helper Functions ---
 
 def run_command(command, cwd=None, check=False, capture=False, verbose=True):
@@ -105,27 +112,43 @@ def compile_c_code(source_path, exe_path):
             print(f"Compiler Warnings/Messages:\n{result.stderr}")
         return exe_path
 
-def generate_and_submit_slurm(prog_type, tile_size, run_idx, exe_path):
+def generate_and_submit_slurm(prog_type, tile_size, run_idx, exe_path, output_dir=None):
     """Generates a Slurm script and submits it.
-       prog_type: 'baseline' or 'tiled'
-       tile_size: Integer tile size (or None/-1 for baseline)
+       prog_type: 'baseline', 'tiled' or 'blas' (exe_path is then the
+                  reference script)
+       tile_size: Integer tile size (or None/-1 for baseline), or a
+                  (tile_i, tile_j, tile_k) tuple for per-loop tile sizes;
+                  the BLAS thread count for 'blas'
+       output_dir: Base directory for scripts and logs (default BASE_OUTPUT_DIR)
     """
     if prog_type == 'baseline':
         job_name = f"mmul_baseline_run{run_idx + 1}"
         tile_size_arg = "" # Baseline takes no argument
         tile_size_info = "N/A"
     elif prog_type == 'tiled':
-        job_name = f"mmul_tiled_tile{tile_size}_run{run_idx + 1}"
-        tile_size_arg = f"{tile_size}" # Tiled takes tile size argument
-        tile_size_info = str(tile_size)
+        tiles = tile_size if isinstance(tile_size, tuple) else (tile_size,)
+        tile_size_info = "x".join(map(str, tiles))
+        job_name = f"mmul_tiled_tile{tile_size_info}_run{run_idx + 1}"
+        tile_size_arg = " ".join(map(str, tiles)) # Tiled takes tile size argument(s)
+    elif prog_type == 'blas':
+        job_name = f"mmul_blas_threads{tile_size}_run{run_idx + 1}"
+        tile_size_info = "N/A"
     else:
         print(f"ERROR: Unknown program type '{prog_type}'")
         return None
 
-    script_path = SLURM_SCRIPTS_DIR / f"{job_name}.sh"
-    log_path = SLURM_LOGS_DIR / f"{job_name}.log"
+    scripts_dir = SLURM_SCRIPTS_DIR if output_dir is None else Path(output_dir) / "slurm_scripts"
+    logs_dir = SLURM_LOGS_DIR if output_dir is None else Path(output_dir) / "slurm_logs"
+    script_path = scripts_dir / f"{job_name}.sh"
+    log_path = logs_dir / f"{job_name}.log"
 
-    run_command_str = f"{exe_path.resolve()} {tile_size_arg}".strip() # Add arg only if needed
+    if prog_type == 'blas':
+        threads_env = " ".join(f"{var}={tile_size}" for var in BLAS_THREAD_ENV_VARS)
+        run_command_str = f"env {threads_env} {PYTHON_EXECUTABLE} {exe_path.resolve()} {MATRIX_SIZE}"
+        cpus_per_task = tile_size
+    else:
+        run_command_str = f"{exe_path.resolve()} {tile_size_arg}".strip() # Add arg only if needed
+        cpus_per_task = 1
     timed_command = f"time -p {run_command_str}"  # Use time -p
 
     account_line = f"#SBATCH --account={SLURM_ACCOUNT}" if SLURM_ACCOUNT else ""
@@ -137,7 +160,7 @@ def generate_and_submit_slurm(prog_type, tile_size, run_idx, exe_path):
 #SBATCH --error={log_path.resolve()} # Combine stdout/stderr
 #SBATCH --nodes=1
 #SBATCH --ntasks=1
-#SBATCH --cpus-per-task=1
+#SBATCH --cpus-per-task={cpus_per_task}
 #SBATCH --time={SLURM_TIME}
 #SBATCH --exclusive
 {account_line}
@@ -244,6 +267,103 @@ def parse_log(log_path: Path):
     return real_time, verified, exit_code
 
 
+# Measurements printed by blas_reference.py
+BLAS_LOG_REGEXES = {
+    "MatmulSeconds": re.compile(r"^BLAS matmul seconds:\s+(\d+\.?\d*)", re.MULTILINE),
+    "PeakGFLOPs": re.compile(r"^Peak GFLOP/s \(in-cache DGEMM\):\s+(\d+\.?\d*)", re.MULTILINE),
+    "PeakBandwidthGBs": re.compile(r"^Peak bandwidth GB/s \(copy\):\s+(\d+\.?\d*)", re.MULTILINE),
+}
+
+def parse_blas_log(log_path: Path):
+    """Parses a BLAS reference log. Returns {measurement: value} (empty if the run failed)."""
+    real_time, verified, exit_code = parse_log(log_path)
+    if exit_code != 0 or verified is not True:
+        return {}
+    content = log_path.read_text()
+    values = {}
+    for name, regex in BLAS_LOG_REGEXES.items():
+        match = regex.search(content)
+        if match:
+            values[name] = float(match.group(1))
+    return values
+
+
+def analyze_blas_reference():
+    """
+    Aggregates the BLAS reference runs per thread count: mean matmul time and
+    GFLOP/s, best (peak) in-cache DGEMM GFLOP/s and copy bandwidth.
+    """
+    rows = []
+    for threads in BLAS_THREAD_COUNTS:
+        for i in range(NUM_RUNS):
+            values = parse_blas_log(SLURM_LOGS_DIR / f"mmul_blas_threads{threads}_run{i + 1}.log")
+            if values:
+                rows.append({"Threads": threads, **values})
+    if not rows:
+        return pd.DataFrame()
+    runs = pd.DataFrame(rows)
+    ref_df = runs.groupby("Threads").agg(
+        MatmulSeconds=("MatmulSeconds", "mean"),
+        PeakGFLOPs=("PeakGFLOPs", "max"),
+        PeakBandwidthGBs=("PeakBandwidthGBs", "max"),
+        Runs=("MatmulSeconds", "count"),
+    ).reset_index()
+    ref_df["GFLOPs"] = 2 * MATRIX_SIZE ** 3 / ref_df["MatmulSeconds"] / 1e9
+    return ref_df
+
+
+def report_efficiency(agg_df):
+    """
+    Prints and plots each variant's achieved GFLOP/s (2*S^3 flops) and
+    effective bandwidth (compulsory traffic: A and B read, C written once,
+    3*S^2 doubles), as fractions of the NumPy/BLAS reference per thread count
+    and of the single-threaded measured peaks (the variants are
+    single-threaded). Saves the table to mmul_efficiency.csv.
+    """
+    eff_df = agg_df[['VariantLabel', 'ProgType', 'TileSize', 'mean']].copy()
+    eff_df['GFLOPs'] = 2 * MATRIX_SIZE ** 3 / eff_df['mean'] / 1e9
+    eff_df['BandwidthGBs'] = 3 * MATRIX_SIZE ** 2 * ELEMENT_BYTES / eff_df['mean'] / 1e9
+
+    ref_df = analyze_blas_reference()
+    if ref_df.empty:
+        print("\nWarning: No successful BLAS reference runs; reporting absolute rates only.")
+    else:
+        print("\n--- NumPy/BLAS Reference ---")
+        print(ref_df.to_string(index=False, float_format="%.3f"))
+        for _, ref in ref_df.iterrows():
+            eff_df[f"% BLAS ({int(ref['Threads'])}T)"] = 100 * eff_df['GFLOPs'] / ref['GFLOPs']
+        single = ref_df.sort_values("Threads").iloc[0]
+        eff_df['% Peak FLOP/s'] = 100 * eff_df['GFLOPs'] / single['PeakGFLOPs']
+        eff_df['% Peak Bandwidth'] = 100 * eff_df['BandwidthGBs'] / single['PeakBandwidthGBs']
+
+    print("\n--- Achieved Performance (Mean Time) ---")
+    print(eff_df.drop(columns=['ProgType', 'TileSize']).rename(columns={'mean': 'MeanTime'})
+          .to_string(index=False, float_format="%.3f"))
+    eff_df.to_csv(RESULTS_DIR / "mmul_efficiency.csv", index=False, float_format="%.4f")
+
+    plt.figure(figsize=(12, 7))
+    plot_df = eff_df.sort_values(by=['ProgType', 'TileSize'])
+    plt.bar(plot_df['VariantLabel'], plot_df['GFLOPs'], color='steelblue', label='Variant (single-threaded)')
+    line_styles = ['--', ':', '-.']
+    for idx, (_, ref) in enumerate(ref_df.iterrows()):
+        plt.axhline(ref['GFLOPs'], color='green', linestyle=line_styles[idx % len(line_styles)],
+                    label=f"NumPy/BLAS {int(ref['Threads'])} thread(s) ({ref['GFLOPs']:.1f} GFLOP/s)")
+    if not ref_df.empty:
+        plt.axhline(single['PeakGFLOPs'], color='red', linestyle='--',
+                    label=f"Measured peak, 1 thread ({single['PeakGFLOPs']:.1f} GFLOP/s)")
+        plt.yscale('log')
+    plt.xticks(rotation=45, ha='right')
+    plt.ylabel("GFLOP/s")
+    plt.title(f"Matrix Multiplication ({MATRIX_SIZE}x{MATRIX_SIZE}) Achieved GFLOP/s vs. BLAS and Peak")
+    plt.legend()
+    plt.grid(True, which="both", axis='y', ls="--")
+    plt.tight_layout()
+    plot_path = RESULTS_DIR / "mmul_gflops_plot.png"
+    plt.savefig(plot_path)
+    plt.close()
+    print(f"GFLOP/s plot saved to: {plot_path}")
+
+
 def analyze_and_plot():
     """Parses all logs, aggregates results, prints table, and plots."""
     print("\n--- Analyzing Results ---")
@@ -325,6 +445,9 @@ def analyze_and_plot():
     )
     print("--------------------------------------------")
 
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    report_efficiency(agg_df)
+
     # --- Plotting ---
     plt.figure(figsize=(12, 7))
 
@@ -443,6 +566,18 @@ def main():
                 submitted_job_ids.append(job_id)
             time.sleep(SLURM_SUBMIT_DELAY)
 
+    # Submit BLAS reference jobs
+    if Path(BLAS_REFERENCE_SCRIPT).is_file():
+        print("Submitting NumPy/BLAS reference runs...")
+        for threads in BLAS_THREAD_COUNTS:
+            for i in range(NUM_RUNS):
+                job_id = generate_and_submit_slurm('blas', threads, i, Path(BLAS_REFERENCE_SCRIPT))
+                if job_id and job_id != "UNKNOWN":
+                    submitted_job_ids.append(job_id)
+                time.sleep(SLURM_SUBMIT_DELAY)
+    else:
+        print(f"Warning: BLAS reference script '{BLAS_REFERENCE_SCRIPT}' not found. Skipping the reference runs.")
+
     if not submitted_job_ids:
         print("\nERROR: No jobs were submitted successfully. Exiting.")
         sys.exit(1)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+NumPy/BLAS reference for the mmul benchmark, run as a Slurm job by benchmark.py.
+
+Measures (with the BLAS thread count set through the environment):
+  - the same S x S double matrix multiplication through NumPy (DGEMM),
+  - the machine's compute peak, approximated by a DGEMM small enough to
+    stay in cache,
+  - the memory bandwidth peak, approximated by copying a large array.
+Only the timed operations are measured (not Python start-up or the
+initialization), best of REPEATS each.
+
+Usage: python blas_reference.py <matrix_size>
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+REPEATS = 3
+PEAK_DGEMM_SIZE = 256 # 3 matrices of 512 KiB: stays in L2/L3
+PEAK_MIN_SECONDS = 0.5 # Repeat the small DGEMM for at least this long
+COPY_BYTES = 512 * 1024 ** 2 # Far larger than the last level cache
+
+
+def best_time(function, repeats=REPEATS):
+    """Fastest of repeats calls of function, in seconds."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    if len(sys.argv) != 2:
+        print(f"Usage: {sys.argv[0]} <matrix_size>")
+        sys.exit(1)
+    size = int(sys.argv[1])
+    threads = os.environ.get("OPENBLAS_NUM_THREADS") or os.environ.get("OMP_NUM_THREADS") or "default"
+    print(f"BLAS threads: {threads}")
+
+    # Same multiplication as mmul.c: A (i*j % 100) times the identity
+    i, j = np.indices((size, size))
+    a = (i * j % 100).astype(np.float64)
+    b = np.eye(size)
+    c = np.empty((size, size))
+    seconds = best_time(lambda: np.matmul(a, b, out=c))
+    print(f"Verification: {'OK' if np.array_equal(a, c) else 'ERR'}")
+    print(f"BLAS matmul seconds: {seconds:.6f}")
+    print(f"BLAS matmul GFLOP/s: {2 * size ** 3 / seconds / 1e9:.3f}")
+
+    # Compute peak: in-cache DGEMM, repeated for a measurable duration
+    small = np.random.default_rng(0).random((PEAK_DGEMM_SIZE, PEAK_DGEMM_SIZE))
+    small_out = np.empty_like(small)
+    single = best_time(lambda: np.matmul(small, small, out=small_out))
+    inner = max(1, int(PEAK_MIN_SECONDS / max(single, 1e-9)))
+
+    def repeated_dgemm():
+        for _ in range(inner):
+            np.matmul(small, small, out=small_out)
+    seconds = best_time(repeated_dgemm)
+    print(f"Peak GFLOP/s (in-cache DGEMM): {2 * PEAK_DGEMM_SIZE ** 3 * inner / seconds / 1e9:.3f}")
+
+    # Bandwidth peak: large array copy (read + write)
+    src = np.ones(COPY_BYTES // 8)
+    dst = np.empty_like(src)
+    seconds = best_time(lambda: np.copyto(dst, src))
+    print(f"Peak bandwidth GB/s (copy): {2 * COPY_BYTES / seconds / 1e9:.3f}")
+
+
+if __name__ == "__main__":
+    main()
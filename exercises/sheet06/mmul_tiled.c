@@ -3,8 +3,10 @@
 #include <time.h>   // For timing
 #include <string.h> // For atoi with error checking (strtol)
 
-// Set matrix size to 2048
+// Set matrix size to 2048 (overridable with -DS=...)
+#ifndef S
 #define S 2048
+#endif
 #define N S
 #define M S
 #define K S
@@ -46,18 +48,29 @@ void freeMatrix(MATRIX matrix) {
 
 int main(int argc, char *argv[]) {
     int tile_size = 0; // Default: 0 indicates no tiling / original code path
+    // Tile sizes of the i, j and k loops: "tile_size" tiles all three loops
+    // alike, "tile_i tile_j tile_k" tiles each loop separately
+    int tile[3] = {0, 0, 0};
 
-    if (argc > 1) {
+    if (argc != 1 && argc != 2 && argc != 4) {
+        fprintf(stderr, "Usage: %s [tile_size | tile_i tile_j tile_k]\n", argv[0]);
+        return EXIT_FAILURE;
+    }
+    for (int d = 0; d < argc - 1; ++d) {
         char *endptr;
-        long val = strtol(argv[1], &endptr, 10);
+        long val = strtol(argv[d + 1], &endptr, 10);
         // Check for errors: empty string, non-numeric chars, out of range
-        if (endptr == argv[1] || *endptr != '\0' || val <= 0 || val > S) {
-            fprintf(stderr, "Usage: %s [tile_size]\n", argv[0]);
-            fprintf(stderr, "tile_size must be a positive integer <= %d\n", S);
+        if (endptr == argv[d + 1] || *endptr != '\0' || val <= 0 || val > S) {
+            fprintf(stderr, "Usage: %s [tile_size | tile_i tile_j tile_k]\n", argv[0]);
+            fprintf(stderr, "tile sizes must be positive integers <= %d\n", S);
             return EXIT_FAILURE;
         }
-        tile_size = (int)val;
+        tile[d] = (int)val;
+    }
+    if (argc == 2) {
+        tile[1] = tile[2] = tile[0];
     }
+    tile_size = tile[0];
 
 
     // create the matrices
@@ -90,13 +103,13 @@ int main(int argc, char *argv[]) {
 
     // conduct multiplication
     if (tile_size > 0) {
-        for (int ii = 0; ii < N; ii += tile_size) {
-            for (int jj = 0; jj < K; jj += tile_size) {
-                for (int kk = 0; kk < M; kk += tile_size) {
+        for (int ii = 0; ii < N; ii += tile[0]) {
+            for (int jj = 0; jj < K; jj += tile[1]) {
+                for (int kk = 0; kk < M; kk += tile[2]) {
                     // Inner loops iterate within the tile
-                    int i_max = MIN(ii + tile_size, N);
-                    int j_max = MIN(jj + tile_size, K);
-                    int k_max = MIN(kk + tile_size, M);
+                    int i_max = MIN(ii + tile[0], N);
+                    int j_max = MIN(jj + tile[1], K);
+                    int k_max = MIN(kk + tile[2], M);
 
                     for (int i = ii; i < i_max; ++i) {
                         for (int j = jj; j < j_max; ++j) {
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Allocator comparison harness for arbitrary workloads.
+
+Every workload command runs once per allocator of the registry, with the
+allocator's shared object injected via LD_PRELOAD ("system" runs without
+preload). Repetitions are interleaved: each round runs every allocator once,
+in a shuffled order, so drift of the machine state (page cache, frequency,
+other users) spreads over all allocators instead of biasing the last one.
+Per run, wall time, user/system CPU time, peak RSS, page faults and context
+switches are taken from GNU time's rusage output file (time -o), which
+measures only the workload; without GNU time, the harness falls back to the
+rusage of os.wait4, whose peak RSS can include the harness's own (inherited
+across exec). One comparison table
+(CSV and printed) and one plot per workload are written to the output
+directory.
+
+Usage:
+  python alloc_bench.py --workload malloctest="b/malloctest_original 1 500 1000000 10 1000" \
+      --workload build="ninja -j 16" --cwd build=/tmp/allscale/build \
+      --allocator custom=/path/to/libcustom.so --repetitions 5
+"""
+import argparse
+import datetime
+import logging
+import os
+import random
+import shlex
+import signal
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+import matplotlib.pyplot as plt
+import pandas as pd
+import seaborn as sns
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    handlers=[logging.StreamHandler()],
+)
+
+ALLOCATORS_BASE_DIR = Path("/scratch/cb761223/exercises/sheet07/benchmark/allocators")
+DEFAULT_OUTPUT_DIR = Path("alloc_bench_results")
+# Allocator registry: name -> candidate shared objects (the first existing one
+# is used); "system" is the glibc allocator (no LD_PRELOAD)
+ALLOCATOR_REGISTRY = {
+    "system": [],
+    "rpmalloc": [ALLOCATORS_BASE_DIR / "librpmalloc.so"],
+    "mimalloc": [ALLOCATORS_BASE_DIR / "libmimalloc.so"],
+    "jemalloc": [
+        ALLOCATORS_BASE_DIR / "libjemalloc.so",
+        Path("/usr/lib64/libjemalloc.so.2"),
+        Path("/usr/lib/x86_64-linux-gnu/libjemalloc.so.2"),
+    ],
+    "tcmalloc": [
+        ALLOCATORS_BASE_DIR / "libtcmalloc_minimal.so",
+        Path("/usr/lib64/libtcmalloc_minimal.so.4"),
+        Path("/usr/lib/x86_64-linux-gnu/libtcmalloc_minimal.so.4"),
+    ],
+}
+BASELINE_ALLOCATOR = "system"
+NUM_REPETITIONS = 5
+NUM_WARMUP_RUNS = 1  # Per allocator and workload, not recorded
+RUN_TIMEOUT = 3600  # Seconds
+SHUFFLE_SEED = 0
+# GNU time reports the rusage of the workload, which it forks itself. The
+# rusage of a process started directly by this harness includes the
+# harness's own peak RSS: Linux carries the RSS high-water mark across exec.
+TIME_COMMAND = "/usr/bin/time"
+TIME_FORMAT = "%U %S %M %R %F %w %c"
+METRICS = {
+    "WallTime_s": "Wall Time (s)",
+    "CPUTime_s": "CPU Time (s)",
+    "PeakRSS_MB": "Peak RSS (MB)",
+    "MinorFaults": "Minor Page Faults",
+}
+
+
+def resolve_allocators(selected, custom):
+    """
+    {name: shared object path or None} of the selected registry entries plus
+    the custom ones. Allocators whose library is missing or cannot be
+    preloaded are skipped with a warning.
+    """
+    registry = {name: list(paths) for name, paths in ALLOCATOR_REGISTRY.items()}
+    for name, path in custom.items():
+        registry[name] = [Path(path)]
+    names = selected or list(registry)
+    allocators = {}
+    for name in names:
+        if name not in registry:
+            logger.warning(f"Unknown allocator '{name}'. Skipping it.")
+            continue
+        if not registry[name]:
+            allocators[name] = None
+            continue
+        library = next((p for p in registry[name] if p.is_file()), None)
+        if library is None:
+            logger.warning(f"No library found for allocator '{name}' (tried {', '.join(map(str, registry[name]))}). Skipping it.")
+            continue
+        library = library.resolve()
+        if not preload_works(library):
+            logger.warning(f"{library} cannot be preloaded. Skipping allocator '{name}'.")
+            continue
+        allocators[name] = library
+    return allocators
+
+
+def preload_works(library):
+    """True if the dynamic loader accepts library in LD_PRELOAD (it only warns otherwise)."""
+    env = dict(os.environ, LD_PRELOAD=str(library))
+    result = subprocess.run(["/bin/true"], env=env, capture_output=True, text=True)
+    return result.returncode == 0 and "cannot be preloaded" not in result.stderr
+
+
+def allocator_env(library):
+    """Environment of a run with library preloaded (None: the system allocator)."""
+    env = os.environ.copy()
+    if library is None:
+        env.pop("LD_PRELOAD", None)
+    else:
+        env["LD_PRELOAD"] = str(library)
+    return env
+
+
+def kill_process_group(pid):
+    """SIGKILLs the process group led by pid (a run started with start_new_session)."""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def run_workload(command, cwd, env, log_file):
+    """
+    Runs command and returns its measurements from the child's rusage (via
+    GNU time if available). Output goes to log_file, so printing does not
+    disturb the timing. The run gets its own process group, so a timeout
+    kills the workload and its children, not just GNU time.
+    """
+    rusage_file = log_file.with_suffix(".rusage")
+    rusage_file.unlink(missing_ok=True)
+    if Path(TIME_COMMAND).is_file():
+        command = [TIME_COMMAND, "-f", TIME_FORMAT, "-o", str(rusage_file)] + list(command)
+    with open(log_file, "w") as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen(command, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT,
+                                stdin=subprocess.DEVNULL, start_new_session=True)
+        # Blocking wait (no polling wake-ups during the run); a timer kills it on timeout
+        timer = threading.Timer(RUN_TIMEOUT, kill_process_group, args=(proc.pid,))
+        timer.start()
+        _, status, usage = os.wait4(proc.pid, 0)
+        timer.cancel()
+        wall_time = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode == -9 and wall_time >= RUN_TIMEOUT:
+        with open(log_file, "a") as log:
+            log.write(f"\nERROR: Timed out after {RUN_TIMEOUT} seconds\n")
+    # ru_maxrss is in KiB on Linux
+    values = [usage.ru_utime, usage.ru_stime, usage.ru_maxrss, usage.ru_minflt, usage.ru_majflt,
+              usage.ru_nvcsw, usage.ru_nivcsw]
+    if rusage_file.is_file():
+        try:
+            # GNU time prepends "Command exited with non-zero status N" on failure
+            values = [float(v) for v in rusage_file.read_text().strip().splitlines()[-1].split()]
+        except (IndexError, ValueError):
+            logger.warning(f"Could not parse {rusage_file}; using the harness's rusage.")
+    return {
+        "ExitCode": proc.returncode,
+        "WallTime_s": wall_time,
+        "UserTime_s": values[0],
+        "SystemTime_s": values[1],
+        "CPUTime_s": values[0] + values[1],
+        "PeakRSS_MB": values[2] / 1024,
+        "MinorFaults": values[3],
+        "MajorFaults": values[4],
+        "VoluntaryCtxSwitches": values[5],
+        "InvoluntaryCtxSwitches": values[6],
+    }
+
+
+def benchmark_workload(name, command, cwd, allocators, repetitions, warmup, logs_dir):
+    """Interleaved repetitions of one workload over all allocators. Returns the raw runs."""
+    rng = random.Random(f"{SHUFFLE_SEED}-{name}")
+    order = list(allocators)
+    logger.info(f"Workload '{name}': {shlex.join(command)} ({len(order)} allocators x {repetitions} runs)")
+    for allocator in order:
+        for i in range(warmup):
+            run_workload(command, cwd, allocator_env(allocators[allocator]),
+                         logs_dir / f"{name}_{allocator}_warmup{i + 1}.log")
+    runs = []
+    for rep in range(1, repetitions + 1):
+        rng.shuffle(order)
+        for position, allocator in enumerate(order):
+            log_file = logs_dir / f"{name}_{allocator}_run{rep}.log"
+            result = run_workload(command, cwd, allocator_env(allocators[allocator]), log_file)
+            if result["ExitCode"] != 0:
+                logger.warning(f"{name} / {allocator} run {rep} failed (exit code {result['ExitCode']}); see {log_file}")
+            runs.append({"Workload": name, "Allocator": allocator, "Run": rep, "Position": position, **result})
+        logger.info(f"Round {rep}/{repetitions} done (order: {', '.join(order)})")
+    return pd.DataFrame(runs)
+
+
+def summarize(runs_df):
+    """Per allocator: mean/std of the metrics over successful runs, relative to the baseline allocator."""
+    ok = runs_df[runs_df["ExitCode"] == 0]
+    summary = ok.groupby("Allocator").agg(
+        Runs=("Run", "count"),
+        **{f"{metric}_mean": (metric, "mean") for metric in METRICS},
+        **{f"{metric}_std": (metric, "std") for metric in METRICS},
+        MajorFaults_mean=("MajorFaults", "mean"),
+    )
+    failed = runs_df[runs_df["ExitCode"] != 0].groupby("Allocator").size()
+    summary["FailedRuns"] = failed.reindex(summary.index, fill_value=0)
+    if BASELINE_ALLOCATOR in summary.index:
+        base = summary.loc[BASELINE_ALLOCATOR]
+        summary["WallSpeedup"] = base["WallTime_s_mean"] / summary["WallTime_s_mean"]
+        summary["RSSRatio"] = summary["PeakRSS_MB_mean"] / base["PeakRSS_MB_mean"]
+    order = sorted(summary.index, key=lambda x: (x != BASELINE_ALLOCATOR, summary.loc[x, "WallTime_s_mean"]))
+    return summary.loc[order].reset_index()
+
+
+def plot_workload(name, runs_df, summary_df, results_dir):
+    """One figure per workload: a bar chart (mean +/- sd) per metric."""
+    ok = runs_df[runs_df["ExitCode"] == 0]
+    if ok.empty:
+        logger.warning(f"No successful runs of '{name}' to plot.")
+        return
+    plt.style.use("seaborn-v0_8-whitegrid")
+    fig, axes = plt.subplots(1, len(METRICS), figsize=(5 * len(METRICS), 5))
+    for ax, (metric, label) in zip(axes, METRICS.items()):
+        sns.barplot(x="Allocator", y=metric, data=ok, order=list(summary_df["Allocator"]),
+                    capsize=0.1, errorbar="sd", ax=ax)
+        sns.stripplot(x="Allocator", y=metric, data=ok, order=list(summary_df["Allocator"]),
+                      color="black", alpha=0.6, size=4, ax=ax)
+        ax.set_title(label)
+        ax.set_xlabel("")
+        ax.set_ylabel(label)
+        ax.tick_params(axis="x", rotation=30)
+    fig.suptitle(f"Allocator Comparison: {name} (lower is better)")
+    fig.tight_layout()
+    plot_path = results_dir / f"alloc_{name}.png"
+    fig.savefig(plot_path)
+    plt.close(fig)
+    print(f"Saved plot to {plot_path}")
+
+
+def parse_assignments(values, option):
+    """{name: value} of NAME=VALUE command line arguments."""
+    parsed = {}
+    for value in values or []:
+        name, sep, rest = value.partition("=")
+        if not sep or not name or not rest:
+            raise SystemExit(f"ERROR: {option} expects NAME=VALUE, got '{value}'")
+        parsed[name] = rest
+    return parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare memory allocators via LD_PRELOAD on arbitrary workloads.")
+    parser.add_argument("--workload", action="append", required=True, metavar="NAME=COMMAND",
+                        help="Workload to run (repeatable); COMMAND is split like a shell command line.")
+    parser.add_argument("--cwd", action="append", metavar="NAME=DIR", help="Working directory of a workload.")
+    parser.add_argument("--allocator", action="append", metavar="NAME=PATH",
+                        help="Add or override an allocator shared object (repeatable).")
+    parser.add_argument("--allocators", nargs="+", metavar="NAME",
+                        help=f"Allocators to compare (default: all found; registry: {', '.join(ALLOCATOR_REGISTRY)}).")
+    parser.add_argument("--repetitions", type=int, default=NUM_REPETITIONS, help="Interleaved rounds per workload.")
+    parser.add_argument("--warmup", type=int, default=NUM_WARMUP_RUNS, help="Unrecorded runs per allocator first.")
+    parser.add_argument("--output-dir", type=Path, default=DEFAULT_OUTPUT_DIR, help="Directory for logs, tables and plots.")
+    args = parser.parse_args()
+
+    start_time_total = time.time()
+    workloads = parse_assignments(args.workload, "--workload")
+    cwds = parse_assignments(args.cwd, "--cwd")
+    custom = parse_assignments(args.allocator, "--allocator")
+    selected = args.allocators or (list(ALLOCATOR_REGISTRY) + [n for n in custom if n not in ALLOCATOR_REGISTRY])
+
+    allocators = resolve_allocators(selected, custom)
+    if len(allocators) < 2:
+        logger.error(f"Need at least two usable allocators to compare, found: {', '.join(allocators) or 'none'}")
+        raise SystemExit(1)
+    for name, library in allocators.items():
+        logger.info(f"Allocator {name}: {library or '(system malloc, no LD_PRELOAD)'}")
+    if not Path(TIME_COMMAND).is_file():
+        logger.warning(f"{TIME_COMMAND} not found: peak RSS is measured directly and includes "
+                       f"this harness's own peak RSS, so small workloads all show the same value.")
+
+    results_dir = args.output_dir / "results"
+    logs_dir = args.output_dir / "logs"
+    results_dir.mkdir(parents=True, exist_ok=True)
+    logs_dir.mkdir(parents=True, exist_ok=True)
+
+    for name, command_line in workloads.items():
+        runs_df = benchmark_workload(name, shlex.split(command_line), cwds.get(name), allocators,
+                                     args.repetitions, args.warmup, logs_dir)
+        runs_df.to_csv(results_dir / f"alloc_{name}_runs.csv", index=False)
+        summary_df = summarize(runs_df)
+        summary_df.to_csv(results_dir / f"alloc_{name}_summary.csv", index=False, float_format="%.4f")
+        print(f"\n--- Allocator Comparison: {name} ---")
+        print(summary_df.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+        plot_workload(name, runs_df, summary_df, results_dir)
+
+    logger.info(
+        f"Total allocator benchmark time: {datetime.timedelta(seconds=time.time() - start_time_total)}"
+    )
+    logger.info(f"All outputs are in: {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()